@@ -0,0 +1,395 @@
+import io
+import os
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from profiler import stage, count
+import iopool
+
+# NOTE: 直接读写 .zip / .tar(.gz/.bz2/.xz) 中的标注文件，不解压到磁盘
+#       归档中的文件用虚拟路径表示: "data.zip::/VOC/000001.xml"，
+#       os.path.dirname / os.path.join 对虚拟路径照常工作，导入器只需把 open 换成 read_bytes / open_binary
+
+ARCHIVE_SEP = '::'
+ZIP_EXTS = ('.zip',)
+TAR_EXTS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+_TAR_WRITE_MODES = {'.tar': 'w', '.tar.gz': 'w:gz', '.tgz': 'w:gz', '.tar.bz2': 'w:bz2', '.tbz2': 'w:bz2',
+                    '.tar.xz': 'w:xz', '.txz': 'w:xz'}
+_IMG_EXTS = ('.jpg', '.png', '.jpeg', '.bmp')
+SPOOL_SIZE = 32 << 20     # 写入归档时单个成员超过 32MB 才落到临时文件
+
+
+def _archive_ext(path: str):
+    lower = path.lower()
+    for ext in ZIP_EXTS + TAR_EXTS:
+        if lower.endswith(ext):
+            return ext
+    return None
+
+
+def is_archive_name(path: str) -> bool:
+    # 按扩展名判断 (输出时文件还不存在)
+    return isinstance(path, str) and _archive_ext(path) is not None
+
+
+def split_path(path: str):
+    # "data.zip::/VOC/1.xml" -> ("data.zip", "VOC/1.xml")；"data.zip" -> ("data.zip", "")；普通路径 -> (None, path)
+    if ARCHIVE_SEP in path:
+        archive, member = path.split(ARCHIVE_SEP, 1)
+        return archive, member.replace('\\', '/').strip('/')
+    if is_archive_name(path):
+        return path, ''
+    return None, path
+
+
+def member_path(archive: str, member: str) -> str:
+    return f"{archive}{ARCHIVE_SEP}/{member}"
+
+
+def as_folder(path: str) -> str:
+    # "data.zip" -> "data.zip::"，之后可以直接 os.path.join(folder, name)
+    if is_archive_name(path) and ARCHIVE_SEP not in path:
+        return path + ARCHIVE_SEP
+    return path
+
+
+def is_archive_path(path) -> bool:
+    return isinstance(path, str) and split_path(path)[0] is not None
+
+
+class ArchiveReader:
+    # 随机读取归档成员；zip 和未压缩的 tar 可以直接定位，压缩的 tar 只能顺序读取，
+    # 所以逐文件格式先用 preload 顺序扫描一遍，把标注文件内容和图片尺寸留在内存里
+    def __init__(self, path: str):
+        self.path = path
+        ext = _archive_ext(path)
+        self.is_zip = ext in ZIP_EXTS
+        self.compressed = not self.is_zip and ext != '.tar'
+        self.pid = os.getpid()
+        self.stamp = _stamp(path)
+        self.preloaded = False
+        self._lock = threading.Lock()
+        self._data = {}       # preload: 成员 -> bytes
+        self._sizes = {}      # preload: 图片成员 -> (宽, 高)
+        if self.is_zip:
+            self._zip = zipfile.ZipFile(path)
+            self._members = {info.filename: info for info in self._zip.infolist() if not info.is_dir()}
+        else:
+            self._tar = tarfile.open(path, 'r:*')
+            # NOTE: tar 中的名字可能带 "./" 前缀
+            self._members = {_normalize(info.name): info for info in self._tar.getmembers() if info.isfile()}
+
+    def names(self) -> list:
+        return list(self._members)
+
+    def listdir(self, inner: str) -> list:
+        # inner 文件夹下 (不递归) 的成员名
+        prefix = inner + '/' if inner else ''
+        return [name for name in self._members
+                if name.startswith(prefix) and '/' not in name[len(prefix):]]
+
+    def open(self, member: str):
+        # 二进制文件对象；zip / 未压缩 tar 可 seek
+        data = self._data.get(member)
+        if data is not None:
+            return io.BytesIO(data)
+        info = self._members.get(member)
+        if info is None:
+            raise FileNotFoundError(f"归档中没有该文件: {member_path(self.path, member)}")
+        if self.is_zip:
+            return self._zip.open(info)
+        return self._tar.extractfile(info)
+
+    def size(self, member: str) -> int:
+        info = self._members[member]
+        return info.file_size if self.is_zip else info.size
+
+    def read(self, member: str) -> bytes:
+        data = self._data.get(member)
+        if data is not None:
+            return data
+        with self._lock, self.open(member) as f:
+            return f.read()
+
+    def image_size(self, member: str):
+        size = self._sizes.get(member)
+        if size is not None:
+            return size
+        from imgsize import probe_stream
+        with self._lock, self.open(member) as f:
+            return probe_stream(f)
+
+    def preload(self, label_exts=(), probe_images: bool = False):
+        # 顺序读一遍归档 (压缩 tar 只需解压一次)：标注文件内容和图片尺寸缓存到内存
+        from imgsize import probe_stream
+        for info in self._tar:
+            if not info.isfile():
+                continue
+            name = _normalize(info.name)
+            ext = os.path.splitext(name)[1].lower()
+            if ext in label_exts:
+                self._data[name] = self._tar.extractfile(info).read()
+            elif probe_images and ext in _IMG_EXTS:
+                # NOTE: 只有当前成员读入内存，探测完即丢弃
+                self._sizes[name] = probe_stream(io.BytesIO(self._tar.extractfile(info).read()))
+        self.preloaded = True
+
+    def close(self):
+        (self._zip if self.is_zip else self._tar).close()
+
+
+def _normalize(name: str) -> str:
+    while name.startswith('./'):
+        name = name[2:]
+    return name.lstrip('/')
+
+
+def _stamp(path: str) -> tuple:
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+_scopes = 0
+
+
+def get_reader(archive: str) -> ArchiveReader:
+    # 每个进程每个归档只打开一次 (进程池的 worker 各自打开)
+    # NOTE: fork 出来的子进程继承了父进程的文件句柄，共用读取位置，必须重新打开
+    # NOTE: 归档在同一路径被改写 (大小或修改时间变了) 时重新打开，不用旧的成员表和预读内容
+    key = os.path.abspath(archive)
+    stamp = _stamp(archive)
+    with _readers_lock:
+        reader = _readers.get(key)
+        if reader is None or reader.pid != os.getpid() or reader.stamp != stamp:
+            reader = _readers[key] = ArchiveReader(archive)
+        return reader
+
+
+@contextmanager
+def reader_scope():
+    # 一次加载 / 转换期间复用打开的归档，最外层结束时丢弃 (下次使用时重新打开)；可以嵌套，也可以用作装饰器
+    # NOTE: 只从表中移除而不 close：其他线程 (e.g. 预览的缩略图) 正在用的 reader 读完后随引用一起释放
+    global _scopes
+    with _readers_lock:
+        _scopes += 1
+    try:
+        yield
+    finally:
+        with _readers_lock:
+            _scopes -= 1
+            if not _scopes:
+                _readers.clear()
+
+
+def read_raw(path: str) -> bytes:
+    # 不计时的读取，iopool 的预读线程使用
+    archive, member = split_path(path)
+    if archive is None:
+        iopool.delay()
+        with open(path, 'rb') as f:
+            return f.read()
+    return get_reader(archive).read(member)
+
+
+def read_bytes(path: str) -> bytes:
+    # NOTE: 在 iopool.read_ahead 中时先取预读的内容，此时 'read' 阶段的时间是等待预读的时间
+    with stage('read'):
+        data = iopool.take(path)
+        if data is None:
+            data = read_raw(path)
+    count('read', files=1, bytes_read=len(data))
+    return data
+
+
+def read_text(path: str, encoding: str = None) -> str:
+    archive, member = split_path(path)
+    with stage('read'):
+        data = iopool.take(path)
+        if data is not None:
+            # NOTE: 与 open(path, 'r') 相同的默认编码和通用换行
+            with io.TextIOWrapper(io.BytesIO(data), encoding=encoding) as f:
+                text = f.read()
+        elif archive is None:
+            iopool.delay()
+            with open(path, 'r', encoding=encoding) as f:
+                text = f.read()
+        else:
+            # NOTE: 归档成员没有换行转换，按通用换行处理由调用方 splitlines 完成
+            text = get_reader(archive).read(member).decode(encoding or 'utf-8')
+    count('read', files=1, bytes_read=len(text))
+    return text
+
+
+def file_size(path: str) -> int:
+    archive, member = split_path(path)
+    if archive is None:
+        return os.path.getsize(path)
+    return get_reader(archive).size(member)
+
+
+def open_binary(path: str):
+    archive, member = split_path(path)
+    if archive is None:
+        return open(path, 'rb')
+    return get_reader(archive).open(member)
+
+
+class MemberEntry:
+    # DirIndex 中代替 os.DirEntry 的归档成员
+    __slots__ = ('name', 'path')
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+
+
+def scandir(folder: str):
+    # 与 os.scandir 相同用途：普通文件夹产出 os.DirEntry，归档中的文件夹产出 MemberEntry
+    archive, inner = split_path(folder)
+    if archive is None:
+        with os.scandir(folder) as it:
+            yield from it
+        return
+    for name in get_reader(archive).listdir(inner):
+        yield MemberEntry(name.rsplit('/', 1)[-1], member_path(archive, name))
+
+
+# =================== 写入 =================
+
+class DirWriter:
+    # 普通输出文件夹
+    def __init__(self, root: str):
+        self.root = root
+        self.temp_dir = root      # 导出器的临时文件放在输出目录 (同一个文件系统)
+        os.makedirs(root, exist_ok=True)
+
+    def open(self, name: str, mode: str = 'w', encoding: str = None, newline: str = None, stream: bool = False):
+        return open(os.path.join(self.root, name), mode, encoding=encoding, newline=newline)
+
+    def add_file(self, src_path: str, name: str):
+        os.replace(src_path, os.path.join(self.root, name))
+
+    def path_of(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def close(self):
+        pass
+
+
+class _PendingMember(io.BufferedIOBase):
+    # 先写入内存 (过大时转到临时文件)，关闭时整体加入归档
+    def __init__(self, on_close):
+        super().__init__()
+        self._buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        self._on_close = on_close
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self._buf.write(data)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._buf.seek(0)
+                self._on_close(self._buf)
+            finally:
+                self._buf.close()
+                super().close()
+
+
+class ArchiveWriter:
+    # 新建 .zip / .tar(.gz/...)；多个线程可以同时 open，成员在关闭时加锁写入
+    def __init__(self, path: str):
+        self.path = path
+        self.temp_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(self.temp_dir, exist_ok=True)
+        ext = _archive_ext(path)
+        self._lock = threading.Lock()
+        if ext in ZIP_EXTS:
+            self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+            self._tar = None
+        else:
+            self._zip = None
+            self._tar = tarfile.open(path, _TAR_WRITE_MODES[ext])
+
+    def open(self, name: str, mode: str = 'w', encoding: str = None, newline: str = None, stream: bool = False):
+        # stream: 大文件 (COCO json) 直接压缩写入 zip，不经过临时文件；
+        #         此时不能同时写其他成员，tar 需要预先知道大小，仍然先缓存
+        if stream and self._zip is not None:
+            f = self._zip.open(self._zip_info(name), 'w', force_zip64=True)
+        else:
+            f = _PendingMember(lambda buf: self._add(name, buf))
+        if 'b' in mode:
+            return f
+        return io.TextIOWrapper(f, encoding=encoding, newline=newline)
+
+    def add_file(self, src_path: str, name: str):
+        with open(src_path, 'rb') as f:
+            self._add(name, f)
+        os.remove(src_path)
+
+    def path_of(self, name: str) -> str:
+        return member_path(self.path, name)
+
+    def _add(self, name: str, f):
+        size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        with self._lock:
+            if self._zip is not None:
+                with self._zip.open(self._zip_info(name), 'w', force_zip64=size >= (1 << 31)) as out:
+                    shutil.copyfileobj(f, out)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = size
+                info.mtime = int(time.time())
+                self._tar.addfile(info, f)
+
+    @staticmethod
+    def _zip_info(name: str) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    def close(self):
+        (self._zip or self._tar).close()
+
+
+def open_output(path: str):
+    # 输出位置：归档扩展名时写入新的归档，否则为文件夹
+    return ArchiveWriter(path) if is_archive_name(path) else DirWriter(path)
+
+
+@contextmanager
+def output_for(target):
+    # target: 输出文件夹 / 归档路径，或已经打开的 DirWriter / ArchiveWriter (由调用方关闭)
+    if isinstance(target, (DirWriter, ArchiveWriter)):
+        yield target
+        return
+    out = open_output(target)
+    try:
+        yield out
+    finally:
+        out.close()
+
+
+@contextmanager
+def open_output_file(path: str, encoding: str = None, newline: str = None):
+    # 单个输出文件 (COCO)；"out.zip::/train.json" 写入新归档中的 train.json
+    archive, member = split_path(path)
+    if archive is None:
+        with open(path, 'w', encoding=encoding, newline=newline) as f:
+            yield f
+        return
+    if not member:
+        raise ValueError(f"没有给出归档中的文件名: {path}")
+    with output_for(archive) as out, out.open(member, 'w', encoding=encoding, newline=newline, stream=True) as f:
+        yield f
@@ -0,0 +1,369 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import struct
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from ir_label import ImageInfo, BBox
+from unilabel import FORMATS, export_dataset, convert
+
+try:
+    import resource     # NOTE: Windows 上没有 resource 模块，峰值内存记为 None
+except ImportError:
+    resource = None
+
+# NOTE: 性能基准：生成任意规模的合成数据集，逐个测量 导入格式 -> 导出格式 的耗时 / 峰值内存 / 吞吐
+#       每个组合在独立子进程中运行，峰值内存互不影响；结果写入 JSON，compare 子命令对比两次结果
+
+RESULT_VERSION = 1
+IMAGE_SIZES = [(640, 480), (1280, 720), (1920, 1080), (800, 600)]
+
+
+def _png_bytes(width: int, height: int) -> bytes:
+    # 合法的全黑灰度 PNG，全零数据压缩后只有几百字节
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+    raw = (b'\x00' + b'\x00' * width) * height
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 9))
+            + chunk(b'IEND', b''))
+
+
+def synth_infos(img_dir: str, images: int, boxes: int, classes: int, seed: int = 0) -> list[ImageInfo]:
+    rng = random.Random(seed)
+    class_names = [f"class_{i:03d}" for i in range(classes)]
+    info_list = []
+    for i in range(images):
+        width, height = IMAGE_SIZES[i % len(IMAGE_SIZES)]
+        filename = f"{i:07d}.png"
+        info = ImageInfo(filename=filename, img_path=os.path.join(img_dir, filename), width=width, height=height)
+        for _ in range(boxes):
+            w = rng.randint(8, width // 2)
+            h = rng.randint(8, height // 2)
+            x = rng.randint(0, width - w)
+            y = rng.randint(0, height - h)
+            info.bboxes.append(BBox(rng.choice(class_names), x, y, x + w, y + h))
+        info_list.append(info)
+    return info_list
+
+
+def generate(root: str, images: int, boxes: int, classes: int, formats=FORMATS, seed: int = 0) -> dict:
+    # root/images 放图片，root/<fmt> 放各格式标注；返回每个格式的 convert 参数
+    img_dir = os.path.join(root, "images")
+    os.makedirs(img_dir, exist_ok=True)
+    info_list = synth_infos(img_dir, images, boxes, classes, seed)
+
+    png_cache = {}
+    for info in info_list:
+        data = png_cache.get((info.width, info.height))
+        if data is None:
+            data = png_cache[(info.width, info.height)] = _png_bytes(info.width, info.height)
+        with open(info.img_path, 'wb') as f:
+            f.write(data)
+
+    sources = {}
+    for fmt in formats:
+        folder = os.path.join(root, fmt)
+        export_dataset(fmt, info_list, folder)
+        if fmt == 'coco':
+            sources[fmt] = {"src": os.path.join(folder, "instances_converted.json"), "img_dir": img_dir}
+        elif fmt == 'yolo':
+            sources[fmt] = {"src": folder, "img_dir": img_dir}
+        else:
+            sources[fmt] = {"src": folder}
+    return sources
+
+
+def _peak_rss_mb():
+    # NOTE: Linux 上 ru_maxrss 会继承 fork 时父进程的峰值 (生成数据集的父进程可能很大)，
+    #       所以优先读 /proc/self/status 的 VmHWM，它在 exec 之后重新计数
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # NOTE: Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_pair(src_fmt: str, src: str, dst_fmt: str, dst: str, img_dir: str = None,
+             workers: int = 1, columnar: bool = False, stream: bool = False) -> dict:
+    # 在当前进程中跑一次转换 (由子进程调用)
+    t0 = time.perf_counter()
+    stats = convert(src_fmt, src, dst_fmt, dst, img_dir=img_dir, workers=workers,
+                    size_cache=False, columnar=columnar, stream=stream)
+    wall = time.perf_counter() - t0
+    return {
+        "wall_s": wall,
+        "load_s": stats["load_time"],
+        "export_s": stats["export_time"],
+        "peak_rss_mb": _peak_rss_mb(),
+        "images": stats["images"],
+        "boxes": stats["boxes"],
+        "files_per_s": stats["images"] / max(wall, 1e-9),
+    }
+
+
+def _run_child(src_fmt, source, dst_fmt, dst, workers, columnar, stream) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "_pair", src_fmt, source["src"], dst_fmt, dst,
+           "-j", str(workers)]
+    if source.get("img_dir"):
+        cmd += ["--img-dir", source["img_dir"]]
+    if columnar:
+        cmd.append("--columnar")
+    if stream:
+        cmd.append("--stream")
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{src_fmt} -> {dst_fmt} 失败:\n{proc.stderr.strip()}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(images: int, boxes: int, classes: int, pairs=None, repeat: int = 1, workers: int = 1,
+                  columnar: bool = False, stream: bool = False, data_dir: str = None, log=print) -> dict:
+    pairs = pairs or [(s, d) for s in FORMATS for d in FORMATS]
+    own_dir = data_dir is None
+    root = data_dir or tempfile.mkdtemp(prefix="unilabel_bench_")
+    try:
+        log(f"生成合成数据集: {images} 张图片 x {boxes} 框, {classes} 类 -> {root}")
+        t0 = time.perf_counter()
+        sources = generate(root, images, boxes, classes, formats=sorted({s for s, _ in pairs}))
+        log(f"生成完成 ({time.perf_counter() - t0:.1f}s)")
+
+        results = []
+        for src_fmt, dst_fmt in pairs:
+            runs = []
+            for _ in range(repeat):
+                dst = os.path.join(root, "out", f"{src_fmt}2{dst_fmt}")
+                shutil.rmtree(dst, ignore_errors=True)
+                runs.append(_run_child(src_fmt, sources[src_fmt], dst_fmt, dst, workers, columnar, stream))
+                shutil.rmtree(dst, ignore_errors=True)
+            # NOTE: 多次重复取耗时最短的一次，减少系统抖动的影响
+            best = min(runs, key=lambda r: r["wall_s"])
+            best["pair"] = f"{src_fmt}->{dst_fmt}"
+            best["runs"] = [r["wall_s"] for r in runs]
+            results.append(best)
+            log(f"  {best['pair']:<16} {best['wall_s']:8.3f}s  {best['files_per_s']:10.1f} files/s  "
+                f"{_fmt_mb(best['peak_rss_mb'])}")
+    finally:
+        if own_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "version": RESULT_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {"images": images, "boxes": boxes, "classes": classes, "repeat": repeat,
+                   "workers": workers, "columnar": columnar, "stream": stream},
+        "results": results,
+    }
+
+
+def _fmt_mb(value) -> str:
+    return "     n/a" if value is None else f"{value:7.1f}MB"
+
+
+def compare(old: dict, new: dict, threshold: float = 0.10, log=print) -> list:
+    # 返回变慢 / 内存上涨超过 threshold 的组合
+    if old.get("params") != new.get("params"):
+        log(f"[Warning] 两次运行参数不同: {old.get('params')} vs {new.get('params')}")
+    old_results = {r["pair"]: r for r in old["results"]}
+    regressions = []
+    log(f"{'pair':<16} {'old':>9} {'new':>9} {'time':>8} {'old RSS':>9} {'new RSS':>9} {'RSS':>8}")
+    for r in new["results"]:
+        base = old_results.get(r["pair"])
+        if base is None:
+            log(f"{r['pair']:<16} {'-':>9} {r['wall_s']:8.3f}s  (新增)")
+            continue
+        time_ratio = r["wall_s"] / max(base["wall_s"], 1e-9) - 1
+        flags = []
+        if time_ratio > threshold:
+            flags.append("SLOWER")
+        rss_text = f"{'':>9} {'':>9} {'':>8}"
+        if base.get("peak_rss_mb") and r.get("peak_rss_mb"):
+            rss_ratio = r["peak_rss_mb"] / base["peak_rss_mb"] - 1
+            rss_text = f"{base['peak_rss_mb']:7.1f}MB {r['peak_rss_mb']:7.1f}MB {rss_ratio:+7.1%}"
+            if rss_ratio > threshold:
+                flags.append("MORE RAM")
+        log(f"{r['pair']:<16} {base['wall_s']:8.3f}s {r['wall_s']:8.3f}s {time_ratio:+7.1%} {rss_text}"
+            f"  {' '.join(flags)}")
+        if flags:
+            regressions.append(r["pair"])
+    return regressions
+
+
+def bench_voc_parse(src: str = None, images: int = 5000, boxes: int = 5, repeat: int = 3, log=print) -> dict:
+    # VOC 解析后端对比：ElementTree (原实现) / 快速路径 / lxml (已安装时)
+    # NOTE: 文件内容预先读入内存，只比较解析本身
+    import xml.etree.ElementTree as ET
+    from converters import VOCImporter
+    own_dir = src is None
+    root = tempfile.mkdtemp(prefix="unilabel_voc_") if own_dir else None
+    try:
+        if own_dir:
+            src = generate(root, images, boxes, 20, formats=['voc'])['voc']['src']
+        paths = sorted(os.path.join(src, f) for f in os.listdir(src) if f.endswith('.xml'))
+        blobs = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                blobs.append((path, f.read()))
+    finally:
+        if own_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    backends = {
+        "elementtree": lambda path, data: VOCImporter.parse_tree(ET.fromstring(data), path),
+        "fast": lambda path, data: VOCImporter.parse_fast(data, path) or
+                                   VOCImporter.parse_tree(ET.fromstring(data), path),
+    }
+    try:
+        from lxml import etree as lxml_etree
+        backends["lxml"] = lambda path, data: VOCImporter.parse_tree(lxml_etree.fromstring(data), path)
+    except ImportError:
+        log("lxml 未安装，跳过")
+
+    reference, valid = [], []
+    for path, data in blobs:
+        try:
+            reference.append(backends["elementtree"](path, data))
+            valid.append((path, data))
+        except Exception as e:
+            log(f"[Warning] 跳过无法解析的文件: {path} ({type(e).__name__})")
+    blobs = valid
+    fast_hits = sum(VOCImporter.parse_fast(data, path) is not None for path, data in blobs)
+    results = {}
+    for name, parse in backends.items():
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = [parse(path, data) for path, data in blobs]
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {"us_per_file": best / max(len(blobs), 1) * 1e6, "files_per_s": len(blobs) / max(best, 1e-9),
+                         "same_as_elementtree": out == reference}
+    base = results["elementtree"]["us_per_file"]
+    log(f"{len(blobs)} 个 xml，快速路径命中 {fast_hits} 个")
+    for name, r in results.items():
+        log(f"  {name:<12} {r['us_per_file']:8.1f} us/file  {r['files_per_s']:10.0f} files/s  "
+            f"x{base / r['us_per_file']:.2f}  {'一致' if r['same_as_elementtree'] else '结果不同!'}")
+    return {"files": len(blobs), "fast_hits": fast_hits, "results": results}
+
+
+def _parse_pairs(text: str):
+    pairs = []
+    for item in text.split(","):
+        src_fmt, _, dst_fmt = item.partition(":")
+        if src_fmt not in FORMATS or dst_fmt not in FORMATS:
+            raise argparse.ArgumentTypeError(f"无效的组合: {item} (格式: voc:yolo,coco:labelme)")
+        pairs.append((src_fmt, dst_fmt))
+    return pairs
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="bench", description="UniLabel 性能基准")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="生成合成数据集并测量所有格式组合")
+    p_run.add_argument("-o", "--output", default="bench_results.json", help="结果 JSON 路径")
+    p_run.add_argument("--images", type=int, default=1000, help="图片数 (默认 1000)")
+    p_run.add_argument("--boxes", type=int, default=5, help="每张图片的框数 (默认 5)")
+    p_run.add_argument("--classes", type=int, default=20, help="类别数 (默认 20)")
+    p_run.add_argument("--pairs", type=_parse_pairs, help="只测这些组合，如 voc:yolo,coco:labelme (默认全部 16 个)")
+    p_run.add_argument("--repeat", type=int, default=1, help="每个组合重复次数，取最快一次")
+    p_run.add_argument("-j", "--workers", type=int, default=1, help="传给 convert 的 workers")
+    p_run.add_argument("--columnar", action="store_true", help="使用列式 IR")
+    p_run.add_argument("--stream", action="store_true", help="流式转换")
+    p_run.add_argument("--data-dir", help="合成数据集目录 (默认临时目录，结束后删除)")
+
+    p_gen = sub.add_parser("gen", help="只生成合成数据集")
+    p_gen.add_argument("root", help="输出目录")
+    p_gen.add_argument("--images", type=int, default=1000)
+    p_gen.add_argument("--boxes", type=int, default=5)
+    p_gen.add_argument("--classes", type=int, default=20)
+    p_gen.add_argument("--formats", default=",".join(FORMATS), help="逗号分隔 (默认全部)")
+    p_gen.add_argument("--seed", type=int, default=0)
+
+    p_cmp = sub.add_parser("compare", help="对比两次结果，变慢超过阈值时返回 1")
+    p_cmp.add_argument("old")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="容忍的相对变化 (默认 0.10 = 10%%)")
+
+    p_voc = sub.add_parser("voc", help="对比 VOC xml 解析后端 (ElementTree / 快速路径 / lxml)")
+    p_voc.add_argument("--src", help="已有的 VOC 标注文件夹 (默认生成合成数据)")
+    p_voc.add_argument("--images", type=int, default=5000)
+    p_voc.add_argument("--boxes", type=int, default=5)
+    p_voc.add_argument("--repeat", type=int, default=3)
+
+    # 内部使用：子进程中执行单个组合
+    p_pair = sub.add_parser("_pair")
+    p_pair.add_argument("src_fmt")
+    p_pair.add_argument("src")
+    p_pair.add_argument("dst_fmt")
+    p_pair.add_argument("dst")
+    p_pair.add_argument("--img-dir")
+    p_pair.add_argument("-j", "--workers", type=int, default=1)
+    p_pair.add_argument("--columnar", action="store_true")
+    p_pair.add_argument("--stream", action="store_true")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "_pair":
+        print(json.dumps(run_pair(args.src_fmt, args.src, args.dst_fmt, args.dst, img_dir=args.img_dir,
+                                  workers=args.workers, columnar=args.columnar, stream=args.stream)))
+        return 0
+
+    if args.command == "gen":
+        formats = [f for f in args.formats.split(",") if f]
+        sources = generate(args.root, args.images, args.boxes, args.classes, formats=formats, seed=args.seed)
+        for fmt, source in sources.items():
+            print(f"{fmt:<8} {source['src']}" + (f"  (--img-dir {source['img_dir']})" if "img_dir" in source else ""))
+        return 0
+
+    if args.command == "voc":
+        report = bench_voc_parse(args.src, args.images, args.boxes, args.repeat)
+        return 0 if all(r["same_as_elementtree"] for r in report["results"].values()) else 1
+
+    if args.command == "compare":
+        with open(args.old, 'r', encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, 'r', encoding='utf-8') as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.threshold)
+        if regressions:
+            print(f"[Warning] {len(regressions)} 个组合超过阈值: {', '.join(regressions)}")
+            return 1
+        print("没有发现性能回退。")
+        return 0
+
+    try:
+        report = run_benchmark(args.images, args.boxes, args.classes, pairs=args.pairs, repeat=args.repeat,
+                               workers=args.workers, columnar=args.columnar, stream=args.stream,
+                               data_dir=args.data_dir)
+    except RuntimeError as e:
+        print(f"[Error] {e}", file=sys.stderr)
+        return 1
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"结果已保存至: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
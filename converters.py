@@ -1,16 +1,78 @@
 import os
+import re
 import json
+import tempfile
+from array import array
+from collections import deque
+from itertools import islice
 import xml.etree.ElementTree as ET
-from PIL import Image
-from ir_label import ImageInfo, BBox
+from xml.sax.saxutils import escape
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ir_label import ImageInfo, BBox, AnnotationTable, xyxy_to_yolo, yolo_to_xyxy, as_python, _NO_SIZE
+from imgsize import probe_image_size
+from dirindex import DirIndex
+from jsonstream import iter_sections
+from profiler import stage, count, enabled as profiling
+from archive import read_bytes, read_text, open_binary, file_size, split_path, output_for, open_output_file
+from iopool import WriteQueue
 
 
 # =================== Importers(To IR) =================
 
+# NOTE: VOC 快速路径：标准布局 (LabelImg / CVAT 等导出) 的 xml 直接用预编译的正则一次取出所有字段，
+#       比 ET.parse + 多次 find 快一倍；<object> 内的 pose / truncated / difficult 等额外标签会被跳过。
+#       遇到实体 (&amp;)、注释 / CDATA、<part>、带属性的标签、字段顺序不同、非 UTF-8 编码等任何不确定的情况，
+#       都回退到 ElementTree，结果与 ElementTree 完全一致
+#       (lxml 实测更慢：解析本身快，但每次访问元素都要创建 Python 代理对象，见 bench.py voc)
+_VOC_OBJECT = re.compile(
+    rb'<object>\s*<name>([^<]*)</name>.*?<bndbox>\s*'
+    rb'<xmin>([^<]*)</xmin>\s*<ymin>([^<]*)</ymin>\s*<xmax>([^<]*)</xmax>\s*<ymax>([^<]*)</ymax>', re.S)
+_VOC_OBJECT_TAG = re.compile(rb'<object[\s>/]')
+_VOC_FILENAME = re.compile(rb'<filename>([^<]*)</filename>')
+_VOC_SIZE = re.compile(rb'<size>.*?<width>([^<]*)</width>\s*<height>([^<]*)</height>', re.S)
+_XML_ENCODING = re.compile(rb'^(?:\xef\xbb\xbf)?<\?xml[^>]*encoding=["\']([^"\']+)')
+_UTF8_NAMES = {b'utf-8', b'utf8', b'us-ascii', b'ascii'}
+
+
 class VOCImporter:
     def parse(self, xml_path: str) -> ImageInfo:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
+        data = read_bytes(xml_path)
+        info = self.parse_fast(data, xml_path)
+        if info is None:
+            info = self.parse_tree(ET.fromstring(data), xml_path)
+        return info
+
+    @staticmethod
+    def parse_fast(data: bytes, xml_path: str):
+        # 标准布局时返回 ImageInfo，否则返回 None (由调用方回退到 ElementTree)
+        if b'&' in data or b'<!' in data or b'<part' in data or b'\r' in data:
+            return None
+        m = _XML_ENCODING.match(data)
+        if m and m.group(1).lower() not in _UTF8_NAMES:
+            return None
+        fn = _VOC_FILENAME.search(data)
+        size = _VOC_SIZE.search(data)
+        if fn is None or size is None:
+            return None
+        objects = _VOC_OBJECT.findall(data)
+        # NOTE: 某个 object 不符合标准布局时正则会跨到下一个 object，数量一定对不上
+        if len(objects) != len(_VOC_OBJECT_TAG.findall(data)):
+            return None
+        try:
+            filename = fn.group(1).decode('utf-8') or None     # 与 ET 一致，空文本为 None
+            labels = [name.decode('utf-8') or None for name, *_ in objects]
+        except UnicodeDecodeError:
+            return None
+        width, height = size.groups()
+        img_path = os.path.join(os.path.dirname(xml_path), filename)
+        info = ImageInfo(filename=filename, img_path=img_path, width=int(width), height=int(height))
+        info.bboxes = [BBox(label, float(xmin), float(ymin), float(xmax), float(ymax))
+                       for label, (_, xmin, ymin, xmax, ymax) in zip(labels, objects)]
+        return info
+
+    @staticmethod
+    def parse_tree(root, xml_path: str) -> ImageInfo:
         filename = root.find('filename').text
         size_node = root.find('size')
         width = int(size_node.find('width').text)
@@ -31,43 +93,48 @@ class VOCImporter:
 
 
 class YOLOImporter:
-    def parse(self, txt_path: str, img_path: str, class_names: list) -> ImageInfo:
-        with Image.open(img_path) as img:
-            w, h = img.size
+    @staticmethod
+    def read_labels(txt_path: str):
+        # 一次读入整个 txt：返回 (类别 id (k,) int64, 归一化 cxcywh (k, 4) float64)
+        text = read_text(txt_path)
+        rows = [parts for parts in map(str.split, text.splitlines()) if parts]
+        if any(len(parts) != 5 for parts in rows):
+            # 有多余列 (e.g. 分割点、置信度) 或不足 5 列的行：只取前 5 列，不足的跳过
+            rows = [parts[:5] for parts in rows if len(parts) >= 5]
+        # NOTE: 字符串到浮点数的转换一次完成
+        rows = np.array(rows, dtype=np.float64).reshape(-1, 5)
+        return rows[:, 0].astype(np.int64), rows[:, 1:5]
+
+    def parse(self, txt_path: str, img_path: str, class_names: list, img_size: tuple = None) -> ImageInfo:
+        # img_size: 已知的 (宽, 高)，例如来自尺寸缓存；为 None 时只读取图片文件头
+        w, h = img_size or probe_image_size(img_path)
         filename = os.path.basename(img_path)
         info = ImageInfo(filename=filename, img_path=img_path, width=w, height=h)
-        with open(txt_path, 'r') as f:
-            lines = f.readlines()
-        for line in lines:
-            parts = line.strip().split()
-            if len(parts) < 5: continue
-            cls_id = int(parts[0])
-            cx, cy, nw, nh = map(float, parts[1:5])
-            label = class_names[cls_id] if cls_id < len(class_names) else str(cls_id)
-            xmin = (cx - nw / 2) * w
-            ymin = (cy - nh / 2) * h
-            xmax = (cx + nw / 2) * w
-            ymax = (cy + nh / 2) * h
-            info.bboxes.append(BBox(label, xmin, ymin, xmax, ymax))
+        cls_ids, cxcywh = self.read_labels(txt_path)
+        coords = yolo_to_xyxy(cxcywh, w, h).tolist()
+        n_names = len(class_names)
+        info.bboxes = [BBox(class_names[cls_id] if cls_id < n_names else str(cls_id), *xyxy)
+                       for cls_id, xyxy in zip(cls_ids.tolist(), coords)]
         return info
 
 class LabelMeImporter:
-    def parse(self, json_path: str) -> ImageInfo:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+    def __init__(self):
+        self._indexes = {}    # 文件夹 -> DirIndex，直接调用 parse 时每个文件夹只扫描一次
+
+    def parse(self, json_path: str, img_name: str = None) -> ImageInfo:
+        # img_name: 已配对好的图片文件名 (来自 DirIndex)，'' 表示没有找到；None 时在这里查索引
+        data = json.loads(read_text(json_path, encoding='utf-8'))
 
         # filename = data.get('imagePath', os.path.basename(json_path).replace('.json', '.jpg'))
         # filename = os.path.basename(json_path).replace('.json', '.jpg'))
-        filename = None
         dir_path = os.path.dirname(json_path)
-        for ext in ['.jpg', '.png', '.jpeg', '.bmp']:
-            name_try = os.path.basename(json_path).replace('.json', ext)
-            file_try = os.path.join(dir_path, name_try)
-            if os.path.exists(file_try):
-                filename = name_try
-                break
-        if filename is None:
-             filename = os.path.basename(data.get('imagePath', ''))
+        if img_name is None:
+            index = self._indexes.get(dir_path)
+            if index is None:
+                index = self._indexes[dir_path] = DirIndex(dir_path or '.', '.json')
+            entry = index.image_entry(os.path.splitext(os.path.basename(json_path))[0])
+            img_name = entry.name if entry is not None else ''
+        filename = img_name or os.path.basename(data.get('imagePath', ''))
         width = data.get('imageWidth')
         height = data.get('imageHeight')
         img_path = os.path.join(os.path.dirname(json_path), filename)
@@ -87,168 +154,708 @@ class LabelMeImporter:
 
 
 class COCOImporter:
-    def parse_all(self, json_path: str, img_root_dir: str) -> list[ImageInfo]:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        cats = {c['id']: c['name'] for c in data['categories']}
-        imgs = {i['id']: i for i in data['images']}
+    def iter_parse(self, json_path: str, img_root_dir: str):
+        # 流式读取 images / categories / annotations，逐个产出 ImageInfo
+        # NOTE: COCO 不保证三个数组的先后顺序，也不保证 annotations 按图片排序，
+        #       所以要读完整个文件才能确定每张图片的框，这里只保留 IR 本身，不保留原始 JSON
+        cats = {}
         img_infos = {}
-        for img_id, img_data in imgs.items():
-            fname = img_data['file_name']
-            img_infos[img_id] = ImageInfo(
-                filename=fname,
-                img_path=os.path.join(img_root_dir, fname),
-                width=img_data['width'],
-                height=img_data['height']
-            )
-        for ann in data['annotations']:
-            img_id = ann['image_id']
-            if img_id not in img_infos: continue
-            cat_name = cats.get(ann['category_id'], 'unknown')
-            x, y, w, h = ann['bbox']
-            bbox = BBox(label=cat_name, xmin=x, ymin=y, xmax=x + w, ymax=y + h)
-            img_infos[img_id].bboxes.append(bbox)
-        return list(img_infos.values())
+        pending = {}    # image_id -> [BBox]，images 数组出现在 annotations 之后时暂存
+        unresolved = False
+        with stage('parse'), open_binary(json_path) as f:
+            for section, item in iter_sections(f, ('images', 'categories', 'annotations')):
+                if section == 'annotations':
+                    x, y, w, h = item['bbox']
+                    cat_id = item['category_id']
+                    # NOTE: categories 还没读到时先放 category_id，最后统一替换成名称
+                    label = cats.get(cat_id, cat_id) if cats else cat_id
+                    if label is cat_id:
+                        unresolved = True
+                    bbox = BBox(label=label, xmin=x, ymin=y, xmax=x + w, ymax=y + h)
+                    info = img_infos.get(item['image_id'])
+                    if info is not None:
+                        info.bboxes.append(bbox)
+                    else:
+                        pending.setdefault(item['image_id'], []).append(bbox)
+                elif section == 'images':
+                    fname = item['file_name']
+                    info = ImageInfo(
+                        filename=fname,
+                        img_path=os.path.join(img_root_dir, fname),
+                        width=item['width'],
+                        height=item['height']
+                    )
+                    info.bboxes = pending.pop(item['id'], [])
+                    img_infos[item['id']] = info
+                else:
+                    cats[item['id']] = item['name']
+        if profiling():
+            count('parse', files=1, boxes=sum(len(info.bboxes) for info in img_infos.values()),
+                  bytes_read=file_size(json_path))
+        # pending 中剩下的是找不到图片的标注，直接丢弃
+        for info in img_infos.values():
+            if unresolved:
+                for bbox in info.bboxes:
+                    if not isinstance(bbox.label, str):
+                        bbox.label = cats.get(bbox.label, 'unknown')
+            yield info
+
+    def parse_all(self, json_path: str, img_root_dir: str) -> list[ImageInfo]:
+        return list(self.iter_parse(json_path, img_root_dir))
+
+    def parse_table(self, json_path: str, img_root_dir: str) -> AnnotationTable:
+        # 直接填充列式 AnnotationTable：标注只记录到 array 里，最后按图片一次性分组
+        img_ids, filenames, sizes = [], [], array('q')
+        ann_img, ann_cat, ann_box, ann_int = array('q'), array('q'), array('d'), array('B')
+        cats = {}
+        with stage('parse'), open_binary(json_path) as f:
+            for section, item in iter_sections(f, ('images', 'categories', 'annotations')):
+                if section == 'annotations':
+                    ann_img.append(item['image_id'])
+                    ann_cat.append(item['category_id'])
+                    bbox = item['bbox']
+                    ann_box.extend(bbox)
+                    # NOTE: xmax = x + w 只有两个都是整数时才是 int (与 iter_parse 相同)，见 ir_label 的 int_mask 说明
+                    x, y, w, h = (type(v) is int for v in bbox)
+                    ann_int.append(x | y << 1 | (x and w) << 2 | (y and h) << 3)
+                elif section == 'images':
+                    img_ids.append(item['id'])
+                    filenames.append(item['file_name'])
+                    width, height = item['width'], item['height']     # NOTE: 宽高未知时为 null
+                    sizes.extend((_NO_SIZE if width is None else width, _NO_SIZE if height is None else height))
+                else:
+                    cats[item['id']] = item['name']
+        if profiling():
+            count('parse', files=1, boxes=len(ann_img), bytes_read=file_size(json_path))
+
+        index = {img_id: i for i, img_id in enumerate(img_ids)}
+        img_idx = np.fromiter((index.get(i, -1) for i in ann_img), dtype=np.int64, count=len(ann_img))
+        keep = img_idx >= 0    # 找不到图片的标注直接丢弃
+        order = np.argsort(img_idx[keep], kind='stable')
+        coords = np.frombuffer(ann_box, dtype=np.float64).reshape(-1, 4)[keep][order]
+        coords[:, 2:] += coords[:, :2]      # xywh -> xyxy
+
+        # COCO category id -> 表内 category id (按名称去重)，未知类别记为 'unknown'
+        categories, name_ids = [], {}
+
+        def intern(name):
+            if name not in name_ids:
+                name_ids[name] = len(categories)
+                categories.append(name)
+            return name_ids[name]
+
+        for name in cats.values():
+            intern(name)
+        raw_cat = np.frombuffer(ann_cat, dtype=np.int64)[keep][order]
+        uniq, inverse = np.unique(raw_cat, return_inverse=True)
+        mapped = np.array([intern(cats.get(cat_id, 'unknown')) for cat_id in uniq.tolist()], dtype=np.int32)
+        cat_ids = mapped[inverse.reshape(-1)] if len(uniq) else np.empty(0, dtype=np.int32)
+
+        offsets = np.zeros(len(img_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(img_idx[keep], minlength=len(img_ids)), out=offsets[1:])
+        img_paths = [os.path.join(img_root_dir, fname) for fname in filenames]
+        int_mask = np.frombuffer(ann_int, dtype=np.uint8)[keep][order]
+        return AnnotationTable.from_arrays(filenames, img_paths, sizes, offsets, coords, cat_ids, categories,
+                                           int_mask)
 
 
 # ===================== Exporters(From IR)==================
+YOLO_ROW_FORMAT = "%d %.6f %.6f %.6f %.6f\n"
+
+
 class YOLOExporter:
-    def export(self, info_list: list[ImageInfo], output_dir: str, class_list: list = None):
-        os.makedirs(output_dir, exist_ok=True)
+    def export(self, info_list, output_dir: str, class_list: list = None, progress=None):
+        # info_list: list[ImageInfo] 或 AnnotationTable
+        # progress(done, total): 每写完一个文件回调一次
+        # NOTE: 整个数据集的框一次性在 NumPy 中完成归一化，每个文件用一次字符串格式化写出
+        # output_dir: 输出文件夹，或 .zip / .tar 等归档路径 (直接写入归档)
+        with output_for(output_dir) as out:
+            self._export_table(info_list, out, class_list, progress)
+
+    def _export_table(self, info_list, out, class_list, progress):
+        table = info_list if isinstance(info_list, AnnotationTable) else AnnotationTable.from_infos(info_list)
         if not class_list:
-            all_labels = set()
-            for info in info_list:
-                for box in info.bboxes:
-                    all_labels.add(box.label)
-            class_list = sorted(list(all_labels))
-            with open(os.path.join(output_dir, 'classes.txt'), 'w') as f:
-                f.write('\n'.join(class_list))
-                # f.write('\n'.join([str(i) + ': ' + name for i, name in enumerate(class_list)]))
+            used = np.unique(table.cat_ids).tolist()
+            class_list = sorted({table.categories[i] for i in used})
+        with out.open('classes.txt', 'w') as f:
+            f.write('\n'.join(class_list))
+            # f.write('\n'.join([str(i) + ': ' + name for i, name in enumerate(class_list)]))
 
         cls_map = {name: i for i, name in enumerate(class_list)}
+        # 表内 category id -> YOLO 类别 id，不在 class_list 中的为 -1 (跳过)
+        lookup = np.array([cls_map.get(name, -1) for name in table.categories] or [-1], dtype=np.int64)
+        cls_ids = lookup[table.cat_ids]
+        keep = cls_ids >= 0
+
+        box_img = table.box_image_index()
+        sizes = table.sizes[box_img]
+        if np.any(sizes[keep] < 0):
+            raise ValueError("缺少图片宽高，无法归一化为 YOLO 坐标")
+        rows = np.empty((table.num_boxes, 5), dtype=np.float64)
+        rows[:, 0] = cls_ids
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rows[:, 1:] = xyxy_to_yolo(table.coords, sizes[:, 0], sizes[:, 1])
+        rows = rows[keep]
+        offsets = np.zeros(table.num_images + 1, dtype=np.int64)
+        np.cumsum(np.bincount(box_img[keep], minlength=table.num_images), out=offsets[1:])
+
+        flat = rows.ravel().tolist()
+        offsets = offsets.tolist()
+        with WriteQueue(out) as writes:
+            for i, filename in enumerate(table.filenames):
+                txt_name = os.path.splitext(filename)[0] + ".txt"
+                k = offsets[i + 1] - offsets[i]
+                with stage('serialize'):
+                    text = YOLO_ROW_FORMAT * k % tuple(flat[offsets[i] * 5:offsets[i + 1] * 5]) if k else ''
+                writes.write(txt_name, text, boxes=k)
+                if progress: progress(i + 1, table.num_images)
 
-        for info in info_list:
-            txt_name = os.path.splitext(info.filename)[0] + ".txt"
-            with open(os.path.join(output_dir, txt_name), 'w') as f:
+    def export_stream(self, infos, output_dir: str, class_list: list = None):
+        # 流式导出：infos 为只遍历一次的迭代器，内存中只保留当前图片
+        # NOTE: 没有给定 class_list 时类别 id 要等看完全部框才能确定 (排序后的类别名)，
+        #       所以先按出现顺序分配临时 id 写入临时文件，最后替换成正式 id 再写出 txt
+        fixed = bool(class_list)
+        cls_map = {name: i for i, name in enumerate(class_list)} if fixed else {}
+        with output_for(output_dir) as out, \
+                tempfile.TemporaryFile('w+', dir=out.temp_dir, suffix='.yolo') as spool, \
+                WriteQueue(out) as writes:
+            if fixed:
+                with out.open('classes.txt', 'w') as f:
+                    f.write('\n'.join(class_list))
+            for info in infos:
+                ids = []
+                coords = []
                 for box in info.bboxes:
-                    if box.label not in cls_map: continue
-                    cls_id = cls_map[box.label]
-                    cx, cy, w, h = box.to_yolo(info.width, info.height)
-                    f.write(f"{cls_id} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n")
+                    cls_id = cls_map.get(box.label)
+                    if cls_id is None:
+                        if fixed: continue
+                        cls_id = cls_map[box.label] = len(cls_map)
+                    ids.append(cls_id)
+                    coords.append((box.xmin, box.ymin, box.xmax, box.ymax))
+                text = ''
+                if ids:
+                    if info.width is None or info.height is None:
+                        raise ValueError("缺少图片宽高，无法归一化为 YOLO 坐标")
+                    with stage('serialize'):
+                        rows = np.empty((len(ids), 5), dtype=np.float64)
+                        rows[:, 0] = ids
+                        with np.errstate(divide='ignore', invalid='ignore'):
+                            rows[:, 1:] = xyxy_to_yolo(np.array(coords, dtype=np.float64), info.width, info.height)
+                        text = YOLO_ROW_FORMAT * len(ids) % tuple(rows.ravel().tolist())
+                txt_name = os.path.splitext(info.filename)[0] + ".txt"
+                if fixed:
+                    writes.write(txt_name, text, boxes=len(ids))
+                else:
+                    with stage('spool'):
+                        spool.write(f"{txt_name}\t{len(ids)}\n{text}")
+
+            if fixed:
+                return
+            class_list = sorted(cls_map)
+            with out.open('classes.txt', 'w') as f:
+                f.write('\n'.join(class_list))
+            final = {str(cls_id): str(class_list.index(name)) for name, cls_id in cls_map.items()}
+            spool.seek(0)
+            for header in spool:
+                txt_name, k = header.rstrip('\n').split('\t')
+                lines = [spool.readline() for _ in range(int(k))]
+                text = ''.join(final[cls_id] + ' ' + rest for cls_id, rest in (line.split(' ', 1) for line in lines))
+                writes.write(txt_name, text, boxes=len(lines))
+
+
+# NOTE: 用预编译模板直接拼接字符串，输出与 ET.indent(space="  ") 的结果逐字节一致，
+#       避免每个文件都构建 ElementTree
+VOC_HEAD_TEMPLATE = """<annotation>
+  <folder>{folder}</folder>
+  <filename>{filename}</filename>
+  <path>{path}</path>
+  <source>
+    <database>Unknown</database>
+  </source>
+  <size>
+    <width>{width}</width>
+    <height>{height}</height>
+    <depth>3</depth>
+  </size>
+  <segmented>0</segmented>
+"""
+VOC_OBJECT_TEMPLATE = """  <object>
+    <name>{name}</name>
+    <pose>Unspecified</pose>
+    <truncated>0</truncated>
+    <difficult>0</difficult>
+    <bndbox>
+      <xmin>{xmin}</xmin>
+      <ymin>{ymin}</ymin>
+      <xmax>{xmax}</xmax>
+      <ymax>{ymax}</ymax>
+    </bndbox>
+  </object>
+"""
+VOC_TAIL = "</annotation>"
+
+
+def _iter_chunks(items, size: int):
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_all(exporter, info_list, output_dir: str, ext: str, workers: int = 4, progress=None):
+    # VOC / LabelMe 共用的批量写入：目录只创建一次，序列化和写文件在线程池中进行
+    # info_list: 列表 / AnnotationTable，或只遍历一次的迭代器 (流式转换，此时 progress 的 total 为 0)
+    # output_dir: 输出文件夹或归档路径
+    with output_for(output_dir) as out:
+        _write_chunks(exporter, info_list, out, ext, workers, progress)
+
+
+def _write_chunks(exporter, info_list, out, ext: str, workers: int, progress):
+    with WriteQueue(out) as writes:
+        _serialize_chunks(exporter, info_list, writes, ext, workers, progress)
+
+
+def _serialize_chunks(exporter, info_list, writes: WriteQueue, ext: str, workers: int, progress):
+    # NOTE: workers 个线程并行序列化；写文件交给 WriteQueue (iopool 的 writers 个线程)
+    total = len(info_list) if hasattr(info_list, '__len__') else 0
+
+    def write_chunk(chunk):
+        for info in chunk:
+            name = os.path.splitext(info.filename)[0] + ext
+            with stage('serialize'):
+                text = exporter.serialize(info)
+            writes.write(name, text, encoding='utf-8', newline=exporter.newline, boxes=len(info.bboxes))
+        return len(chunk)
+
+    chunksize = max(1, min(256, total // (max(workers, 1) * 4) or (1 if total else 64)))
+    chunks = _iter_chunks(info_list, chunksize)
+    done = 0
+    if workers <= 1:
+        for n in map(write_chunk, chunks):
+            done += n
+            if progress: progress(done, total)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # NOTE: 最多 workers * 2 个 chunk 在排队，迭代器输入时内存有上限
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(write_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    done += pending.popleft().result()
+                    # NOTE: 在调用线程里回调 progress，GUI 可以安全刷新界面
+                    if progress: progress(done, total)
+            while pending:
+                done += pending.popleft().result()
+                if progress: progress(done, total)
+        except BaseException:
+            # progress 抛出异常 (取消) 时丢弃还没开始的 chunk
+            for future in pending:
+                future.cancel()
+            raise
 
 
 class VOCExporter:
-    def export(self, info: ImageInfo, output_dir: str):
-        os.makedirs(output_dir, exist_ok=True)
+    newline = '\n'     # NOTE: 与 ET.write 的二进制写入保持一致，Windows 下也不转成 \r\n
 
-        root = ET.Element("annotation")
+    def serialize(self, info: ImageInfo) -> str:
+        # NOTE: 归档中的图片 ("data.zip::/VOC/1.jpg") 没有真实路径，path 写归档内的成员路径，folder 也从成员路径取
+        archive, img_path = split_path(info.img_path)
         # folder
-        folder_name = os.path.basename(os.path.dirname(info.img_path))
+        folder_name = os.path.basename(os.path.dirname(img_path))
         if not folder_name:
             folder_name = "Unspecified"     # 防止空路径
-        ET.SubElement(root, "folder").text = folder_name
-        # Filename
-        ET.SubElement(root, "filename").text = info.filename
-        # Path
-        ET.SubElement(root, "path").text = os.path.abspath(info.img_path)
-        # source
-        source = ET.SubElement(root, "source")
-        ET.SubElement(source, "database").text = "Unknown"
-        # Size
-        size = ET.SubElement(root, "size")
-        ET.SubElement(size, "width").text = str(info.width)
-        ET.SubElement(size, "height").text = str(info.height)
-        ET.SubElement(size, "depth").text = "3"     # NOTE: 默认为彩色图片
-        # Segmented
-        ET.SubElement(root, "segmented").text = "0"
-        # Object
+        if archive is None:
+            img_path = os.path.abspath(img_path)
+        parts = [VOC_HEAD_TEMPLATE.format(
+            folder=escape(folder_name),
+            filename=escape(info.filename),
+            path=escape(img_path),
+            width=info.width,
+            height=info.height,     # NOTE: depth 默认为 3 (彩色图片)
+        )]
         for box in info.bboxes:
-            obj = ET.SubElement(root, "object")
-            ET.SubElement(obj, "name").text = box.label
-            ET.SubElement(obj, "pose").text = "Unspecified" # 固定格式
-            ET.SubElement(obj, "truncated").text = "0"      # 固定格式
-            ET.SubElement(obj, "difficult").text = "0"      # 固定格式
-            bndbox = ET.SubElement(obj, "bndbox")
-            ET.SubElement(bndbox, "xmin").text = str(int(box.xmin))
-            ET.SubElement(bndbox, "ymin").text = str(int(box.ymin))
-            ET.SubElement(bndbox, "xmax").text = str(int(box.xmax))
-            ET.SubElement(bndbox, "ymax").text = str(int(box.ymax))
-        tree = ET.ElementTree(root)
-        ET.indent(tree, space="  ", level=0)
+            parts.append(VOC_OBJECT_TEMPLATE.format(
+                name=escape(box.label),
+                xmin=int(box.xmin), ymin=int(box.ymin),
+                xmax=int(box.xmax), ymax=int(box.ymax)
+            ))
+        parts.append(VOC_TAIL)
+        return ''.join(parts)
+
+    def export(self, info: ImageInfo, output_dir: str):
         xml_name = os.path.splitext(info.filename)[0] + ".xml"
-        tree.write(os.path.join(output_dir, xml_name), encoding="utf-8", xml_declaration=False)
+        with output_for(output_dir) as out, out.open(xml_name, 'w', encoding='utf-8', newline=self.newline) as f:
+            f.write(self.serialize(info))
+
+    def export_all(self, info_list: list[ImageInfo], output_dir: str, workers: int = 4, progress=None):
+        _write_all(self, info_list, output_dir, ".xml", workers=workers, progress=progress)
+
+
+_CATEGORY_ID = re.compile(r'"category_id": (\d+)')
 
 
 class COCOExporter:
-    def export(self, info_list: list[ImageInfo], output_path: str):
-        categories = set()
-        for info in info_list:
-            for box in info.bboxes:
-                categories.add(box.label)
-        cat_list = sorted(list(categories))
-        cat_map = {name: i + 1 for i, name in enumerate(cat_list)}  # COCO id 通常从1开始
-
-        coco_data = {
-            "images": [],
-            "annotations": [],
-            "categories": [{"id": v, "name": k} for k, v in cat_map.items()]
-        }
-
-        ann_id_cnt = 1
-        for img_id, info in enumerate(info_list, 1):
-            coco_data["images"].append({
-                "id": img_id,
-                "file_name": info.filename,
-                "width": info.width,
-                "height": info.height
-            })
-
-            for box in info.bboxes:
-                coco_data["annotations"].append({
-                    "id": ann_id_cnt,
-                    "image_id": img_id,
-                    "category_id": cat_map[box.label],
-                    "bbox": [box.xmin, box.ymin, box.get_width(), box.get_height()],
-                    "area": box.get_width() * box.get_height(),
-                    "iscrowd": 0
+    def export(self, info_list, output_path: str, categories: list = None, chunk_size: int = 1000,
+               progress=None):
+        # info_list: ImageInfo 的列表或任意迭代器 (只遍历一次)
+        # progress(done, total): 每写完一个 chunk 回调一次，迭代器的 total 未知时为 0
+        # categories: 固定的类别列表 (顺序即 id，从1开始)，给出时不再预扫描所有框，不在列表中的框会被跳过
+        # NOTE: images 分块直接写入输出文件，annotations 分块写入临时文件，最后拼接并追加 categories，
+        #       输出与一次性 json.dump 的结果逐字节一致
+        if isinstance(info_list, AnnotationTable):
+            return self.export_table(info_list, output_path, categories, chunk_size, progress)
+        remap = None
+        if categories is None and isinstance(info_list, list):
+            all_labels = set()
+            for info in info_list:
+                for box in info.bboxes:
+                    all_labels.add(box.label)
+            categories = sorted(all_labels)
+        if categories is not None:
+            cat_map = {name: i + 1 for i, name in enumerate(categories)}  # COCO id 通常从1开始
+        else:
+            cat_map = {}    # 迭代器且没有类别列表：先按出现顺序分配临时 id，最后再按名称排序重映射
+
+        # output_path: json 路径，或 "out.zip::/instances.json" (直接写入归档)
+        out_dir = os.path.dirname(os.path.abspath(split_path(output_path)[0] or output_path))
+        with open_output_file(output_path) as f, \
+                tempfile.TemporaryFile('w+', dir=out_dir, suffix='.ann') as spool:
+            f.write('{"images": [')
+            images, annotations = [], []
+            first_chunk = True
+            ann_id_cnt = 1
+            total = len(info_list) if isinstance(info_list, list) else 0
+
+            def flush():
+                nonlocal first_chunk
+                if images:
+                    with stage('serialize'):
+                        text = ('' if first_chunk else ', ') + json.dumps(images)[1:-1]
+                    with stage('write'):
+                        f.write(text)
+                    count('write', files=len(images), bytes_written=len(text))
+                    first_chunk = False
+                    images.clear()
+                if annotations:
+                    with stage('serialize'):
+                        text = json.dumps(annotations)[1:-1] + '\n'
+                    with stage('spool'):
+                        spool.write(text)    # NOTE: 一行一个 chunk
+                    count('write', boxes=len(annotations))
+                    annotations.clear()
+
+            for img_id, info in enumerate(info_list, 1):
+                images.append({
+                    "id": img_id,
+                    "file_name": info.filename,
+                    "width": info.width,
+                    "height": info.height
                 })
-                ann_id_cnt += 1
+                for box in info.bboxes:
+                    cat_id = cat_map.get(box.label)
+                    if cat_id is None:
+                        if categories is not None: continue
+                        cat_id = cat_map[box.label] = len(cat_map) + 1
+                    annotations.append({
+                        "id": ann_id_cnt,
+                        "image_id": img_id,
+                        "category_id": cat_id,
+                        "bbox": [box.xmin, box.ymin, box.get_width(), box.get_height()],
+                        "area": box.get_width() * box.get_height(),
+                        "iscrowd": 0
+                    })
+                    ann_id_cnt += 1
+                if len(images) >= chunk_size:
+                    flush()
+                    if progress: progress(img_id, total)
+            flush()
+
+            if categories is None:
+                categories = sorted(cat_map)
+                final_ids = {name: i + 1 for i, name in enumerate(categories)}
+                if any(final_ids[name] != cat_id for name, cat_id in cat_map.items()):
+                    remap = {cat_id: final_ids[name] for name, cat_id in cat_map.items()}
+
+            f.write('], "annotations": [')
+            spool.seek(0)
+            for i, line in enumerate(spool):
+                line = line.rstrip('\n')
+                if remap is not None:
+                    # NOTE: annotations 里只有数字，不会误匹配，直接替换比 json.loads / dumps 快得多
+                    with stage('remap'):
+                        line = _CATEGORY_ID.sub(lambda m: f'"category_id": {remap[int(m.group(1))]}', line)
+                with stage('write'):
+                    f.write((', ' if i else '') + line)
+                count('write', bytes_written=len(line))
+            f.write('], "categories": ')
+            f.write(json.dumps([{"id": i + 1, "name": name} for i, name in enumerate(categories)]))
+            f.write('}')
+
 
-        with open(output_path, 'w') as f:
-            json.dump(coco_data, f)
+    def export_sharded(self, info_list, output_dir: str, shard_images: int = None, shard_bytes: int = None,
+                       categories: list = None, prefix: str = "instances", chunk_size: int = 1000,
+                       progress=None) -> list:
+        # 分片导出：每 shard_images 张图片，或 (近似) 每 shard_bytes 字节一个文件 <prefix>_00000.json ...
+        # image / annotation id 在所有分片中连续且唯一，每个分片都带完整的 categories，合并回来时 id 不冲突
+        # output_dir 为归档路径时分片直接写入归档；返回分片文件路径列表 (归档中为 "out.zip::/<prefix>_00000.json")
+        # NOTE: 与 export 相同，images 直接写入分片 (先写到 .tmp)，annotations 写入同一个临时文件并记录每个分片的范围，
+        #       类别确定后再把 annotations 和 categories 追加到每个分片
+        if not shard_images and not shard_bytes:
+            raise ValueError("shard_images 和 shard_bytes 至少给出一个")
+        if categories is None and isinstance(info_list, (list, AnnotationTable)):
+            categories = sorted({box.label for info in info_list for box in info.bboxes})
+        fixed = categories is not None
+        cat_map = {name: i + 1 for i, name in enumerate(categories)} if fixed else {}
+        if shard_images:
+            chunk_size = min(chunk_size, shard_images)
+        if shard_bytes:
+            chunk_size = min(chunk_size, 16)      # NOTE: 每个 chunk 写完才检查大小，最多超出 16 张图片
+        total = len(info_list) if hasattr(info_list, '__len__') else 0
 
+        shards = []     # [分片文件名, 标注在 spool 中的起止行号]
+        with output_for(output_dir) as out, \
+                tempfile.TemporaryFile('w+', dir=out.temp_dir, suffix='.ann') as spool:
+            f = None
+            shard_count = shard_size = 0
+            ann_lines = 0
+            images, annotations = [], []
+            ann_id_cnt = 1
+
+            def flush():
+                nonlocal shard_size, ann_lines
+                if images:
+                    with stage('serialize'):
+                        text = json.dumps(images)[1:-1]
+                    with stage('write'):
+                        f.write(('' if shard_count == len(images) else ', ') + text)
+                    count('write', files=len(images), bytes_written=len(text))
+                    shard_size += len(text)
+                    images.clear()
+                if annotations:
+                    with stage('serialize'):
+                        text = json.dumps(annotations)[1:-1]
+                    with stage('spool'):
+                        spool.write(text + '\n')
+                    count('write', boxes=len(annotations), bytes_written=len(text))
+                    shard_size += len(text)
+                    ann_lines += 1
+                    annotations.clear()
+
+            def open_shard():
+                nonlocal f, shard_count, shard_size
+                name = f"{prefix}_{len(shards):05d}.json"
+                f = open(os.path.join(out.temp_dir, name + '.tmp'), 'w')
+                f.write('{"images": [')
+                shards.append([name, ann_lines, ann_lines])
+                shard_count = shard_size = 0
+
+            def close_shard():
+                nonlocal f
+                flush()
+                f.close()
+                f = None
+                shards[-1][2] = ann_lines
+
+            try:
+                for img_id, info in enumerate(info_list, 1):
+                    if f is None:
+                        open_shard()
+                    images.append({
+                        "id": img_id,
+                        "file_name": info.filename,
+                        "width": info.width,
+                        "height": info.height
+                    })
+                    shard_count += 1
+                    for box in info.bboxes:
+                        cat_id = cat_map.get(box.label)
+                        if cat_id is None:
+                            if fixed: continue
+                            cat_id = cat_map[box.label] = len(cat_map) + 1
+                        annotations.append({
+                            "id": ann_id_cnt,
+                            "image_id": img_id,
+                            "category_id": cat_id,
+                            "bbox": [box.xmin, box.ymin, box.get_width(), box.get_height()],
+                            "area": box.get_width() * box.get_height(),
+                            "iscrowd": 0
+                        })
+                        ann_id_cnt += 1
+                    if len(images) >= chunk_size:
+                        flush()
+                        if progress: progress(img_id, total)
+                    if (shard_images and shard_count >= shard_images) or \
+                            (shard_bytes and shard_size >= shard_bytes):
+                        close_shard()
+                if not shards:
+                    open_shard()    # 空数据集也输出一个只有 categories 的分片
+                if f is not None:
+                    close_shard()
+
+                remap = None
+                if not fixed:
+                    categories = sorted(cat_map)
+                    final_ids = {name: i + 1 for i, name in enumerate(categories)}
+                    if any(final_ids[name] != cat_id for name, cat_id in cat_map.items()):
+                        remap = {cat_id: final_ids[name] for name, cat_id in cat_map.items()}
+                categories_text = json.dumps([{"id": i + 1, "name": name} for i, name in enumerate(categories)])
+
+                spool.seek(0)
+                for name, start, stop in shards:
+                    tmp_path = os.path.join(out.temp_dir, name + '.tmp')
+                    with open(tmp_path, 'a') as dst:
+                        dst.write('], "annotations": [')
+                        for i in range(stop - start):
+                            line = spool.readline().rstrip('\n')
+                            if remap is not None:
+                                line = _CATEGORY_ID.sub(lambda m: f'"category_id": {remap[int(m.group(1))]}', line)
+                            dst.write((', ' if i else '') + line)
+                        dst.write('], "categories": ' + categories_text + '}')
+                    # NOTE: 文件夹输出时是 os.replace；归档输出时整个分片复制进归档后删除
+                    out.add_file(tmp_path, name)
+            except BaseException:
+                if f is not None:
+                    f.close()
+                for name, _, _ in shards:
+                    tmp_path = os.path.join(out.temp_dir, name + '.tmp')
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                raise
+            return [out.path_of(name) for name, _, _ in shards]
+
+    def export_table(self, table: AnnotationTable, output_path: str, categories: list = None,
+                     chunk_size: int = 1000, progress=None):
+        # AnnotationTable 的向量化路径：bbox / area / image_id 一次算完，再分块序列化
+        if categories is None:
+            categories = sorted({table.categories[i] for i in np.unique(table.cat_ids).tolist()})
+        cat_map = {name: i + 1 for i, name in enumerate(categories)}
+        lookup = np.array([cat_map.get(name, 0) for name in table.categories] or [0], dtype=np.int64)
+        cat_ids = lookup[table.cat_ids]
+        keep = cat_ids > 0
+        coords = table.coords[keep]
+        xywh = coords.copy()
+        xywh[:, 2:] -= coords[:, :2]
+        # NOTE: 见 ir_label 的 int_mask 说明；宽高两端都是整数时才是 int，面积四个坐标都是整数时才是 int
+        is_int = table.coord_is_int()[keep]
+        is_int[:, 2:] &= is_int[:, :2]
+        area = as_python(xywh[:, 2] * xywh[:, 3], is_int.all(axis=1))
+        xywh = as_python(xywh, is_int)
+        image_ids = (table.box_image_index()[keep] + 1).tolist()
+        cat_ids = cat_ids[keep].tolist()
+        # NOTE: 宽高未知 (_NO_SIZE) 时写 null，与 list 路径 (ImageInfo.width 为 None) 一致
+        sizes = [[None if v == _NO_SIZE else v for v in size] for size in table.sizes.tolist()]
+
+        with open_output_file(output_path) as f:
+            f.write('{"images": [')
+            for start in range(0, table.num_images, chunk_size):
+                with stage('serialize'):
+                    images = [{"id": i + 1, "file_name": table.filenames[i],
+                               "width": sizes[i][0], "height": sizes[i][1]}
+                              for i in range(start, min(start + chunk_size, table.num_images))]
+                    text = (', ' if start else '') + json.dumps(images)[1:-1]
+                with stage('write'):
+                    f.write(text)
+                count('write', files=len(images), bytes_written=len(text))
+                if progress: progress(min(start + chunk_size, table.num_images), table.num_images)
+            f.write('], "annotations": [')
+            for start in range(0, len(xywh), chunk_size * 10):
+                stop = min(start + chunk_size * 10, len(xywh))
+                with stage('serialize'):
+                    annotations = [{"id": j + 1, "image_id": image_ids[j], "category_id": cat_ids[j],
+                                    "bbox": xywh[j], "area": area[j], "iscrowd": 0}
+                                   for j in range(start, stop)]
+                    text = (', ' if start else '') + json.dumps(annotations)[1:-1]
+                with stage('write'):
+                    f.write(text)
+                count('write', boxes=stop - start, bytes_written=len(text))
+            f.write('], "categories": ')
+            f.write(json.dumps([{"id": i + 1, "name": name} for i, name in enumerate(categories)]))
+            f.write('}')
+
+
+# NOTE: 与 json.dump(indent=2, ensure_ascii=False) 的输出逐字节一致
+LABELME_HEAD_TEMPLATE = """{{
+  "version": "5.5.0",
+  "flags": {{}},
+  "shapes": ["""
+LABELME_SHAPE_TEMPLATE = """
+    {{
+      "label": {label},
+      "points": [
+        [
+          {xmin},
+          {ymin}
+        ],
+        [
+          {xmax},
+          {ymax}
+        ]
+      ],
+      "group_id": null,
+      "description": "",
+      "shape_type": "rectangle",
+      "flags": {{}},
+      "mask": null
+    }}"""
+LABELME_TAIL_TEMPLATE = """
+  "imagePath": {image_path},
+  "imageData": null,
+  "imageHeight": {height},
+  "imageWidth": {width}
+}}"""
+# NOTE: 每个框用 % 格式化比 str.format(**kwargs) 快，框多时 serialize 的大部分时间在这里
+_LABELME_SHAPE = (LABELME_SHAPE_TEMPLATE.replace('{{', '{').replace('}}', '}').replace('{label}', '%s')
+                  .replace('{xmin}', '%s').replace('{ymin}', '%s').replace('{xmax}', '%s').replace('{ymax}', '%s'))
+_json_encode = json.JSONEncoder(ensure_ascii=False).encode
+_json_str = json.encoder.encode_basestring
+
+
+def _json_value(value) -> str:
+    # NOTE: str / int / 有限 float 走快速路径 (type 判断排除了 bool 和 numpy 标量)，其余 (None, nan, inf) 交给 json 编码器
+    t = type(value)
+    if t is str:
+        return _json_str(value)
+    if t is int:
+        return int.__repr__(value)
+    if t is float and value - value == 0:
+        return float.__repr__(value)
+    return _json_encode(value)
+
+
+_PLAIN_NUMBERS = (int, float)
+
+
+def _labelme_shape(box) -> str:
+    # NOTE: 坐标都是 int / 有限 float 时 %s 的结果就是 json 的写法 (str 与 repr 相同)，不用逐个调用 _json_value
+    label, x1, y1, x2, y2 = box.label, box.xmin, box.ymin, box.xmax, box.ymax
+    if (type(label) is str and type(x1) in _PLAIN_NUMBERS and type(y1) in _PLAIN_NUMBERS and
+            type(x2) in _PLAIN_NUMBERS and type(y2) in _PLAIN_NUMBERS):
+        total = x1 + y1 + x2 + y2
+        if total - total == 0:
+            return _LABELME_SHAPE % (_json_str(label), x1, y1, x2, y2)
+    return _LABELME_SHAPE % (_json_value(label), _json_value(x1), _json_value(y1), _json_value(x2), _json_value(y2))
 
 
 class LabelMeExporter:
-    def export(self, info: ImageInfo, output_dir: str):
-        os.makedirs(output_dir, exist_ok=True)
-        data = {
-            "version": "5.5.0",
-            "flags": {},
-            "shapes": [],
-            "imagePath": info.filename,
-            "imageData": None,  # NOTE: 设为 None，LabelMe 打开时会自动读取同级目录下的图片
-            "imageHeight": info.height,
-            "imageWidth": info.width
-        }
+    newline = None
 
-        for box in info.bboxes:
-            shape = {
-                "label": box.label,
-                "points": [
-                    [box.xmin, box.ymin],
-                    [box.xmax, box.ymax]
-                ],
-                "group_id": None,
-                "description": "",
-                "shape_type": "rectangle",  # NOTE: 因为是目标检测，这个硬编码为矩形
-                "flags": {},
-                "mask": None
-            }
-            data["shapes"].append(shape)
+    def serialize(self, info: ImageInfo) -> str:
+        # NOTE: imageData 设为 None，LabelMe 打开时会自动读取同级目录下的图片
+        #       shape_type 因为是目标检测，硬编码为矩形
+        shapes = ','.join([_labelme_shape(box) for box in info.bboxes])
+        shapes = shapes + "\n  ]," if shapes else "],"
+        return (LABELME_HEAD_TEMPLATE.format() + shapes +
+                LABELME_TAIL_TEMPLATE.format(image_path=_json_value(info.filename),
+                                             height=_json_value(info.height),
+                                             width=_json_value(info.width)))
 
+    def export(self, info: ImageInfo, output_dir: str):
         json_name = os.path.splitext(info.filename)[0] + ".json"
-        save_path = os.path.join(output_dir, json_name)
+        with output_for(output_dir) as out, out.open(json_name, 'w', encoding='utf-8', newline=self.newline) as f:
+            f.write(self.serialize(info))
 
-        with open(save_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
\ No newline at end of file
+    def export_all(self, info_list: list[ImageInfo], output_dir: str, workers: int = 4, progress=None):
+        _write_all(self, info_list, output_dir, ".json", workers=workers, progress=progress)
@@ -0,0 +1,61 @@
+import os
+
+from archive import scandir
+from profiler import stage, count
+
+# NOTE: 一次 os.scandir 建立 文件名主干 (stem) -> 图片 的索引，代替对每个标注文件逐个扩展名调用 os.path.exists
+#       NFS / SMB 上 20 万个文件只需列一次目录，而不是 80 万次 stat
+
+IMG_EXTS = ['.jpg', '.png', '.jpeg', '.bmp']     # 同名图片有多个时按此顺序优先
+
+
+def _image_rank(ext: str):
+    # 扩展名不区分大小写 (Windows 上 os.path.exists 本来就不区分)，大小写完全一致的优先
+    lower = ext.lower()
+    if lower not in IMG_EXTS:
+        return None
+    return IMG_EXTS.index(lower), ext != lower
+
+
+class DirIndex:
+    def __init__(self, folder: str, label_ext: str = None, img_folder: str = None, skip=()):
+        # folder: 标注文件夹；img_folder: 图片文件夹 (默认与标注相同，此时只扫描一次)
+        # label_ext: 标注文件扩展名 (e.g. '.txt')；skip: 不算作标注的文件名 (e.g. classes.txt)
+        self.folder = folder
+        self.img_folder = img_folder or folder
+        self.labels = {}      # stem -> 标注文件名
+        self.images = {}      # stem -> os.DirEntry
+        self._ranks = {}
+        same = os.path.normcase(os.path.abspath(self.img_folder)) == os.path.normcase(os.path.abspath(folder))
+        with stage('list'):
+            self._scan(folder, label_ext, skip, with_images=same)
+            if not same:
+                self._scan(self.img_folder, None, (), with_images=True)
+        count('list', files=len(self.labels) + len(self.images))
+
+    def _scan(self, folder: str, label_ext: str, skip, with_images: bool):
+        # NOTE: folder 也可以是归档或归档中的文件夹 (e.g. "data.zip::/labels")，此时 entry 为 MemberEntry
+        for entry in scandir(folder):
+            stem, ext = os.path.splitext(entry.name)
+            if label_ext and ext == label_ext:
+                if entry.name not in skip:
+                    self.labels[stem] = entry.name
+            elif with_images:
+                rank = _image_rank(ext)
+                if rank is not None and (stem not in self._ranks or rank < self._ranks[stem]):
+                    self._ranks[stem] = rank
+                    self.images[stem] = entry
+
+    def label_files(self) -> list:
+        return sorted(self.labels.values())
+
+    def image_entry(self, stem: str):
+        return self.images.get(stem)
+
+    def orphan_labels(self) -> list:
+        # 找不到对应图片的标注文件名
+        return sorted(name for stem, name in self.labels.items() if stem not in self.images)
+
+    def orphan_images(self) -> list:
+        # 没有对应标注的图片文件名
+        return sorted(entry.name for stem, entry in self.images.items() if stem not in self.labels)
@@ -0,0 +1,355 @@
+import os
+import sys
+import errno
+import shutil
+import filecmp
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+from ir_label import ImageInfo, BBox, AnnotationTable
+from archive import split_path, read_bytes, open_binary
+from imgsize import probe_image_size
+from profiler import stage, count
+
+# NOTE: 导出时把图片放到标注旁边 (导出器只写标注)：
+#       优先 reflink (写时复制，btrfs / xfs)，其次硬链接，都不行时复制；symlink 只在明确指定时使用
+#       目标已存在且内容相同时跳过 (先比较 stat，不同时再逐字节比较)，多个线程并行处理
+#       resize / 重新编码在进程池中进行，新的宽高和按比例缩放的坐标写回 IR，标注与图片保持一致
+
+MODES = ('auto', 'reflink', 'hardlink', 'symlink', 'copy')
+IMAGE_FORMATS = {'jpg': ('.jpg', 'JPEG'), 'png': ('.png', 'PNG'), 'webp': ('.webp', 'WEBP')}
+COPY_THREADS = 8        # 链接 / 复制的线程数 (I/O 为主，与 CPU 数无关)
+STREAM_BATCH = 256      # 流式转换时每批处理的图片数
+TRANSFORM_CHUNK = 16    # 进程池每个任务处理的图片数
+
+_STRATEGIES = {
+    'auto': ('reflink', 'hardlink', 'copy'),
+    'reflink': ('reflink', 'copy'),
+    'hardlink': ('hardlink', 'copy'),
+    'symlink': ('symlink', 'copy'),
+    'copy': ('copy',),
+}
+_FICLONE = 0x40049409   # Linux ioctl: 共享数据块的克隆 (reflink)
+# NOTE: 这些错误表示该方式在这个文件系统上不可用，换下一种方式；其他错误照常抛出
+_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.ENOTTY, errno.EMLINK}
+
+
+def _reflink(src: str, dst: str):
+    if not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, "reflink 仅支持 Linux")
+    import fcntl
+    with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+        try:
+            fcntl.ioctl(fd.fileno(), _FICLONE, fs.fileno())
+        except OSError:
+            fd.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _link(method: str, src: str, dst: str):
+    if method == 'reflink':
+        _reflink(src, dst)
+    elif method == 'hardlink':
+        os.link(src, dst)
+    elif method == 'symlink':
+        os.stat(src)        # NOTE: 源图片不存在时报错，不创建悬空链接
+        os.symlink(os.path.abspath(src), dst)
+    else:
+        shutil.copy2(src, dst)      # NOTE: 保留 mtime，下次可以只比较 stat 就判断相同
+
+
+def _identical(src: str, dst: str) -> bool:
+    if not os.path.lexists(dst):
+        return False
+    if os.path.islink(dst):
+        return os.path.realpath(dst) == os.path.realpath(src)
+    archive, member = split_path(src)
+    if archive is not None:
+        from archive import get_reader
+        return get_reader(archive).size(member) == os.path.getsize(dst) and read_bytes(src) == _read_file(dst)
+    return filecmp.cmp(src, dst, shallow=True)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _target_size(size: tuple, max_size: int) -> tuple:
+    # 最长边缩小到 max_size (只缩小不放大)
+    w, h = size
+    if not max_size or max(w, h) <= max_size:
+        return w, h
+    scale = max_size / max(w, h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def _submit_ordered(pool, func, args, window: int):
+    # 按顺序产出 pool.submit(func, *a) 的 future，最多 window 个任务在排队 (与 converters._serialize_chunks 相同)；
+    # NOTE: 调用方中途停止 (progress 抛出取消) 时关闭生成器，还没开始的任务被丢弃
+    pending = deque()
+    try:
+        for a in args:
+            pending.append(pool.submit(func, *a))
+            if len(pending) >= window:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _transform_chunk(items: list, max_size: int, pil_format: str, quality: int) -> list:
+    # NOTE: 进程池的 worker 必须是模块级函数；返回 [(原宽高, 新宽高, 是否跳过) 或错误信息]
+    results = []
+    for src, dst in items:
+        try:
+            results.append(_transform(src, dst, max_size, pil_format, quality))
+        except Exception as e:
+            results.append(f"{type(e).__name__}: {e}")
+    return results
+
+
+def _transform(src: str, dst: str, max_size: int, pil_format: str, quality: int):
+    from PIL import Image
+    size = probe_image_size(src)
+    target = _target_size(size, max_size)
+    st = os.stat(src) if split_path(src)[0] is None else None
+    # NOTE: 输出的 mtime 设为源文件的 mtime，源文件没变且尺寸符合时跳过
+    if st is not None and os.path.exists(dst) and os.stat(dst).st_mtime_ns == st.st_mtime_ns \
+            and probe_image_size(dst) == target:
+        return size, target, True
+    with stage('encode'), Image.open(open_binary(src)) as img:
+        fmt = pil_format or img.format
+        if img.format == 'JPEG' and target != img.size:
+            img.draft(img.mode, target)     # JPEG 解码时直接按 1/2、1/4 ... 缩小，快很多
+        if img.size != target:
+            img = img.resize(target, Image.BILINEAR, reducing_gap=2.0)
+        if fmt == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        tmp = dst + '.tmp'
+        img.save(tmp, format=fmt, quality=quality)
+    os.replace(tmp, dst)
+    if st is not None:
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    count('encode', files=1)
+    return size, target, False
+
+
+class ImageCopier:
+    # out_dir: 图片输出文件夹；mode: 见 MODES
+    # max_size: 最长边超过时等比缩小；image_format: 'jpg' / 'png' / 'webp'，重新编码并修改扩展名
+    # workers: resize / 重新编码的进程数
+    def __init__(self, out_dir: str, mode: str = 'auto', max_size: int = None, image_format: str = None,
+                 quality: int = 90, workers: int = 1, threads: int = COPY_THREADS):
+        if mode not in MODES:
+            raise ValueError(f"不支持的图片复制方式: {mode}")
+        if image_format is not None and image_format not in IMAGE_FORMATS:
+            raise ValueError(f"不支持的图片格式: {image_format}")
+        self.out_dir = out_dir
+        self.mode = mode
+        self.max_size = max_size
+        self.image_format = image_format
+        self.quality = quality
+        self.workers = max(1, workers)
+        self.threads = threads
+        self.counts = dict.fromkeys(('reflink', 'hardlink', 'symlink', 'copy', 'encoded', 'skipped',
+                                     'missing', 'conflict'), 0)
+        self.errors = []
+        self._unsupported = set()       # 已经失败过的方式，不再尝试
+        self._targets = {}              # 输出文件名 -> 源文件，检测不同图片同名
+        self._threads = None
+        self._processes = None
+        os.makedirs(out_dir, exist_ok=True)
+
+    @property
+    def transforms(self) -> bool:
+        return bool(self.max_size or self.image_format)
+
+    def output_name(self, filename: str) -> str:
+        if self.image_format:
+            return os.path.splitext(filename)[0] + IMAGE_FORMATS[self.image_format][0]
+        return filename
+
+    # ---------- 单个文件 ----------
+    def _place(self, src: str, dst: str) -> str:
+        if _identical(src, dst):
+            return 'skipped'
+        if os.path.lexists(dst):
+            os.remove(dst)
+        if split_path(src)[0] is not None:
+            # 归档中的图片只能复制
+            with stage('copy'), open(dst, 'wb') as f:
+                f.write(read_bytes(src))
+            return 'copy'
+        for method in _STRATEGIES[self.mode]:
+            if method in self._unsupported and method != 'copy':
+                continue
+            try:
+                with stage(method):
+                    _link(method, src, dst)
+                return method
+            except OSError as e:
+                if method == 'copy' or e.errno not in _UNSUPPORTED:
+                    raise
+                self._unsupported.add(method)
+        raise AssertionError("unreachable")
+
+    # ---------- 批量 ----------
+    def _run(self, items: list, progress=None) -> list:
+        # items: [(filename, img_path)]；返回每张图片的 (新文件名, 新路径, 原宽高, 新宽高) 或 None (保持不变)
+        jobs = []
+        results = [None] * len(items)
+        for i, (filename, img_path) in enumerate(items):
+            name = self.output_name(filename)
+            dst = os.path.join(self.out_dir, name)
+            owner = self._targets.setdefault(name, img_path)
+            if owner != img_path:
+                self.counts['conflict'] += 1
+                self.errors.append(f"{filename}: 与 {owner} 输出到同一个文件，跳过")
+                continue
+            if self.transforms and os.path.abspath(dst) == os.path.abspath(img_path):
+                # NOTE: 输出目录就是图片所在目录时，resize / 重新编码会覆盖源图片
+                self.errors.append(f"{img_path}: 输出会覆盖源图片，跳过")
+                continue
+            if os.path.dirname(name):
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+            jobs.append((i, name, img_path, dst))
+        if not jobs:
+            return results
+
+        done = 0
+        if self.transforms:
+            if self._processes is None and self.workers > 1:
+                self._processes = ProcessPoolExecutor(max_workers=self.workers)
+            pil_format = IMAGE_FORMATS[self.image_format][1] if self.image_format else None
+            chunks = [jobs[k:k + TRANSFORM_CHUNK] for k in range(0, len(jobs), TRANSFORM_CHUNK)]
+            args = [([(src, dst) for _, _, src, dst in chunk], self.max_size, pil_format, self.quality)
+                    for chunk in chunks]
+            futures = None
+            if self._processes is None:
+                outputs = (_transform_chunk(*a) for a in args)
+            else:
+                futures = _submit_ordered(self._processes, _transform_chunk, args, self.workers * 2)
+                outputs = (f.result() for f in futures)
+            try:
+                for chunk, output in zip(chunks, outputs):
+                    for (i, name, src, dst), result in zip(chunk, output):
+                        if isinstance(result, str):
+                            self._failed(src, result)
+                            continue
+                        size, target, skipped = result
+                        self.counts['skipped' if skipped else 'encoded'] += 1
+                        results[i] = (name, dst, size, target)
+                    done += len(chunk)
+                    if progress: progress(done, len(jobs))
+            finally:
+                if futures is not None:
+                    futures.close()
+            return results
+
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='image-copy')
+        futures = _submit_ordered(self._threads, self._place, [(src, dst) for _, _, src, dst in jobs],
+                                  self.threads * 2)
+        try:
+            for (i, name, src, dst), future in zip(jobs, futures):
+                try:
+                    self.counts[future.result()] += 1
+                    results[i] = (name, dst, None, None)
+                except OSError as e:
+                    self._failed(src, f"{type(e).__name__}: {e}")
+                done += 1
+                if progress: progress(done, len(jobs))
+        finally:
+            futures.close()
+        return results
+
+    def _failed(self, src: str, message: str):
+        if 'FileNotFoundError' in message:
+            self.counts['missing'] += 1
+        self.errors.append(f"{src}: {message}")
+
+    # ---------- 写回 IR ----------
+    def apply_table(self, table: AnnotationTable, progress=None) -> AnnotationTable:
+        results = self._run(list(zip(table.filenames, table.img_paths)), progress)
+        filenames = list(table.filenames)
+        img_paths = list(table.img_paths)
+        sizes = table.sizes.copy()
+        scale = np.ones((table.num_images, 2), dtype=np.float64)
+        for i, result in enumerate(results):
+            if result is None:
+                continue
+            filenames[i], img_paths[i], size, target = result
+            if target is not None:
+                scale[i] = (target[0] / size[0], target[1] / size[1])
+                sizes[i] = target
+        coords = table.coords
+        int_mask = table.int_mask
+        if self.max_size:
+            box_scale = scale[table.box_image_index()]
+            coords = coords * np.hstack([box_scale, box_scale])
+            int_mask = np.where((box_scale == 1).all(axis=1), int_mask, 0)     # 缩放过的坐标都是 float
+        return AnnotationTable.from_arrays(filenames, img_paths, sizes, table.offsets, coords,
+                                           table.cat_ids, table.categories, int_mask)
+
+    def apply_infos(self, infos: list, progress=None) -> list:
+        results = self._run([(info.filename, info.img_path) for info in infos], progress)
+        out = []
+        for info, result in zip(infos, results):
+            if result is None:
+                out.append(info)
+                continue
+            name, path, size, target = result
+            width, height, boxes = info.width, info.height, info.bboxes
+            if target is not None:
+                width, height = target
+                sx, sy = target[0] / size[0], target[1] / size[1]
+                if sx != 1 or sy != 1:
+                    boxes = [BBox(box.label, box.xmin * sx, box.ymin * sy, box.xmax * sx, box.ymax * sy)
+                             for box in boxes]
+            out.append(ImageInfo(name, path, width, height, list(boxes)))
+        return out
+
+    def apply(self, data, progress=None):
+        # data: list[ImageInfo] 或 AnnotationTable，返回同类型的新数据 (原数据不修改)
+        if isinstance(data, AnnotationTable):
+            return self.apply_table(data, progress)
+        return self.apply_infos(list(data), progress)
+
+    def iter_apply(self, infos, batch_size: int = STREAM_BATCH):
+        # 流式转换：每 batch_size 张图片并行处理一次
+        batch = []
+        for info in infos:
+            batch.append(info)
+            if len(batch) >= batch_size:
+                yield from self.apply_infos(batch)
+                batch = []
+        if batch:
+            yield from self.apply_infos(batch)
+
+    def log(self, log):
+        done = [f"{key} {n}" for key, n in self.counts.items() if n]
+        log(f"图片: {'，'.join(done) or '没有图片'}。")
+        if self.errors:
+            log(f"[Warning] {len(self.errors)} 张图片没有输出: " + '; '.join(self.errors[:5])
+                + (" ..." if len(self.errors) > 5 else ""))
+
+    def close(self, cancel: bool = False):
+        # cancel: 丢弃还在排队的任务，只等正在处理的图片
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=cancel)
+        self._threads = self._processes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(cancel=exc_type is not None)
+        return False
@@ -0,0 +1,130 @@
+import os
+import json
+import struct
+
+from archive import split_path, get_reader, open_binary
+from profiler import stage, count
+
+# NOTE: 只读取文件头获取图片宽高 (JPEG SOF / PNG IHDR / BMP / GIF)，其余格式回退到 PIL
+
+SIZE_CACHE_NAME = ".unilabel_sizes.cache"   # NOTE: 不用 .json 后缀，防止被 LabelMe 导入时当成标注文件
+SIZE_CACHE_VERSION = 1
+
+# 带尺寸信息的 JPEG SOF 标记 (排除 DHT=C4, JPG=C8, DAC=CC)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# 没有长度字段的独立标记
+_JPEG_STANDALONE = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+def _read_exact(f, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise ValueError("文件头不完整")
+    return data
+
+
+def _jpeg_size(f):
+    # f 已经跳过 SOI (FFD8)
+    while True:
+        byte = _read_exact(f, 1)
+        if byte != b'\xff':
+            raise ValueError("JPEG 标记损坏")
+        marker = _read_exact(f, 1)[0]
+        while marker == 0xFF:     # 填充字节
+            marker = _read_exact(f, 1)[0]
+        if marker in _JPEG_STANDALONE:
+            continue
+        if marker == 0xD9:        # EOI
+            raise ValueError("JPEG 中没有 SOF")
+        length = struct.unpack('>H', _read_exact(f, 2))[0]
+        if marker in _JPEG_SOF:
+            _, height, width = struct.unpack('>BHH', _read_exact(f, 5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def probe_stream(f):
+    # f: 可 seek 的二进制文件对象；无法识别时返回 None
+    head = f.read(26)
+    if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+        return struct.unpack('>II', head[16:24])
+    if head[:2] == b'\xff\xd8':
+        f.seek(2)
+        try:
+            return _jpeg_size(f)
+        except (ValueError, struct.error):
+            return None
+    if head[:2] == b'BM' and len(head) >= 26:
+        header_size = struct.unpack('<I', head[14:18])[0]
+        if header_size == 12:     # BITMAPCOREHEADER
+            return struct.unpack('<HH', head[18:22])
+        width, height = struct.unpack('<ii', head[18:26])
+        return width, abs(height)     # NOTE: 高度为负表示自上而下存储
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return struct.unpack('<HH', head[6:10])
+    return None
+
+
+def probe_image_size(img_path: str):
+    archive, member = split_path(img_path)
+    with stage('probe'):
+        if archive is not None:
+            # 归档中的图片：只读取成员的文件头，不解压整张图片
+            size = get_reader(archive).image_size(member)
+        else:
+            with open(img_path, 'rb') as f:
+                size = probe_stream(f)
+        if size is None:
+            from PIL import Image     # NOTE: 仅在回退时才导入 PIL
+            with Image.open(open_binary(img_path)) as img:
+                size = img.size
+    count('probe', files=1)
+    return int(size[0]), int(size[1])
+
+
+class SizeCache:
+    # 图片尺寸的磁盘缓存，key 为 (路径, mtime, 文件大小)，文件没变就不用再打开图片
+    def __init__(self, cache_path: str = None):
+        self.cache_path = cache_path
+        self.entries = {}     # abspath -> [mtime_ns, file_size, width, height]
+        self.dirty = False
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == SIZE_CACHE_VERSION:
+                    self.entries = data.get('entries', {})
+            except (OSError, ValueError):
+                self.entries = {}     # 缓存损坏直接丢弃
+
+    @classmethod
+    def for_folder(cls, folder: str) -> 'SizeCache':
+        return cls(os.path.join(folder, SIZE_CACHE_NAME))
+
+    def get(self, img_path: str, st=None):
+        # st: os.stat_result 或 os.DirEntry (目录扫描时得到，Windows 上不用再访问文件)
+        key = os.path.abspath(img_path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        st = st.stat() if isinstance(st, os.DirEntry) else (st or os.stat(img_path))
+        if entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2], entry[3]
+        return None
+
+    def put(self, img_path: str, size, st: os.stat_result = None):
+        st = st or os.stat(img_path)
+        self.entries[os.path.abspath(img_path)] = [st.st_mtime_ns, st.st_size, int(size[0]), int(size[1])]
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty or not self.cache_path:
+            return
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': SIZE_CACHE_VERSION, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.cache_path)
+            self.dirty = False
+        except OSError:
+            pass      # NOTE: 图片目录只读时不写缓存，不影响导入
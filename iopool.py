@@ -0,0 +1,171 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from profiler import stage, count
+
+# NOTE: 高延迟存储 (NFS / 对象存储挂载) 上每个小文件的打开 / 读写都要等一次往返，逐个文件同步读写时吞吐只有每秒几百个文件
+#       这里用线程池把往返时间重叠起来：解析前按顺序预读标注文件 (read-ahead)，导出时写文件放进有界队列由后台线程完成
+#       文件 I/O 会释放 GIL，所以用线程池而不是 asyncio (标准库没有异步文件 API，asyncio 最终也是交给线程池)
+#       readers / writers 为 1 时完全同步，与不用本模块时的行为一致
+#       latency: 每次打开文件前 sleep，用本地目录模拟高延迟存储 (测试 / bench)
+
+READ_AHEAD_PER_READER = 4     # 每个读线程最多预读的文件数
+WRITE_QUEUE_PER_WRITER = 8    # 每个写线程最多排队的文件数
+
+_settings = {'readers': 1, 'writers': 1, 'latency': 0.0}
+_local = threading.local()
+
+
+def configure(readers: int = None, writers: int = None, latency: float = None):
+    # readers / writers: 并发读 / 写的线程数；latency: 模拟的每个文件往返延迟 (秒)
+    if readers is not None:
+        _settings['readers'] = max(1, readers)
+    if writers is not None:
+        _settings['writers'] = max(1, writers)
+    if latency is not None:
+        _settings['latency'] = max(0.0, latency)
+
+
+def settings() -> dict:
+    # 当前设置的副本，随任务一起交给解析子进程 (spawn 启动的子进程不继承模块状态)
+    return dict(_settings)
+
+
+def delay():
+    if _settings['latency']:
+        time.sleep(_settings['latency'])
+
+
+class ReadAhead:
+    # 按 paths 的顺序在后台预读，最多 window 个文件在路上；take(path) 取走一个后补满窗口
+    # NOTE: 消费者按 paths 的顺序读取，但可能跳过一些文件 (解析前出错 / 被过滤)：
+    #       命中时排在它前面还没取走的都已经被跳过，取消并丢弃；取到窗口之后的文件时整个窗口都被跳过，从它之后重新预读
+    #       否则跳过的文件会一直占着窗口，预读越来越少直到完全失效
+    def __init__(self, paths, read, readers: int, window: int = None):
+        self._paths = list(paths)
+        self._order = {}
+        for i, path in enumerate(self._paths):
+            self._order.setdefault(path, i)
+        self._next = 0
+        self._read = read
+        self._window = window or readers * READ_AHEAD_PER_READER
+        self._pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='read-ahead')
+        self._futures = {}      # 按提交顺序
+        self._fill()
+
+    def _fill(self):
+        while len(self._futures) < self._window and self._next < len(self._paths):
+            path = self._paths[self._next]
+            self._next += 1
+            if path not in self._futures:
+                self._futures[path] = self._pool.submit(self._read, path)
+
+    def _drop(self, paths):
+        for path in paths:
+            self._futures.pop(path).cancel()
+
+    def take(self, path: str):
+        # 预读过的文件返回 bytes (读取出错时在这里抛出，与直接读取相同)，否则返回 None
+        future = self._futures.get(path)
+        if future is None:
+            i = self._order.get(path)
+            if i is not None and i >= self._next:
+                self._drop(list(self._futures))
+                self._next = i + 1
+                self._fill()
+            return None     # NOTE: 不在 paths 中的文件 (图片 / classes.txt 等) 不影响预读
+        skipped = []
+        for queued in self._futures:
+            if queued == path:
+                break
+            skipped.append(queued)
+        self._drop(skipped)
+        del self._futures[path]
+        self._fill()
+        return future.result()
+
+    def close(self):
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._pool.shutdown(wait=True)
+
+
+@contextmanager
+def read_ahead(paths, read):
+    # with read_ahead(paths, read_raw): ... 期间本线程的 archive.read_bytes / read_text 优先取预读的内容
+    # NOTE: readers 为 1 时什么都不做；预读对象放在线程局部变量里，流式转换的后台线程互不影响
+    if _settings['readers'] <= 1:
+        yield None
+        return
+    ahead = ReadAhead(paths, read, _settings['readers'])
+    previous = getattr(_local, 'ahead', None)
+    _local.ahead = ahead
+    try:
+        yield ahead
+    finally:
+        _local.ahead = previous
+        ahead.close()
+
+
+def take(path: str):
+    ahead = getattr(_local, 'ahead', None)
+    return ahead.take(path) if ahead is not None else None
+
+
+class WriteQueue:
+    # 导出器的写文件队列：write() 把文本交给后台线程后立即返回；排队的文件数有上限，满了时 write() 等待
+    # out: archive.DirWriter / ArchiveWriter；writers 为 1 时在调用线程中同步写入
+    # NOTE: 后台写入出错时在之后的 write() 或 close() 中抛出
+    def __init__(self, out, writers: int = None):
+        self._out = out
+        writers = writers or _settings['writers']
+        self._pool = ThreadPoolExecutor(max_workers=writers, thread_name_prefix='write') if writers > 1 else None
+        self._maxsize = writers * WRITE_QUEUE_PER_WRITER
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def write(self, name: str, text: str, encoding: str = None, newline: str = None, boxes: int = 0):
+        if self._pool is None:
+            self._write(name, text, encoding, newline, boxes)
+            return
+        future = self._pool.submit(self._write, name, text, encoding, newline, boxes)
+        with self._lock:
+            self._pending.append(future)
+            full = []
+            while self._pending and (self._pending[0].done() or len(self._pending) > self._maxsize):
+                full.append(self._pending.popleft())
+        for future in full:
+            future.result()
+
+    def _write(self, name: str, text: str, encoding: str, newline: str, boxes: int):
+        delay()
+        with stage('write'), self._out.open(name, 'w', encoding=encoding, newline=newline) as f:
+            f.write(text)
+        count('write', files=1, boxes=boxes, bytes_written=len(text))
+
+    def close(self, cancel: bool = False):
+        if self._pool is None:
+            return
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        try:
+            for future in pending:
+                if cancel:
+                    future.cancel()
+                else:
+                    future.result()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 出错 / 取消时丢弃还没开始的写入，只等正在写的结束
+        self.close(cancel=exc_type is not None)
+        return False
@@ -1,8 +1,11 @@
 from dataclasses import dataclass, field
 from typing import List, Optional
 
+import numpy as np
+
 @dataclass
 class BBox:
+    __slots__ = ('label', 'xmin', 'ymin', 'xmax', 'ymax')    # NOTE: 千万级框时节省内存
     label: str   # 类别名称 (统一用字符串，避免ID混乱)
     xmin: float  # 绝对坐标
     ymin: float
@@ -30,3 +33,353 @@ class ImageInfo:
     width: int      # 图片真实宽
     height: int     # 图片真实高
     bboxes: List[BBox] = field(default_factory=list)
+
+
+# =================== 批量坐标转换 (NumPy) =================
+# NOTE: 运算顺序与 BBox.to_yolo / YOLOImporter 逐框计算完全一致，结果逐位相同
+#       img_w / img_h 可以是标量 (单个文件) 或每个框一个值的数组 (整个数据集一次算完)
+
+def xyxy_to_yolo(coords, img_w, img_h) -> np.ndarray:
+    # (k, 4) 绝对坐标 [xmin, ymin, xmax, ymax] -> 归一化 [cx, cy, w, h]
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+    out = np.empty_like(coords)
+    out[:, 0] = (coords[:, 0] + coords[:, 2]) / 2.0 / img_w
+    out[:, 1] = (coords[:, 1] + coords[:, 3]) / 2.0 / img_h
+    out[:, 2] = (coords[:, 2] - coords[:, 0]) / img_w
+    out[:, 3] = (coords[:, 3] - coords[:, 1]) / img_h
+    return out
+
+
+def yolo_to_xyxy(cxcywh, img_w, img_h) -> np.ndarray:
+    # (k, 4) 归一化 [cx, cy, w, h] -> 绝对坐标 [xmin, ymin, xmax, ymax]
+    cxcywh = np.asarray(cxcywh, dtype=np.float64).reshape(-1, 4)
+    out = np.empty_like(cxcywh)
+    out[:, 0] = (cxcywh[:, 0] - cxcywh[:, 2] / 2) * img_w
+    out[:, 1] = (cxcywh[:, 1] - cxcywh[:, 3] / 2) * img_h
+    out[:, 2] = (cxcywh[:, 0] + cxcywh[:, 2] / 2) * img_w
+    out[:, 3] = (cxcywh[:, 1] + cxcywh[:, 3] / 2) * img_h
+    return out
+
+
+# =================== 列式存储 (Columnar IR) =================
+# NOTE: 坐标存在 NumPy 数组里，类别名称只存一份 (category id)，每张图片的框用 offsets 切片
+#       BBoxView / ImageInfoView 是 BBox / ImageInfo 的子类，直接读写表里的数组 (零拷贝)，
+#       所以现有的导出器不用修改就能直接读 AnnotationTable
+
+_NO_SIZE = -1   # 宽高未知 (e.g. LabelMe 没有 imageWidth) 时的占位值
+
+# NOTE: int_mask 是有意保留的输出兼容约定 (其他模块只引用这里)：
+#       list IR 中来自 json (LabelMe / COCO) 的整数坐标是 int，导出时写成 "1" 而不是 "1.0"；表中坐标统一存成 float64，
+#       int_mask 每个框一个字节，第 j 位表示第 j 个坐标原来是整数，BBoxView 和 COCOExporter.export_table 据此还原为 int，
+#       所以 list / 列式 / 快照 / 流式各路径的输出逐字节一致 (tests/test_table.py::test_int_mask_contract)
+#       重建表的阶段 (from_arrays) 按与坐标相同的行传递 int_mask；改写了坐标 (e.g. 缩放) 的框对应位清零；
+#       不传时全部按 float 输出
+
+
+def _int_bits(row) -> int:
+    bits = 0
+    for j, v in enumerate(row):
+        if type(v) is int:
+            bits |= 1 << j
+    return bits
+
+
+def as_python(values: np.ndarray, is_int: np.ndarray) -> list:
+    # values.tolist()，但 is_int 为 True 且值是整数的元素变成 int (与 list IR 中的类型一致)
+    if not is_int.any():
+        return values.tolist()
+    is_int = is_int & (values == np.floor(values))
+    out = values.astype(object)
+    out[is_int] = values[is_int].astype(np.int64).astype(object)
+    return out.tolist()
+
+
+class BBoxView(BBox):
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table: 'AnnotationTable', row: int):
+        self._table = table
+        self._row = row
+
+    def __repr__(self):
+        return (f"BBoxView(label={self.label!r}, xmin={self.xmin}, ymin={self.ymin}, "
+                f"xmax={self.xmax}, ymax={self.ymax})")
+
+    def __eq__(self, other):
+        # NOTE: 与普通 BBox 按字段比较
+        if not isinstance(other, BBox):
+            return NotImplemented
+        return ((self.label, self.xmin, self.ymin, self.xmax, self.ymax) ==
+                (other.label, other.xmin, other.ymin, other.xmax, other.ymax))
+
+    @property
+    def label(self): return self._table.categories[self._table._cat_ids[self._row]]
+
+    @label.setter
+    def label(self, value): self._table._cat_ids[self._row] = self._table.intern(value)
+
+    @property
+    def xmin(self): return self._table._coord(self._row, 0)
+
+    @xmin.setter
+    def xmin(self, value): self._table._set_coord(self._row, 0, value)
+
+    @property
+    def ymin(self): return self._table._coord(self._row, 1)
+
+    @ymin.setter
+    def ymin(self, value): self._table._set_coord(self._row, 1, value)
+
+    @property
+    def xmax(self): return self._table._coord(self._row, 2)
+
+    @xmax.setter
+    def xmax(self, value): self._table._set_coord(self._row, 2, value)
+
+    @property
+    def ymax(self): return self._table._coord(self._row, 3)
+
+    @ymax.setter
+    def ymax(self, value): self._table._set_coord(self._row, 3, value)
+
+
+class _BoxList:
+    # 一张图片的框序列，按需生成 BBoxView
+    __slots__ = ('_table', '_start', '_stop')
+
+    def __init__(self, table: 'AnnotationTable', start: int, stop: int):
+        self._table = table
+        self._start = start
+        self._stop = stop
+
+    def __len__(self): return self._stop - self._start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return BBoxView(self._table, self._start + i)
+
+    def __iter__(self):
+        for row in range(self._start, self._stop):
+            yield BBoxView(self._table, row)
+
+    def __repr__(self): return repr(list(self))
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, _BoxList)):
+            return NotImplemented
+        return list(self) == list(other)
+
+
+class ImageInfoView(ImageInfo):
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'AnnotationTable', index: int):
+        self._table = table
+        self._index = index
+
+    def __repr__(self):
+        return (f"ImageInfoView(filename={self.filename!r}, width={self.width}, "
+                f"height={self.height}, bboxes={len(self.bboxes)})")
+
+    def __eq__(self, other):
+        # NOTE: 与普通 ImageInfo 按字段比较
+        if not isinstance(other, ImageInfo):
+            return NotImplemented
+        return ((self.filename, self.img_path, self.width, self.height) ==
+                (other.filename, other.img_path, other.width, other.height) and
+                list(self.bboxes) == list(other.bboxes))
+
+    @property
+    def filename(self): return self._table.filenames[self._index]
+
+    @property
+    def img_path(self): return self._table.img_paths[self._index]
+
+    @property
+    def width(self):
+        w = int(self._table._sizes[self._index, 0])
+        return None if w == _NO_SIZE else w
+
+    @width.setter
+    def width(self, value): self._table._sizes[self._index, 0] = _NO_SIZE if value is None else value
+
+    @property
+    def height(self):
+        h = int(self._table._sizes[self._index, 1])
+        return None if h == _NO_SIZE else h
+
+    @height.setter
+    def height(self, value): self._table._sizes[self._index, 1] = _NO_SIZE if value is None else value
+
+    @property
+    def bboxes(self):
+        offsets = self._table._offsets
+        return _BoxList(self._table, int(offsets[self._index]), int(offsets[self._index + 1]))
+
+    def box_slice(self) -> slice:
+        return self._table.box_slice(self._index)
+
+
+class AnnotationTable:
+    # 列式 IR：
+    #   图片级: filenames / img_paths (list[str])，sizes (N, 2) int64 [宽, 高]，offsets (N + 1,) int64
+    #   框级:   coords (M, 4) float64 [xmin, ymin, xmax, ymax]，cat_ids (M,) int32，int_mask (M,) uint8 (见上)
+    #   第 i 张图片的框为 coords[offsets[i]:offsets[i + 1]]
+    def __init__(self, capacity: int = 1024):
+        self.filenames: list[str] = []
+        self.img_paths: list[str] = []
+        self.categories: list[str] = []     # category id -> 名称
+        self._cat_index: dict = {}          # 名称 -> category id
+        self._sizes = np.empty((16, 2), dtype=np.int64)
+        self._offsets = np.zeros(17, dtype=np.int64)
+        self._coords = np.empty((capacity, 4), dtype=np.float64)
+        self._cat_ids = np.empty(capacity, dtype=np.int32)
+        self._int_mask = np.zeros(capacity, dtype=np.uint8)
+        self.num_images = 0
+        self.num_boxes = 0
+
+    # ---------- 写入 ----------
+    def intern(self, label: str) -> int:
+        cat_id = self._cat_index.get(label)
+        if cat_id is None:
+            cat_id = self._cat_index[label] = len(self.categories)
+            self.categories.append(label)
+        return cat_id
+
+    def _reserve(self, n_images: int, n_boxes: int):
+        # NOTE: 容量不够时按两倍扩容 (类似 list)，均摊 O(1)
+        need = self.num_images + n_images
+        if need > len(self._sizes):
+            cap = max(need, 2 * len(self._sizes))
+            self._sizes = np.resize(self._sizes, (cap, 2))
+            offsets = np.zeros(cap + 1, dtype=np.int64)
+            offsets[:self.num_images + 1] = self._offsets[:self.num_images + 1]
+            self._offsets = offsets
+        need = self.num_boxes + n_boxes
+        if need > len(self._coords):
+            cap = max(need, 2 * len(self._coords))
+            self._coords = np.resize(self._coords, (cap, 4))
+            self._cat_ids = np.resize(self._cat_ids, cap)
+            self._int_mask = np.resize(self._int_mask, cap)
+
+    def add_image(self, filename: str, img_path: str, width, height,
+                  labels=(), coords=None) -> int:
+        # labels: 每个框的类别名称 (或已经 intern 过的 category id 数组)
+        # coords: (k, 4) 的 xyxy 坐标，可以是 NumPy 数组或 list (list 中的 int 记在 int_mask 里)
+        k = len(labels)
+        self._reserve(1, k)
+        i = self.num_images
+        self.filenames.append(filename)
+        self.img_paths.append(img_path)
+        self._sizes[i, 0] = _NO_SIZE if width is None else width
+        self._sizes[i, 1] = _NO_SIZE if height is None else height
+        if k:
+            start = self.num_boxes
+            self._coords[start:start + k] = coords
+            self._int_mask[start:start + k] = 0 if isinstance(coords, np.ndarray) else [_int_bits(row) for row in coords]
+            if isinstance(labels, np.ndarray):
+                self._cat_ids[start:start + k] = labels
+            else:
+                self._cat_ids[start:start + k] = [self.intern(label) for label in labels]
+            self.num_boxes += k
+        self.num_images += 1
+        self._offsets[self.num_images] = self.num_boxes
+        return i
+
+    def add_info(self, info: ImageInfo) -> int:
+        boxes = info.bboxes
+        return self.add_image(info.filename, info.img_path, info.width, info.height,
+                              [box.label for box in boxes],
+                              [(box.xmin, box.ymin, box.xmax, box.ymax) for box in boxes])
+
+    def extend(self, infos):
+        for info in infos:
+            self.add_info(info)
+        return self
+
+    @classmethod
+    def from_arrays(cls, filenames: list, img_paths: list, sizes, offsets, coords, cat_ids,
+                    categories: list, int_mask=None) -> 'AnnotationTable':
+        # 直接由列数据构建 (例如 COCO 导入时一次性分组)，不创建任何 BBox 对象
+        # int_mask: 见 _int_bits 上方的说明，None 为全部是 float
+        table = cls(capacity=0)
+        table.filenames = list(filenames)
+        table.img_paths = list(img_paths)
+        table.categories = list(categories)
+        table._cat_index = {name: i for i, name in enumerate(table.categories)}
+        table._sizes = np.asarray(sizes, dtype=np.int64).reshape(-1, 2)
+        table._offsets = np.asarray(offsets, dtype=np.int64)
+        table._coords = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+        table._cat_ids = np.asarray(cat_ids, dtype=np.int32)
+        table.num_images = len(table.filenames)
+        table.num_boxes = len(table._coords)
+        table._int_mask = np.zeros(table.num_boxes, dtype=np.uint8) if int_mask is None else \
+            np.asarray(int_mask, dtype=np.uint8)
+        return table
+
+    @classmethod
+    def from_infos(cls, infos) -> 'AnnotationTable':
+        # infos 可以是生成器，每个 ImageInfo 加入后即可释放
+        return cls().extend(infos)
+
+    # ---------- 读取 ----------
+    def __len__(self): return self.num_images
+
+    def __getitem__(self, i) -> ImageInfoView:
+        if isinstance(i, slice):
+            return [ImageInfoView(self, j) for j in range(*i.indices(self.num_images))]
+        if i < 0:
+            i += self.num_images
+        if not 0 <= i < self.num_images:
+            raise IndexError(i)
+        return ImageInfoView(self, i)
+
+    def __iter__(self):
+        for i in range(self.num_images):
+            yield ImageInfoView(self, i)
+
+    @property
+    def coords(self) -> np.ndarray: return self._coords[:self.num_boxes]
+
+    @property
+    def cat_ids(self) -> np.ndarray: return self._cat_ids[:self.num_boxes]
+
+    @property
+    def int_mask(self) -> np.ndarray: return self._int_mask[:self.num_boxes]
+
+    def coord_is_int(self) -> np.ndarray:
+        # (M, 4) bool：坐标原来是整数
+        return (self.int_mask[:, None] >> np.arange(4, dtype=np.uint8) & 1).astype(bool)
+
+    def _coord(self, row: int, j: int):
+        v = float(self._coords[row, j])
+        return int(v) if self._int_mask[row] >> j & 1 and v.is_integer() else v
+
+    def _set_coord(self, row: int, j: int, value):
+        self._coords[row, j] = value
+        if type(value) is int:
+            self._int_mask[row] |= 1 << j
+        else:
+            self._int_mask[row] &= ~(1 << j) & 0xFF
+
+    @property
+    def sizes(self) -> np.ndarray: return self._sizes[:self.num_images]
+
+    @property
+    def offsets(self) -> np.ndarray: return self._offsets[:self.num_images + 1]
+
+    def box_slice(self, i: int) -> slice:
+        return slice(int(self._offsets[i]), int(self._offsets[i + 1]))
+
+    def box_image_index(self) -> np.ndarray:
+        # 每个框所属的图片下标 (M,)
+        return np.repeat(np.arange(self.num_images), np.diff(self.offsets))
+
+    def labels(self) -> np.ndarray:
+        # 每个框的类别名称 (object 数组)
+        return np.asarray(self.categories, dtype=object)[self.cat_ids]
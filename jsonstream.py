@@ -0,0 +1,140 @@
+import io
+import re
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# NOTE: 流式读取 {"key": [obj, obj, ...], ...} 结构的大 JSON (COCO)
+#       只把缓冲区 (约 CHUNK_SIZE) 中的元素放进内存，峰值内存与 JSON 文本大小无关
+#       默认每个元素用标准库 json.JSONDecoder.raw_decode (C 实现的 scanner) 解析，
+#       实测比 ijson 的事件流 + ObjectBuilder 快一倍 (ijson 的 C items() 每次只能取一个 section，要读三遍文件)
+#       安装了 orjson 时，缓冲区中到最后一个 "}, {" 为止的完整元素拼成一个数组交给 orjson 一次解析；
+#       切点不在顶层元素之间时 (字符串中、嵌套的对象列表中) 拼出的文本一定不是合法 JSON，
+#       此时这个 section 退回 raw_decode，所以两条路径的结果完全一致 (NaN、超出 64 位的整数等 orjson 不支持的也一样)
+
+CHUNK_SIZE = 1 << 20
+_WS = re.compile(r'[ \t\n\r]*')
+_BOUNDARY = re.compile(r'\}[ \t\n\r]*(,)[ \t\n\r]*\{')
+_decoder = json.JSONDecoder()
+
+
+def _last_boundary(buf: str, start: int) -> int:
+    # buf[start:] 中最后一个 "}, {" 的逗号位置，没有时返回 -1；从末尾开始找，窗口逐次加倍
+    window = 1 << 12
+    while True:
+        lo = max(start, len(buf) - window)
+        m = None
+        for m in _BOUNDARY.finditer(buf, lo):
+            pass
+        if m is not None:
+            return m.start(1)
+        if lo == start:
+            return -1
+        window *= 2
+
+
+class _Reader:
+    # 在一个滑动的文本缓冲区上调用 raw_decode
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.fast = orjson is not None
+
+    def fill(self, size: int = 0):
+        chunk = self.f.read(max(self.chunk_size, size))
+        if not chunk:
+            self.eof = True
+            return
+        if self.pos > self.chunk_size:
+            # 丢掉已经消费的部分，避免缓冲区无限增长
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ''
+            self.fill()
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError(f"JSON 格式错误: 期望 {chars!r}，实际为 {c!r} (位置 {self.pos})")
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # NOTE: 值刚好在缓冲区末尾时可能被截断 (e.g. 数字 12|3)，再读一块确认
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # NOTE: 值比缓冲区大时 (e.g. 巨大的 info / segmentation)，每次多读与未消费部分相同的长度，
+            #       缓冲区按倍数增长，重复 raw_decode 的总量与值的长度成线性关系
+            self.fill(len(self.buf) - self.pos)
+
+    def batch(self):
+        # orjson 一次解析缓冲区中到最后一个 "}, {" 为止的完整元素，pos 停在分隔的逗号上；
+        # 没有切点时返回 None (由 value() 解析一个元素)，解析失败时这个 section 不再尝试
+        self.peek()
+        cut = _last_boundary(self.buf, self.pos)
+        if cut < 0:
+            return None
+        try:
+            items = orjson.loads('[' + self.buf[self.pos:cut] + ']')
+        except orjson.JSONDecodeError:
+            self.fast = False
+            return None
+        self.pos = cut
+        return items
+
+
+def _iter_objects(f, sections):
+    reader = _Reader(f)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key in sections and reader.peek() == '[':
+            reader.pos += 1
+            reader.fast = orjson is not None
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    items = reader.batch() if reader.fast else None
+                    if items is None:
+                        yield key, reader.value()
+                    else:
+                        for item in items:
+                            yield key, item
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            reader.value()      # 跳过 info / licenses 等不需要的字段
+        if reader.expect(',}') == '}':
+            return
+
+
+def iter_sections(f, sections):
+    # f: 二进制模式打开的 UTF-8 JSON 文件
+    # 依次产出 (section, 元素)，顺序与文件中一致
+    return _iter_objects(io.TextIOWrapper(f, encoding='utf-8'), set(sections))
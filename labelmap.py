@@ -0,0 +1,137 @@
+import json
+
+import numpy as np
+
+from ir_label import ImageInfo, BBox, AnnotationTable
+from archive import read_text
+
+# NOTE: 转换时合并 / 重命名 / 删除 / 重新排序类别，配置来自映射文件：
+#       文本格式，每行一条规则，# 之后为注释：
+#           cat -> animal       # 重命名 (多个类别映射到同一个名字即合并)
+#           dog -> animal
+#           person              # 保留原名
+#           bicycle -> -        # 删除
+#           * -> -              # 其余未列出的类别：删除 (默认)；"*" 单独一行表示保留原名
+#       也可以是 json 对象 {"cat": "animal", "bicycle": null, "*": null}
+#       输出类别的顺序 (YOLO 类别 id / COCO category id) 为目标名称在文件中第一次出现的顺序；
+#       未列出的类别被删除时类别列表是固定的，导出器不用再预扫描所有框收集类别
+
+DROP = '-'
+OTHERS = '*'
+
+
+class LabelMap:
+    def __init__(self, rules: list, keep_others: bool = False):
+        # rules: [(原类别, 新类别或 None)]，None 为删除
+        self.mapping = {}
+        self.classes = []
+        for old, new in rules:
+            if old in self.mapping:
+                raise ValueError(f"类别映射重复: {old}")
+            self.mapping[old] = new
+            if new is not None and new not in self.classes:
+                self.classes.append(new)
+        self.keep_others = keep_others
+        self.renamed = 0
+        self.dropped = 0
+
+    @classmethod
+    def load(cls, path: str) -> 'LabelMap':
+        text = read_text(path, encoding='utf-8')
+        if path.lower().endswith('.json'):
+            rules = []
+            keep_others = False
+            for old, new in json.loads(text).items():
+                if new is not None and not isinstance(new, str):
+                    raise ValueError(f"无效的类别映射: {old!r}: {new!r}")
+                if old == OTHERS:
+                    keep_others = new is not None
+                else:
+                    rules.append((old, new))
+            return cls(rules, keep_others)
+        return cls.parse(text)
+
+    @classmethod
+    def parse(cls, text: str) -> 'LabelMap':
+        rules = []
+        keep_others = False
+        for lineno, line in enumerate(text.splitlines(), 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if '->' in line:
+                old, new = (part.strip() for part in line.split('->', 1))
+                if not old:
+                    raise ValueError(f"类别映射第 {lineno} 行缺少原类别: {line}")
+                new = None if new in ('', DROP) else new
+            else:
+                old = new = line
+            if old == OTHERS:
+                keep_others = new is not None
+            else:
+                rules.append((old, new))
+        return cls(rules, keep_others)
+
+    def class_list(self):
+        # 导出时固定的类别列表；保留未列出的类别时事先不知道全部类别，返回 None
+        return None if self.keep_others else list(self.classes)
+
+    def map_label(self, label: str):
+        # 新类别名，删除时返回 None
+        if label in self.mapping:
+            return self.mapping[label]
+        return label if self.keep_others else None
+
+    def apply_table(self, table: AnnotationTable) -> AnnotationTable:
+        # 一次处理整个表：类别表重新映射，删除的框用掩码去掉
+        names = [self.map_label(name) for name in table.categories]
+        categories = list(self.classes)
+        index = {name: i for i, name in enumerate(categories)}
+        lookup = np.full(max(len(names), 1), -1, dtype=np.int64)
+        for i, name in enumerate(names):
+            if name is None:
+                continue
+            if name not in index:
+                index[name] = len(categories)
+                categories.append(name)
+            lookup[i] = index[name]
+        new_ids = lookup[table.cat_ids]
+        keep = new_ids >= 0
+        changed = np.array([new is not None and new != old for old, new in zip(table.categories, names)]
+                           or [False], dtype=bool)
+        self.renamed += int(np.count_nonzero(changed[table.cat_ids] & keep))
+        self.dropped += int(table.num_boxes - np.count_nonzero(keep))
+        box_img = table.box_image_index()[keep]
+        offsets = np.zeros(table.num_images + 1, dtype=np.int64)
+        np.cumsum(np.bincount(box_img, minlength=table.num_images), out=offsets[1:])
+        return AnnotationTable.from_arrays(table.filenames, table.img_paths, table.sizes, offsets,
+                                           table.coords[keep], new_ids[keep].astype(np.int32), categories,
+                                           table.int_mask[keep])
+
+    def apply_info(self, info: ImageInfo) -> ImageInfo:
+        boxes = []
+        for box in info.bboxes:
+            label = self.map_label(box.label)
+            if label is None:
+                self.dropped += 1
+                continue
+            if label != box.label:
+                self.renamed += 1
+                box = BBox(label, box.xmin, box.ymin, box.xmax, box.ymax)
+            boxes.append(box)
+        # NOTE: 输入可能是表的视图 (ImageInfoView)，总是返回新的 ImageInfo，不修改原数据
+        return ImageInfo(info.filename, info.img_path, info.width, info.height, boxes)
+
+    def apply(self, data):
+        # data: list[ImageInfo] 或 AnnotationTable，返回同类型
+        if isinstance(data, AnnotationTable):
+            return self.apply_table(data)
+        return [self.apply_info(info) for info in data]
+
+    def iter_apply(self, infos):
+        # 流式转换时逐张处理
+        for info in infos:
+            yield self.apply_info(info)
+
+    def log(self, log):
+        log(f"类别映射：重命名 {self.renamed} 个框，删除 {self.dropped} 个框。")
@@ -1,16 +1,20 @@
 import sys
 import os
 import time
+from contextlib import nullcontext
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QHBoxLayout, QPushButton, QLabel, QFileDialog,
                                QComboBox, QMessageBox, QProgressBar, QGroupBox,
-                               QTextEdit, QSplitter)
-from PySide6.QtCore import Qt, QThread, Signal
+                               QTextEdit, QSplitter, QSpinBox, QCheckBox)
+from PySide6.QtCore import Qt, QThread, Signal, QTimer
 from PySide6.QtGui import QFont
 
 from ir_label import ImageInfo
-from converters import (VOCImporter, YOLOImporter, COCOImporter, LabelMeImporter,
-                        VOCExporter, YOLOExporter, COCOExporter, LabelMeExporter)
+from unilabel import load_dataset, open_lazy, export_dataset, copy_images, ConversionCancelled
+from stats import DatasetIndex
+from snapshot import cache_dir
+from preview import PreviewList
+import profiler
 
 # QSS
 STYLESHEET = """
@@ -78,6 +82,61 @@ QTextEdit {
 }
 """
 
+class TaskWorker(QThread):
+    # 在后台线程中运行导入 / 导出，界面线程只接收信号
+    progress = Signal(int, int, float, float)   # 已完成, 总数, 速率 (个/秒), 剩余秒数 (-1 表示未知)
+    message = Signal(str)
+    succeeded = Signal(object)
+    partial = Signal(object)    # 任务中途先给出的结果 (e.g. 加载时的按需解析预览)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    PROGRESS_INTERVAL = 0.1     # NOTE: 进度信号节流，最多每 100ms 发一次
+
+    def __init__(self, task, parent=None, profile: bool = False):
+        # task(worker): 在工作线程中执行，用 worker.report 作为引擎的 progress 回调、worker.message.emit 作为 log
+        # profile: 记录各阶段耗时，结束后把统计表发到日志
+        super().__init__(parent)
+        self.task = task
+        self.profile = profile
+        self._cancel = False
+        self._started = 0.0
+        self._last_emit = 0.0
+
+    def cancel(self):
+        self._cancel = True
+
+    def report(self, done, total):
+        if self._cancel:
+            raise ConversionCancelled()     # 引擎在两个文件之间回调，这里抛出即可干净地停止
+        now = time.perf_counter()
+        if now - self._last_emit < self.PROGRESS_INTERVAL and done < total:
+            return
+        self._last_emit = now
+        elapsed = now - self._started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if rate > 0 and total else -1.0
+        self.progress.emit(done, total, rate, eta)
+
+    def run(self):
+        self._started = time.perf_counter()
+        session = None
+        try:
+            with (profiler.profile() if self.profile else nullcontext()) as session:
+                result = self.task(self)
+        except ConversionCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+        finally:
+            if session is not None:
+                self.message.emit("各阶段耗时:\n" + session.summary())
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -87,6 +146,15 @@ class MainWindow(QMainWindow):
 
         # IR数据模型
         self.current_data: list[ImageInfo] = []
+        self.current_index: DatasetIndex = None     # 加载时同时构建的统计 / 索引，见 stats.py
+        self.worker = None
+
+        # 日志批量刷新，避免每条消息都重绘界面
+        self._log_buffer = []
+        self._log_timer = QTimer(self)
+        self._log_timer.setSingleShot(True)
+        self._log_timer.setInterval(200)
+        self._log_timer.timeout.connect(self.flush_log)
 
         self.init_ui()
 
@@ -112,6 +180,21 @@ class MainWindow(QMainWindow):
         self.btn_load.clicked.connect(self.load_data)
         layout_input.addWidget(self.btn_load)
 
+        layout_input.addWidget(QLabel("进程数(Workers):"))
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setRange(1, os.cpu_count() or 1)
+        self.spin_workers.setValue(1)
+        layout_input.addWidget(self.spin_workers)
+
+        self.chk_profile = QCheckBox("性能统计")
+        self.chk_profile.setToolTip("记录目录扫描 / 读取 / 解析 / 序列化 / 写入等各阶段的耗时，完成后输出到日志")
+        layout_input.addWidget(self.chk_profile)
+
+        self.chk_snapshot = QCheckBox("快照缓存")
+        self.chk_snapshot.setChecked(True)
+        self.chk_snapshot.setToolTip(f"解析结果保存到缓存目录 ({cache_dir()})，源文件没变时再次打开直接加载")
+        layout_input.addWidget(self.chk_snapshot)
+
         self.lbl_count = QLabel("未加载数据")
         self.lbl_count.setStyleSheet("color: #666; font-style: italic;")
         layout_input.addWidget(self.lbl_count)
@@ -138,6 +221,10 @@ class MainWindow(QMainWindow):
         self.lbl_out_path.setStyleSheet("color: #666;")
         layout_output.addWidget(self.lbl_out_path)
 
+        self.chk_images = QCheckBox("复制图片")
+        self.chk_images.setToolTip("把图片链接 / 复制到输出目录 (同一文件系统上优先 reflink / 硬链接，不占额外空间)")
+        layout_output.addWidget(self.chk_images)
+
         layout_output.addStretch()
         group_output.setLayout(layout_output)
         main_layout.addWidget(group_output)
@@ -152,14 +239,28 @@ class MainWindow(QMainWindow):
         self.btn_convert.clicked.connect(self.run_conversion)
         layout_action.addWidget(self.btn_convert)
 
+        layout_progress = QHBoxLayout()
         self.progress_bar = QProgressBar()
         self.progress_bar.setValue(0)
         self.progress_bar.setTextVisible(True)
-        layout_action.addWidget(self.progress_bar)
+        layout_progress.addWidget(self.progress_bar, 1)
+
+        self.btn_cancel = QPushButton("取消 (Cancel)")
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_task)
+        layout_progress.addWidget(self.btn_cancel)
+        layout_action.addLayout(layout_progress)
 
         main_layout.addLayout(layout_action)
 
         # 4
+        # NOTE: 预览列表只解析 / 解码 / 绘制可见的行，见 preview.py
+        group_preview = QGroupBox("数据预览 (Preview)")
+        layout_preview = QVBoxLayout()
+        self.preview = PreviewList()
+        layout_preview.addWidget(self.preview)
+        group_preview.setLayout(layout_preview)
+
         group_log = QGroupBox("运行日志 (Log)")
         layout_log = QVBoxLayout()
         self.txt_log = QTextEdit()
@@ -167,91 +268,157 @@ class MainWindow(QMainWindow):
         layout_log.addWidget(self.txt_log)
         group_log.setLayout(layout_log)
 
-        main_layout.addWidget(group_log, 1)
+        splitter = QSplitter(Qt.Horizontal)
+        splitter.addWidget(group_preview)
+        splitter.addWidget(group_log)
+        splitter.setSizes([450, 450])
+        main_layout.addWidget(splitter, 1)
 
         self.output_dir = ""
 
     def log(self, message):
         timestamp = time.strftime("[%H:%M:%S] ", time.localtime())
-        self.txt_log.append(timestamp + message)
+        self._log_buffer.append(timestamp + message)
+        if not self._log_timer.isActive():
+            self._log_timer.start()
+
+    def flush_log(self):
+        if not self._log_buffer:
+            return
+        self.txt_log.append("\n".join(self._log_buffer))
+        self._log_buffer.clear()
         sb = self.txt_log.verticalScrollBar()
         sb.setValue(sb.maximum())
-        QApplication.processEvents() # 强制刷新UI，防止卡死
+
+    def update_progress(self, done, total, rate, eta):
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+        eta_text = f"{eta:.0f}s" if eta >= 0 else "--"
+        self.progress_bar.setFormat(f"%v / %m   {rate:.0f} 个/s   ETA {eta_text}")
+
+    def start_task(self, task, on_success, title, on_partial=None):
+        # 启动后台任务：禁用按钮、进度条进入忙碌状态，结束后恢复
+        self.btn_load.setEnabled(False)
+        self.btn_convert.setEnabled(False)
+        self.btn_cancel.setEnabled(True)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setFormat("%p%")
+
+        self.worker = TaskWorker(task, self, profile=self.chk_profile.isChecked())
+        self.worker.progress.connect(self.update_progress)
+        self.worker.message.connect(self.log)
+        self.worker.succeeded.connect(on_success)
+        if on_partial is not None:
+            self.worker.partial.connect(on_partial)
+        self.worker.failed.connect(lambda err: self.on_task_failed(title, err))
+        self.worker.cancelled.connect(lambda: self.log(f"{title}已取消。"))
+        self.worker.finished.connect(self.on_task_finished)
+        self.worker.start()
+
+    def cancel_task(self):
+        if self.worker is not None:
+            self.log("正在取消，等待当前文件处理完成...")
+            self.btn_cancel.setEnabled(False)
+            self.worker.cancel()
+
+    def on_task_failed(self, title, err):
+        self.log(f"[Error] {title}失败: {err}")
+        self.flush_log()
+        QMessageBox.critical(self, "Error", f"{title}时发生错误:\n{err}")
+
+    def on_task_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
+        self.btn_load.setEnabled(True)
+        self.btn_convert.setEnabled(len(self.current_data) > 0)
+        self.btn_cancel.setEnabled(False)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%p%")
+        self.flush_log()
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        self.preview.stop()
+        super().closeEvent(event)
 
     def load_data(self):
         fmt = self.combo_in.currentText()
         self.current_data = []
+        self.current_index = None
+        self.preview.set_source(None)
         self.log(f"正在准备加载 {fmt} 数据...")
 
         try:
+            img_dir = None
+            classes_path = None
             if "COCO" in fmt:
-                path, _ = QFileDialog.getOpenFileName(self, "选择 COCO JSON 文件", "", "JSON Files (*.json)")
-                if not path: return
+                # NOTE: 可以多选，多个分片会合并导入
+                paths, _ = QFileDialog.getOpenFileNames(self, "选择 COCO JSON 文件 (可多选)", "", "JSON Files (*.json)")
+                if not paths: return
+                path = paths[0] if len(paths) == 1 else paths
                 img_dir = QFileDialog.getExistingDirectory(self, "选择 COCO 图片所在文件夹")
                 if not img_dir: return
 
-                importer = COCOImporter()
-                self.current_data = importer.parse_all(path, img_dir)
-
             elif "YOLO" in fmt:
-                folder = QFileDialog.getExistingDirectory(self, "选择 YOLO txt 和图片所在文件夹")
-                if not folder: return
-                classes_path, _ = QFileDialog.getOpenFileName(self, "选择 classes.txt", folder, "TXT Files (*.txt)")
+                path = QFileDialog.getExistingDirectory(self, "选择 YOLO txt 和图片所在文件夹")
+                if not path: return
+                classes_path, _ = QFileDialog.getOpenFileName(self, "选择 classes.txt", path, "TXT Files (*.txt)")
                 if not classes_path: return
 
-                with open(classes_path, 'r') as f:
-                    class_names = [line.strip() for line in f.readlines() if line.strip()]
-
-                importer = YOLOImporter()
-                files = [f for f in os.listdir(folder) if f.endswith('.txt') and f != 'classes.txt'] # NOTE: 防止把classes.txt和数据集放一起
-
-                self.progress_bar.setMaximum(len(files))
-                for i, f in enumerate(files):
-                    txt_path = os.path.join(folder, f)
-                    img_name_base = os.path.splitext(f)[0]
-                    img_path = None
-                    for ext in ['.jpg', '.png', '.jpeg', '.bmp']:
-                        temp_path = os.path.join(folder, img_name_base + ext)
-                        if os.path.exists(temp_path):
-                            img_path = temp_path
-                            break
-
-                    if img_path:
-                        self.current_data.append(importer.parse(txt_path, img_path, class_names))
-                    else:
-                        self.log(f"[Warning] 找不到对应的图片: {f}，跳过。")
-                    self.progress_bar.setValue(i+1)
-
             else:
-                folder = QFileDialog.getExistingDirectory(self, "选择数据集文件夹")
-                if not folder: return
-
-                if "VOC" in fmt:
-                    importer = VOCImporter()
-                    files = [f for f in os.listdir(folder) if f.endswith('.xml')]
-                elif "LabelMe" in fmt:
-                    importer = LabelMeImporter()
-                    files = [f for f in os.listdir(folder) if f.endswith('.json')]
-
-                self.progress_bar.setMaximum(len(files))
-                for i, f in enumerate(files):
-                    self.current_data.append(importer.parse(os.path.join(folder, f)))
-                    self.progress_bar.setValue(i+1)
-
-            count = len(self.current_data)
-            self.lbl_count.setText(f"已加载 {count} 张图片")
-            self.log(f"成功加载 {count} 个标注文件。")
-            self.progress_bar.setValue(0)
-
-            if count > 0:
-                self.btn_convert.setEnabled(True)
-                if not self.output_dir:
-                    self.lbl_out_path.setText("请选择保存路径 ->")
-                    self.lbl_out_path.setStyleSheet("color: red; font-weight: bold;")
+                path = QFileDialog.getExistingDirectory(self, "选择数据集文件夹")
+                if not path: return
 
         except Exception as e:
             self.log(f"[Error] 加载失败: {str(e)}")
             QMessageBox.critical(self, "Error", f"加载数据时发生错误:\n{str(e)}")
+            return
+
+        workers = self.spin_workers.value()
+        self.lbl_count.setText("正在加载...")
+        index = DatasetIndex()
+
+        snapshot = self.chk_snapshot.isChecked()
+
+        def load(w):
+            # NOTE: 先打开按需解析的预览 (只扫描目录 / 映射快照)，列表马上可以浏览，完整加载在之后继续；
+            #       勾选快照缓存时第一次加载后保存快照，源文件没变时再次打开直接映射快照，不再解析
+            #       预览的结果交给完整加载复用，快照和目录都只查找 / 扫描一次
+            lazy = open_lazy(fmt, path, img_dir=img_dir, classes_path=classes_path, snapshot=snapshot,
+                             log=w.message.emit)
+            w.partial.emit(lazy)
+            return load_dataset(fmt, path, img_dir=img_dir, classes_path=classes_path, workers=workers,
+                                columnar=True, snapshot=snapshot, index=index, log=w.message.emit,
+                                progress=w.report, lazy=lazy)
+
+        self.start_task(load, lambda data: self.on_data_loaded(data, index), "加载", on_partial=self.on_preview)
+
+    def on_preview(self, source):
+        # COCO 没有快照时为 None，等完整加载结束再显示
+        if source is None:
+            return
+        self.preview.set_source(source)
+        self.log(f"预览: {len(source)} 张图片，完整加载继续进行...")
+
+    def on_data_loaded(self, data, index: DatasetIndex = None):
+        self.current_data = data
+        self.current_index = index
+        self.preview.set_source(data)
+        count = len(self.current_data)
+        if index is not None:
+            self.lbl_count.setText(f"已加载 {count} 张图片 / {index.num_boxes} 个框 / {len(index.categories)} 类")
+        else:
+            self.lbl_count.setText(f"已加载 {count} 张图片")
+        self.log(f"成功加载 {count} 个标注文件。")
+        if index is not None:
+            self.log(index.summary())
+
+        if count > 0 and not self.output_dir:
+            self.lbl_out_path.setText("请选择保存路径 ->")
+            self.lbl_out_path.setStyleSheet("color: red; font-weight: bold;")
 
     def select_output_dir(self):
         dir_path = QFileDialog.getExistingDirectory(self, "选择保存路径")
@@ -261,6 +428,10 @@ class MainWindow(QMainWindow):
             self.lbl_out_path.setStyleSheet("color: #333;")
 
     def run_conversion(self):
+        if not self.output_dir:
+            QMessageBox.warning(self, "提示", "请先选择保存路径 (Output Directory)！")
+            return
+
         if os.listdir(self.output_dir):
             reply = QMessageBox.question(
                 self,
@@ -272,51 +443,23 @@ class MainWindow(QMainWindow):
             if reply == QMessageBox.No:
                 return
 
-        if not self.output_dir:
-            QMessageBox.warning(self, "提示", "请先选择保存路径 (Output Directory)！")
-            return
-
         fmt = self.combo_out.currentText()
         self.log(f"开始转换为 {fmt} ...")
-        self.progress_bar.setValue(0)
+        data, output_dir, workers = self.current_data, self.output_dir, self.spin_workers.value()
+        images = self.chk_images.isChecked()
 
-        try:
-            if "YOLO" in fmt:
-                exporter = YOLOExporter()
-                exporter.export(self.current_data, self.output_dir)     # NOTE: 这里没必要传class_list形参，会自动生成classes.txt
-                self.progress_bar.setValue(100)
-
-            elif "COCO" in fmt:
-                exporter = COCOExporter()
-                save_path = os.path.join(self.output_dir, "instances_converted.json")
-                exporter.export(self.current_data, save_path)
-                self.progress_bar.setValue(100)
+        def convert(w):
+            # NOTE: 复制图片会改写文件名 / 路径，得到新的数据，不影响已加载的 current_data
+            out = copy_images(data, fmt, output_dir, workers=workers, log=w.message.emit,
+                              progress=w.report) if images else data
+            export_dataset(fmt, out, output_dir, workers=workers, progress=w.report)
 
-            else:
-                if "VOC" in fmt:
-                    exporter = VOCExporter()
-                elif "LabelMe" in fmt:
-                    exporter = LabelMeExporter()
+        self.start_task(convert, self.on_conversion_done, "转换")
 
-                total = len(self.current_data)
-                self.progress_bar.setMaximum(total)
-
-                for i, info in enumerate(self.current_data):
-                    exporter.export(info, self.output_dir)
-                    # 只有在非多线程环境下，才需要手动刷新事件循环来更新进度条
-                    if i % 10 == 0:
-                        self.progress_bar.setValue(i+1)
-                        QApplication.processEvents()
-                self.progress_bar.setValue(total)
-
-            self.log(f"转换完成！文件已保存至: {self.output_dir}")
-            QMessageBox.information(self, "成功", "格式转换任务已完成！")
-
-        except Exception as e:
-            self.log(f"[Error] 转换失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            QMessageBox.critical(self, "Error", f"转换过程中发生错误:\n{str(e)}")
+    def on_conversion_done(self, _):
+        self.log(f"转换完成！文件已保存至: {self.output_dir}")
+        self.flush_log()
+        QMessageBox.information(self, "成功", "格式转换任务已完成！")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
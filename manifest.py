@@ -0,0 +1,100 @@
+import os
+import json
+import hashlib
+
+# NOTE: 增量转换的清单文件，保存在输出目录中：
+#       记录每个源文件 (标注文件及其依赖，如 YOLO 的图片) 的指纹以及它生成的输出文件
+
+MANIFEST_NAME = ".unilabel_manifest"    # NOTE: 不用 .json 后缀，防止输出目录被当成 LabelMe 数据集导入时误读
+MANIFEST_VERSION = 1
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Manifest:
+    def __init__(self, output_dir: str, use_hash: bool = False):
+        # use_hash: mtime 不可靠时 (git checkout / rsync) 用内容 sha1 判断文件是否变化
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.use_hash = use_hash
+        self.settings = {}
+        self.sources = {}     # 源文件 -> {"deps": {路径: [size, mtime_ns, sha1]}, "outputs": [...], "labels": [...]}
+        self._fingerprints = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, output_dir: str, use_hash: bool = False) -> 'Manifest':
+        manifest = cls(output_dir, use_hash)
+        if os.path.exists(manifest.path):
+            try:
+                with open(manifest.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    manifest.settings = data.get('settings', {})
+                    manifest.sources = data.get('sources', {})
+            except (OSError, ValueError):
+                pass    # 清单损坏时当作首次转换
+        return manifest
+
+    def save(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'settings': self.settings, 'sources': self.sources}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def fingerprint(self, path: str, old: list = None) -> list:
+        fp = self._fingerprints.get(path)
+        if fp is None:
+            st = os.stat(path)
+            fp = [st.st_size, st.st_mtime_ns, None]
+            if self.use_hash:
+                if old and old[0] == fp[0] and old[1] == fp[1] and old[2]:
+                    fp[2] = old[2]      # 大小和 mtime 都没变，沿用旧的 hash，不再读文件
+                else:
+                    fp[2] = file_hash(path)
+            self._fingerprints[path] = fp
+        return fp
+
+    def is_fresh(self, key: str, dep_paths) -> bool:
+        entry = self.sources.get(key)
+        if entry is None:
+            return False
+        deps = entry['deps']
+        if set(deps) != set(dep_paths):
+            return False
+        for path in dep_paths:
+            old = deps[path]
+            try:
+                fp = self.fingerprint(path, old)
+            except OSError:
+                return False
+            if self.use_hash:
+                if fp[0] != old[0] or fp[2] != old[2]:
+                    return False
+                if fp[1] != old[1]:
+                    deps[path] = fp     # 内容没变只是 mtime 变了，更新记录，下次不用再算 hash
+                    self.dirty = True
+            elif fp[:2] != old[:2]:
+                return False
+        return True
+
+    def record(self, key: str, dep_paths, outputs: list, labels=()):
+        self.sources[key] = {
+            'deps': {path: self.fingerprint(path, self.sources.get(key, {}).get('deps', {}).get(path))
+                     for path in dep_paths},
+            'outputs': sorted(outputs),
+            'labels': sorted(set(labels)),
+        }
+
+    def forget(self, key: str) -> list:
+        # 删除一个源文件的记录，返回它生成过的输出文件
+        entry = self.sources.pop(key, None)
+        return entry['outputs'] if entry else []
@@ -0,0 +1,333 @@
+import zlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtWidgets import QTableView, QHeaderView, QStyledItemDelegate, QStyle, QAbstractItemView
+from PySide6.QtCore import Qt, QObject, Signal, QAbstractListModel, QModelIndex, QSize, QRect, QByteArray, QBuffer
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QColor, QPen
+
+from archive import is_archive_path, read_raw
+
+# NOTE: 大数据集的预览列表 (model/view)：
+#       - 视图只为可见的行调用 data() / paint()；用单列、固定行高的 QTableView 而不是 QListView：
+#         QListView 布局时对每一行调用一次 Python 的 rowCount()，百万行要几秒，固定行高的表格与行数无关
+#       - 数据源是支持 len() 和下标的 ImageInfo 序列：list、AnnotationTable (快照是内存映射)，
+#         或 unilabel.LazyDataset (只解析显示到的行)
+#       - LazyDataset 的行在后台线程中解析 (RowLoader)，data() / paint() 只取已解析的结果，
+#         还没解析的行先画占位，解析完成后再重绘这一行；界面线程不做任何解析
+#       - 缩略图在后台线程池中按缩略图尺寸解码 (QImage 可以在非界面线程创建)，结果放进 LRU 缓存；
+#         请求按 "最新优先" 处理，快速滚动时已经滚出去的行排在后面，排队的请求数有上限
+#       - 框只在 paint 中按缩略图比例画出，不可见的行不会画
+
+THUMB_SIZE = 96             # 缩略图最长边 (px)
+THUMB_CACHE_SIZE = 512      # 缓存的缩略图数
+THUMB_THREADS = 4           # 解码线程数
+THUMB_PENDING = 128         # 最多排队的解码请求，超出时丢弃最早的
+ROW_THREADS = 2             # 按需解析的线程数
+ROW_PENDING = 256           # 最多排队的解析请求，超出时丢弃最早的
+MARGIN = 4
+
+INFO_ROLE = Qt.UserRole + 1     # data() 返回 ImageInfo
+
+
+def _decode(path: str, size: int) -> QImage:
+    # 直接按缩略图尺寸解码 (JPEG 时 Qt 按 1/2、1/4 ... 缩小解码，不用先解出整张图)，失败时返回空 QImage
+    if is_archive_path(path):
+        try:
+            data = read_raw(path)
+        except (OSError, KeyError):
+            return QImage()
+        source = QBuffer()
+        source.setData(QByteArray(data))
+        source.open(QBuffer.ReadOnly)
+        reader = QImageReader(source)
+    else:
+        reader = QImageReader(path)
+    full = reader.size()
+    if full.isValid():
+        reader.setScaledSize(full.scaled(size, size, Qt.KeepAspectRatio))
+    return reader.read()
+
+
+class ThumbnailLoader(QObject):
+    # get(path): 缓存中的缩略图；还没有时返回 None 并在后台解码，完成后发出 ready
+    # NOTE: 无法解码的图片缓存为空 QPixmap，不会反复重试
+    ready = Signal(str)
+    _decoded = Signal(str, QImage)      # 解码线程发出，界面线程接收 (队列连接)
+
+    def __init__(self, size: int = THUMB_SIZE, cache_size: int = THUMB_CACHE_SIZE, threads: int = THUMB_THREADS,
+                 parent=None):
+        super().__init__(parent)
+        self.size = size
+        self._cache = OrderedDict()     # 路径 -> QPixmap，只在界面线程访问
+        self._cache_size = cache_size
+        self._queue = OrderedDict()     # 等待解码的路径，最新的请求在末尾
+        self._busy = set()              # 正在解码的路径
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='thumbnail')
+        self._decoded.connect(self._store)
+
+    def get(self, path: str):
+        pixmap = self._cache.get(path)
+        if pixmap is not None:
+            self._cache.move_to_end(path)
+            return pixmap
+        self.request(path)
+        return None
+
+    def request(self, path: str):
+        with self._lock:
+            if path in self._busy:
+                return
+            if path in self._queue:
+                self._queue.move_to_end(path)
+                return
+            self._queue[path] = None
+            while len(self._queue) > THUMB_PENDING:
+                self._queue.popitem(last=False)     # 最早的请求对应的行多半已经滚出去了
+        self._pool.submit(self._work)
+
+    def _work(self):
+        # 每个提交的任务取一个最新的请求；被丢弃的请求对应的任务什么都不做
+        with self._lock:
+            if not self._queue:
+                return
+            path, _ = self._queue.popitem(last=True)
+            self._busy.add(path)
+        self._decoded.emit(path, _decode(path, self.size))
+
+    def _store(self, path: str, image: QImage):
+        with self._lock:
+            self._busy.discard(path)
+        self._cache[path] = QPixmap.fromImage(image)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        self.ready.emit(path)
+
+    def clear(self):
+        with self._lock:
+            self._queue.clear()
+        self._cache.clear()
+
+    def close(self):
+        # 丢弃排队的请求，只等正在解码的结束
+        with self._lock:
+            self._queue.clear()
+        self._pool.shutdown(wait=True)
+
+
+class RowLoader(QObject):
+    # 在后台线程中解析按需解析的数据源 (有 cached() 的序列，见 unilabel.LazyDataset) 的行，完成后发出 ready(row)
+    # NOTE: 与 ThumbnailLoader 一样按 "最新优先" 处理，排队的请求数有上限；换数据源后旧的结果丢弃
+    ready = Signal(int)
+    _parsed = Signal(int, int)      # (数据源编号, 行)，解析线程发出，界面线程接收 (队列连接)
+
+    def __init__(self, threads: int = ROW_THREADS, parent=None):
+        super().__init__(parent)
+        self._source = None
+        self._generation = 0
+        self._queue = OrderedDict()     # 等待解析的行，最新的请求在末尾
+        self._busy = set()              # 正在解析的行
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='preview-row')
+        self._parsed.connect(self._done)
+
+    def set_source(self, source):
+        with self._lock:
+            self._source = source
+            self._generation += 1
+            self._queue.clear()
+            self._busy.clear()
+
+    def request(self, row: int):
+        with self._lock:
+            if row in self._busy:
+                return
+            if row in self._queue:
+                self._queue.move_to_end(row)
+                return
+            self._queue[row] = None
+            while len(self._queue) > ROW_PENDING:
+                self._queue.popitem(last=False)
+        self._pool.submit(self._work)
+
+    def _work(self):
+        with self._lock:
+            if not self._queue:
+                return
+            row, _ = self._queue.popitem(last=True)
+            self._busy.add(row)
+            source, generation = self._source, self._generation
+        try:
+            source[row]     # 解析结果留在数据源的缓存里；解析失败由数据源自己记录
+        finally:
+            self._parsed.emit(generation, row)
+
+    def _done(self, generation: int, row: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._busy.discard(row)
+        self.ready.emit(row)
+
+    def close(self):
+        with self._lock:
+            self._queue.clear()
+        self._pool.shutdown(wait=True)
+
+
+class DatasetModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._source = []
+        self.rows = RowLoader(parent=self)
+        self.rows.ready.connect(self._row_ready)
+
+    def set_source(self, source):
+        # source: 支持 len() 和下标的 ImageInfo 序列，None 为清空
+        self.beginResetModel()
+        self._source = source if source is not None else []
+        self.rows.set_source(self._source)
+        self.endResetModel()
+
+    def info(self, row: int):
+        # 第 row 行的 ImageInfo；按需解析的数据源还没解析这一行时返回 None，并在后台解析
+        cached = getattr(self._source, 'cached', None)
+        if cached is None:
+            return self._source[row]
+        info = cached(row)
+        if info is None:
+            self.rows.request(row)
+        return info
+
+    def _row_ready(self, row: int):
+        if row < len(self._source):
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def source(self):
+        return self._source
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._source)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role not in (INFO_ROLE, Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        info = self.info(index.row())
+        if role == INFO_ROLE or info is None:
+            return info
+        return info.filename if role == Qt.DisplayRole else info.img_path
+
+
+def label_color(label: str) -> QColor:
+    # 同一类别总是同一种颜色 (crc32 不受 PYTHONHASHSEED 影响)
+    return QColor.fromHsv(zlib.crc32(label.encode('utf-8')) % 360, 220, 230)
+
+
+class PreviewDelegate(QStyledItemDelegate):
+    # 每行：缩略图 + 框 | 文件名 / 宽高 / 框数 / 类别
+    def __init__(self, loader: ThumbnailLoader, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+
+    def sizeHint(self, option, index):
+        return QSize(self.loader.size * 3, self.loader.size + 2 * MARGIN)
+
+    def paint(self, painter, option, index):
+        info = index.data(INFO_ROLE)
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        size = self.loader.size
+        thumb = QRect(option.rect.left() + MARGIN, option.rect.top() + MARGIN, size, size)
+        if info is None:
+            # 还在后台解析，完成后模型发出 dataChanged 再重绘这一行
+            painter.fillRect(thumb, QColor('#e9ecef'))
+            painter.setPen(QColor('#999999'))
+            painter.drawText(option.rect.adjusted(size + 3 * MARGIN, 0, -MARGIN, 0), Qt.AlignLeft | Qt.AlignVCenter,
+                             "解析中...")
+            painter.restore()
+            return
+        pixmap = self.loader.get(info.img_path) if info.img_path else QPixmap()
+        if pixmap is None or pixmap.isNull():
+            painter.fillRect(thumb, QColor('#e9ecef'))
+            if pixmap is not None:
+                painter.setPen(QColor('#999999'))
+                painter.drawText(thumb, Qt.AlignCenter, "无图片")
+        else:
+            target = QRect(0, 0, pixmap.width(), pixmap.height())
+            target.moveCenter(thumb.center())
+            painter.drawPixmap(target, pixmap)
+            self._draw_boxes(painter, info, target)
+
+        boxes = info.bboxes
+        labels = list(dict.fromkeys(box.label for box in boxes))
+        size_text = f"{info.width} x {info.height}" if info.width and info.height else "尺寸未知"
+        detail = f"{size_text}   {len(boxes)} 个框"
+        if labels:
+            detail += "   " + ', '.join(labels[:5]) + (" ..." if len(labels) > 5 else "")
+        # 两行文字在缩略图右侧垂直居中
+        text = option.rect.adjusted(size + 3 * MARGIN, 0, -MARGIN, 0)
+        upper, lower = QRect(text), QRect(text)
+        upper.setBottom(text.center().y())
+        lower.setTop(text.center().y() + MARGIN)
+        painter.setPen(option.palette.highlightedText().color() if option.state & QStyle.State_Selected
+                       else option.palette.text().color())
+        painter.drawText(upper, Qt.AlignLeft | Qt.AlignBottom, info.filename)
+        painter.drawText(lower, Qt.AlignLeft | Qt.AlignTop, detail)
+        painter.restore()
+
+    @staticmethod
+    def _draw_boxes(painter, info, target: QRect):
+        # NOTE: 坐标按标注中的宽高缩放到缩略图；宽高未知时不画
+        if not info.width or not info.height:
+            return
+        sx = target.width() / info.width
+        sy = target.height() / info.height
+        painter.setClipRect(target)
+        for box in info.bboxes:
+            pen = QPen(label_color(box.label))
+            pen.setWidth(1)
+            painter.setPen(pen)
+            painter.drawRect(round(target.left() + box.xmin * sx), round(target.top() + box.ymin * sy),
+                             max(1, round((box.xmax - box.xmin) * sx)), max(1, round((box.ymax - box.ymin) * sy)))
+        painter.setClipping(False)
+
+
+class PreviewList(QTableView):
+    # 数据集预览列表 (单列表格)；set_source 见 DatasetModel
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loader = ThumbnailLoader(parent=self)
+        self.setModel(DatasetModel(self))
+        self.setItemDelegate(PreviewDelegate(self.loader, self))
+        self.setShowGrid(False)
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        rows = self.verticalHeader()
+        rows.hide()
+        rows.setSectionResizeMode(QHeaderView.Fixed)
+        rows.setDefaultSectionSize(self.loader.size + 2 * MARGIN)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        # NOTE: 缩略图到达时只重绘视口 (多次 update 会合并成一次绘制)，不可见的行不受影响
+        self.loader.ready.connect(self.viewport().update)
+
+    def set_source(self, source):
+        # NOTE: 完整加载结束后替换预览的数据源时行数相同，保留滚动位置；缩略图缓存按路径，不用清空
+        if source is None:
+            self.loader.clear()
+        same = source is not None and len(source) == self.model().rowCount()
+        position = self.verticalScrollBar().value()
+        self.model().set_source(source)
+        if same:
+            self.verticalScrollBar().setValue(position)
+
+    def stop(self):
+        self.loader.close()
+        self.model().rows.close()
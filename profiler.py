@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# NOTE: 导入 / 导出流水线的分阶段计时和计数 (目录扫描、图片尺寸探测、读文件、解析、序列化、写文件 ...)
+#       关闭时 stage() 返回共享的空上下文管理器，count() 直接返回，每次调用只有一次函数调用的开销
+#       阶段可以嵌套，summary 中同时给出包含子阶段的总时间和去掉子阶段的自身时间
+#       多进程解析时子进程的统计随结果一起返回并合并；多个 worker 并行时各阶段时间是所有 worker 的累加
+
+MAX_TRACE_EVENTS = 200000     # trace 中最多记录的事件数，超过后只统计不记录
+
+_enabled = False
+_trace = False
+_lock = threading.Lock()
+_local = threading.local()
+_stages = {}      # 阶段 -> [调用次数, 总时间, 自身时间, 文件数, 框数, 读取字节, 写入字节]
+_events = []      # Chrome trace 事件 (chrome://tracing / Perfetto 可以直接打开)
+_dropped = 0
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('name', 'start', 'children')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.children = 0.0
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        duration = end - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].children += duration
+        with _lock:
+            row = _row(self.name)
+            row[0] += 1
+            row[1] += duration
+            row[2] += duration - self.children
+            if _trace:
+                _add_event(self.name, self.start, duration)
+        return False
+
+
+def _row(name: str) -> list:
+    row = _stages.get(name)
+    if row is None:
+        row = _stages[name] = [0, 0.0, 0.0, 0, 0, 0, 0]
+    return row
+
+
+def _add_event(name: str, start: float, duration: float):
+    global _dropped
+    if len(_events) >= MAX_TRACE_EVENTS:
+        _dropped += 1
+        return
+    # NOTE: perf_counter 在 Linux / Windows 上是系统级单调时钟，不同进程的时间戳可以直接比较
+    _events.append({"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+                    "pid": os.getpid(), "tid": threading.get_ident()})
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def stage(name: str):
+    # with profiler.stage('parse'): ...
+    return _Stage(name) if _enabled else _NULL
+
+
+def count(name: str, files: int = 0, boxes: int = 0, bytes_read: int = 0, bytes_written: int = 0):
+    if not _enabled:
+        return
+    with _lock:
+        row = _row(name)
+        row[3] += files
+        row[4] += boxes
+        row[5] += bytes_read
+        row[6] += bytes_written
+
+
+def start(trace: bool = False):
+    # 清空之前的统计并开始记录；trace: 同时记录每个阶段的起止时间
+    global _enabled, _trace, _dropped
+    with _lock:
+        _stages.clear()
+        _events.clear()
+        _dropped = 0
+        _trace = trace
+        _enabled = True
+
+
+def stop():
+    global _enabled
+    _enabled = False
+
+
+def is_tracing() -> bool:
+    return _trace
+
+
+def collect() -> dict:
+    # 当前统计的副本 (子进程把它随结果一起返回)
+    with _lock:
+        return {"stages": {name: list(row) for name, row in _stages.items()},
+                "events": list(_events), "dropped": _dropped}
+
+
+def merge(data: dict):
+    # 合并子进程的统计
+    global _dropped
+    with _lock:
+        for name, values in data["stages"].items():
+            row = _row(name)
+            for i, value in enumerate(values):
+                row[i] += value
+        room = max(0, MAX_TRACE_EVENTS - len(_events))
+        _events.extend(data["events"][:room])
+        _dropped += data["dropped"] + max(0, len(data["events"]) - room)
+
+
+def _format_bytes(n: int) -> str:
+    if not n:
+        return '-'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f"{n:.0f}{unit}" if unit == 'B' else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def summary(stats: dict = None) -> str:
+    # 按总时间排序的统计表
+    stages = (stats or collect())["stages"]
+    header = f"{'stage':<12}{'calls':>9}{'total(s)':>11}{'self(s)':>10}{'files':>9}{'boxes':>10}{'read':>10}{'written':>10}"
+    lines = [header, '-' * len(header)]
+    for name, (calls, total, own, files, boxes, read, written) in sorted(stages.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"{name:<12}{calls:>9}{total:>11.3f}{own:>10.3f}{files or '-':>9}{boxes or '-':>10}"
+                     f"{_format_bytes(read):>10}{_format_bytes(written):>10}")
+    return '\n'.join(lines)
+
+
+def write_trace(path: str, stats: dict = None):
+    # Chrome trace 格式 (JSON)，统计表放在 otherData 中
+    stats = stats or collect()
+    fields = ("calls", "total", "self", "files", "boxes", "bytes_read", "bytes_written")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "traceEvents": stats["events"],
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "stages": {name: dict(zip(fields, row)) for name, row in stats["stages"].items()},
+                "dropped_events": stats["dropped"],
+            },
+        }, f)
+
+
+class Session:
+    def __init__(self):
+        self.stats = None
+
+    def summary(self) -> str:
+        return summary(self.stats)
+
+
+@contextmanager
+def profile(trace_path: str = None, cprofile_path: str = None):
+    # 对一次运行计时：
+    #   with profiler.profile("trace.json", "run.prof") as session:
+    #       convert(...)
+    #   print(session.summary())
+    # cprofile_path: 同时用 cProfile 记录主进程的函数级耗时 (pstats / snakeviz 查看)
+    session = Session()
+    start(trace=bool(trace_path))
+    prof = None
+    if cprofile_path:
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+    try:
+        yield session
+    finally:
+        if prof is not None:
+            prof.disable()
+            prof.dump_stats(cprofile_path)
+        stop()
+        session.stats = collect()
+        if trace_path:
+            write_trace(trace_path, session.stats)
@@ -0,0 +1,232 @@
+import numpy as np
+
+from ir_label import AnnotationTable
+
+# NOTE: 与 IR 一起构建的数据集统计 / 索引：每类框数、含该类的图片数、框尺寸直方图，
+#       以及每类的倒排表 (框所在的图片下标、框宽高)，用来快速回答 "哪些图片有宽度大于 100px 的 person"
+#       统计是增量的：导入时每批新图片只处理新加入的框 (向量化)，不会重新扫描已有的框
+#       图片下标与加载得到的 AnnotationTable / list 的下标一致
+
+SIZE_BINS = (8, 16, 32, 64, 96, 128, 256, 512, 1024)   # 框尺寸 sqrt(w * h) 的直方图边界 (px)
+SMALL, MEDIUM = 32, 96      # COCO 的 small / medium / large 划分
+UPDATE_BATCH = 4096         # 导入时每多少张图片更新一次统计
+
+
+def _unique(values: np.ndarray) -> np.ndarray:
+    # NOTE: 与 np.unique 结果相同；输入基本有序时稳定排序 (归并) 几乎是线性的，比 np.unique 快一个数量级
+    values = np.sort(values, kind='stable')
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+class _ClassIndex:
+    # 一个类别的倒排表；新数据按块追加，查询时再拼接 (拼接结果会缓存)
+    __slots__ = ('images', 'box_images', 'widths', 'heights')
+
+    def __init__(self):
+        self.images = []        # 含该类的图片下标 (升序，不重复)
+        self.box_images = []    # 每个框所在的图片下标
+        self.widths = []
+        self.heights = []
+
+    def get(self, name: str) -> np.ndarray:
+        chunks = getattr(self, name)
+        if not chunks:
+            return np.empty(0, dtype=np.float32 if name in ('widths', 'heights') else np.int64)
+        if len(chunks) > 1:
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0]
+
+
+class DatasetIndex:
+    def __init__(self):
+        self.categories = []        # 类别 id -> 名称 (按第一次出现的顺序)
+        self._cat_index = {}
+        self._classes = []          # 类别 id -> _ClassIndex
+        self.box_counts = np.zeros(0, dtype=np.int64)
+        self.image_counts = np.zeros(0, dtype=np.int64)
+        self.size_hist = np.zeros((0, len(SIZE_BINS) + 1), dtype=np.int64)
+        self.num_images = 0
+        self.num_boxes = 0
+        self.empty_images = 0       # 没有框的图片数
+
+    def _intern(self, name: str) -> int:
+        cat_id = self._cat_index.get(name)
+        if cat_id is None:
+            cat_id = self._cat_index[name] = len(self.categories)
+            self.categories.append(name)
+            self._classes.append(_ClassIndex())
+        return cat_id
+
+    # ---------- 增量更新 ----------
+    def update(self, table: AnnotationTable):
+        # table 是导入时不断增长的同一个表：只统计上次更新之后加入的图片
+        self._add(table, self.num_images)
+
+    def add_batch(self, table: AnnotationTable):
+        # table 是新的一批图片 (流式转换)，图片下标接在已统计的图片之后
+        self._add(table, 0)
+
+    def iter_add(self, infos, batch_size: int = UPDATE_BATCH):
+        # 流式转换时边统计边原样产出 ImageInfo
+        batch = []
+        for info in infos:
+            batch.append(info)
+            yield info
+            if len(batch) >= batch_size:
+                self.add_batch(AnnotationTable.from_infos(batch))
+                batch = []
+        if batch:
+            self.add_batch(AnnotationTable.from_infos(batch))
+
+    def _add(self, table: AnnotationTable, start: int):
+        n_images = table.num_images - start
+        if n_images <= 0:
+            return
+        offsets = table.offsets[start:]
+        lo, hi = int(offsets[0]), int(offsets[-1])
+        lookup = np.array([self._intern(name) for name in table.categories] or [0], dtype=np.int64)
+        n_cls = len(self.categories)
+        if n_cls > len(self.box_counts):
+            grow = n_cls - len(self.box_counts)
+            self.box_counts = np.concatenate([self.box_counts, np.zeros(grow, dtype=np.int64)])
+            self.image_counts = np.concatenate([self.image_counts, np.zeros(grow, dtype=np.int64)])
+            self.size_hist = np.vstack([self.size_hist, np.zeros((grow, self.size_hist.shape[1]), dtype=np.int64)])
+
+        cat = lookup[table.cat_ids[lo:hi]]
+        box_img = np.repeat(np.arange(self.num_images, self.num_images + n_images), np.diff(offsets))
+        coords = table.coords[lo:hi]
+        widths = (coords[:, 2] - coords[:, 0]).astype(np.float32)
+        heights = (coords[:, 3] - coords[:, 1]).astype(np.float32)
+        with np.errstate(invalid='ignore'):
+            size = np.sqrt(np.maximum(widths.astype(np.float64) * heights, 0))
+        bins = np.searchsorted(SIZE_BINS, size, side='right')
+        n_bins = self.size_hist.shape[1]
+        self.box_counts += np.bincount(cat, minlength=n_cls)
+        self.size_hist += np.bincount(cat * n_bins + bins, minlength=n_cls * n_bins).reshape(n_cls, n_bins)
+
+        # NOTE: 按类别稳定排序后切块，每类的框仍按图片顺序排列；类别 id 转成 int16 时 NumPy 用基数排序，快很多
+        small_ids = n_cls < (1 << 15)
+        order = np.argsort(cat.astype(np.int16) if small_ids else cat, kind='stable')
+        splits = np.cumsum(np.bincount(cat, minlength=n_cls))[:-1]
+        pairs = _unique(box_img * n_cls + cat)     # 每个 (图片, 类别) 一次，按图片升序
+        pair_img, pair_cat = pairs // n_cls, pairs % n_cls
+        self.image_counts += np.bincount(pair_cat, minlength=n_cls)
+        pair_order = np.argsort(pair_cat.astype(np.int16) if small_ids else pair_cat, kind='stable')
+        pair_splits = np.cumsum(np.bincount(pair_cat, minlength=n_cls))[:-1]
+        for cat_id, rows, imgs in zip(range(n_cls), np.split(order, splits), np.split(pair_img[pair_order], pair_splits)):
+            if not len(rows):
+                continue
+            index = self._classes[cat_id]
+            index.images.append(imgs)
+            index.box_images.append(box_img[rows])
+            index.widths.append(widths[rows])
+            index.heights.append(heights[rows])
+
+        self.empty_images += n_images - int(np.count_nonzero(np.diff(offsets)))
+        self.num_images += n_images
+        self.num_boxes += hi - lo
+
+    # ---------- 查询 ----------
+    def class_counts(self) -> dict:
+        # 类别 -> (框数, 图片数)，按框数从多到少
+        order = np.argsort(-self.box_counts, kind='stable')
+        return {self.categories[i]: (int(self.box_counts[i]), int(self.image_counts[i])) for i in order}
+
+    def images_with(self, label: str) -> np.ndarray:
+        # 含该类别的图片下标 (升序)
+        cat_id = self._cat_index.get(label)
+        return self._classes[cat_id].get('images') if cat_id is not None else np.empty(0, dtype=np.int64)
+
+    def query(self, labels=None, min_width: float = None, max_width: float = None,
+              min_height: float = None, max_height: float = None,
+              min_area: float = None, max_area: float = None) -> np.ndarray:
+        # 至少有一个框满足所有条件的图片下标 (升序)
+        # labels: 类别名称或列表，None 为所有类别；e.g. query('person', min_width=100)
+        if isinstance(labels, str):
+            labels = [labels]
+        cat_ids = range(len(self.categories)) if labels is None else \
+            [self._cat_index[name] for name in labels if name in self._cat_index]
+        geometry = any(v is not None for v in (min_width, max_width, min_height, max_height, min_area, max_area))
+        found = []
+        for cat_id in cat_ids:
+            index = self._classes[cat_id]
+            if not geometry:
+                found.append(index.get('images'))
+                continue
+            w, h = index.get('widths'), index.get('heights')
+            mask = np.ones(len(w), dtype=bool)
+            for values, low, high in ((w, min_width, max_width), (h, min_height, max_height),
+                                      (w * h if min_area is not None or max_area is not None else None,
+                                       min_area, max_area)):
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+            found.append(index.get('box_images')[mask])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return _unique(np.concatenate(found))
+
+    def to_dict(self) -> dict:
+        return {
+            "images": self.num_images,
+            "boxes": self.num_boxes,
+            "empty_images": self.empty_images,
+            "size_bins": list(SIZE_BINS),
+            "classes": {name: {"boxes": int(self.box_counts[i]), "images": int(self.image_counts[i]),
+                               "size_hist": self.size_hist[i].tolist()}
+                        for i, name in enumerate(self.categories)},
+        }
+
+    def summary(self) -> str:
+        small = np.searchsorted(SIZE_BINS, SMALL, side='right')
+        medium = np.searchsorted(SIZE_BINS, MEDIUM, side='right')
+        header = f"{'class':<20}{'boxes':>10}{'images':>10}{'small':>9}{'medium':>9}{'large':>9}"
+        lines = [f"共 {self.num_images} 张图片 / {self.num_boxes} 个框 / {len(self.categories)} 个类别，"
+                 f"{self.empty_images} 张图片没有框", header, '-' * len(header)]
+        for i in np.argsort(-self.box_counts, kind='stable'):
+            hist = self.size_hist[i]
+            lines.append(f"{self.categories[i]:<20}{self.box_counts[i]:>10}{self.image_counts[i]:>10}"
+                         f"{hist[:small].sum():>9}{hist[small:medium].sum():>9}{hist[medium:].sum():>9}")
+        return '\n'.join(lines)
+
+
+QUERY_KEYS = ('min_width', 'max_width', 'min_height', 'max_height', 'min_area', 'max_area')
+
+
+def parse_query(text: str) -> dict:
+    # 命令行的查询条件 -> query 的参数：逗号分隔，'key=value' 为尺寸条件，其余为类别名称
+    # e.g. "person,car,min_width=100" -> {'labels': ['person', 'car'], 'min_width': 100.0}
+    kwargs, labels = {}, []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        key, sep, value = part.partition('=')
+        if not sep:
+            labels.append(part)
+            continue
+        key = key.strip().replace('-', '_')
+        if key not in QUERY_KEYS:
+            raise ValueError(f"未知的查询条件: {key} (可用: {', '.join(QUERY_KEYS)})")
+        try:
+            kwargs[key] = float(value)
+        except ValueError:
+            raise ValueError(f"无效的查询条件: {part}")
+    if labels:
+        kwargs['labels'] = labels
+    return kwargs
+
+
+def take_images(table: AnnotationTable, images) -> AnnotationTable:
+    # 按图片下标取子集 (e.g. query 的结果)，用来构建 train / val 子集
+    images = np.asarray(images, dtype=np.int64)
+    offsets = table.offsets
+    counts = offsets[images + 1] - offsets[images]
+    new_offsets = np.zeros(len(images) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+    rows = np.repeat(offsets[images] - new_offsets[:-1], counts) + np.arange(new_offsets[-1])
+    filenames, img_paths = table.filenames, table.img_paths
+    return AnnotationTable.from_arrays([filenames[i] for i in images.tolist()], [img_paths[i] for i in images.tolist()],
+                                       table.sizes[images], new_offsets, table.coords[rows], table.cat_ids[rows],
+                                       table.categories, table.int_mask[rows])
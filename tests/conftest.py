@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import shutil
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ir_label import ImageInfo, BBox     # noqa: E402
+
+SAMPLES = os.path.join(ROOT, 'test_import')
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # 快照写到临时的缓存目录，不碰用户的 ~/.cache
+    path = tmp_path / 'cache'
+    monkeypatch.setenv('UNILABEL_CACHE_DIR', str(path))
+    return path
+
+
+@pytest.fixture
+def samples(tmp_path):
+    # test_import 的副本：快照 / 尺寸缓存等文件写在临时目录里，不弄脏仓库
+    dst = tmp_path / 'samples'
+    shutil.copytree(SAMPLES, dst)
+    return dst
+
+
+def write_labelme(folder, name: str, boxes, width=None, height=None, image: bool = False):
+    # boxes: [(label, xmin, ymin, xmax, ymax)]；width / height 为 None 时不写 imageWidth / imageHeight
+    os.makedirs(folder, exist_ok=True)
+    data = {"version": "5.5.0", "flags": {},
+            "shapes": [{"label": label, "points": [[x1, y1], [x2, y2]], "shape_type": "rectangle"}
+                       for label, x1, y1, x2, y2 in boxes],
+            "imagePath": name + '.jpg', "imageData": None}
+    if width is not None:
+        data["imageWidth"], data["imageHeight"] = width, height
+    with open(os.path.join(folder, name + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    if image:
+        open(os.path.join(folder, name + '.jpg'), 'wb').close()
+
+
+def make_infos(n_images: int = 20, n_labels: int = 3, seed: int = 0, unknown_size: bool = False) -> list:
+    # 小的合成数据集：整数 / 小数坐标混合，有的图片没有框
+    import random
+    rng = random.Random(seed)
+    infos = []
+    for i in range(n_images):
+        w, h = (None, None) if unknown_size else (rng.randint(50, 800), rng.randint(50, 600))
+        info = ImageInfo(f"{i:04d}.jpg", f"/data/{i:04d}.jpg", w, h)
+        for _ in range(rng.randint(0, 4)):
+            x1, y1 = rng.randint(0, 40), rng.randint(0, 40)
+            x2, y2 = x1 + rng.randint(1, 40), y1 + rng.choice([rng.randint(1, 40), rng.random() * 40 + 0.5])
+            info.bboxes.append(BBox(f"class_{rng.randrange(n_labels)}", x1, y1, x2, y2))
+        infos.append(info)
+    return infos
+
+
+def read_tree(folder) -> dict:
+    # 相对路径 -> 文件内容，用来逐字节比较两次输出 (忽略清单 / 缓存文件)
+    result = {}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.startswith('.unilabel'):
+                continue
+            with open(os.path.join(root, name), 'rb') as f:
+                result[os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/')] = f.read()
+    return result
+
+
+def as_rows(data) -> list:
+    # ImageInfo 序列 (list / AnnotationTable / LazyDataset) -> 可直接比较的元组
+    return [(info.filename, info.width, info.height,
+             [(box.label, box.xmin, box.ymin, box.xmax, box.ymax) for box in info.bboxes]) for info in data]
+
+
+@pytest.fixture
+def synth(tmp_path):
+    # bench.generate 生成的小数据集：四种格式的标注 + 真实的 PNG 图片；返回 {格式: convert 参数}
+    from bench import generate
+    return generate(str(tmp_path / 'synth'), images=24, boxes=3, classes=4)
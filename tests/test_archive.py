@@ -0,0 +1,100 @@
+import os
+import shutil
+import tarfile
+import zipfile
+
+import pytest
+
+import archive as archive_mod
+from archive import get_reader, reader_scope
+from unilabel import convert, load_dataset
+from converters import VOCExporter
+
+from conftest import SAMPLES, as_rows
+
+
+def _zip_folder(folder, path, prefix=''):
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name in sorted(os.listdir(folder)):
+            zf.write(os.path.join(folder, name), f"{prefix}/{name}" if prefix else name)
+
+
+def _tree(folder):
+    result = {}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            with open(os.path.join(root, name), 'rb') as f:
+                result[os.path.relpath(os.path.join(root, name), folder)] = f.read()
+    return result
+
+
+def test_read_from_zip_matches_folder(tmp_path):
+    archive = tmp_path / 'Labelme.zip'
+    _zip_folder(os.path.join(SAMPLES, 'Labelme'), archive)
+    for dst_fmt in ('yolo', 'coco', 'labelme'):
+        ref, out = tmp_path / f'ref_{dst_fmt}', tmp_path / f'out_{dst_fmt}'
+        convert('labelme', os.path.join(SAMPLES, 'Labelme'), dst_fmt, str(ref))
+        convert('labelme', str(archive), dst_fmt, str(out))
+        assert _tree(out) == _tree(ref)
+
+
+def test_write_into_zip_matches_folder(tmp_path):
+    src = os.path.join(SAMPLES, 'VOC')
+    convert('voc', src, 'labelme', str(tmp_path / 'ref'))
+    convert('voc', src, 'labelme', str(tmp_path / 'out.zip'))
+    shutil.unpack_archive(tmp_path / 'out.zip', tmp_path / 'out')
+    assert _tree(tmp_path / 'out') == _tree(tmp_path / 'ref')
+
+
+def test_voc_export_from_archive_uses_member_path(tmp_path):
+    archive = tmp_path / 'Labelme.zip'
+    _zip_folder(os.path.join(SAMPLES, 'Labelme'), archive, 'Labelme')
+    info = load_dataset('labelme', f"{archive}::/Labelme")[0]
+    assert '::' in info.img_path
+    xml = VOCExporter().serialize(info)
+    assert '::' not in xml
+    assert f"<path>Labelme/{info.filename}</path>" in xml
+    assert "<folder>Labelme</folder>" in xml
+
+
+@pytest.mark.parametrize('name', ['Labelme.zip', 'Labelme.tar.gz'])
+def test_rewritten_archive_is_reopened(tmp_path, name):
+    # 同一路径的归档被改写后重新打开，不用旧的成员表 / 预读内容
+    folder = os.path.join(SAMPLES, 'Labelme')
+    path = tmp_path / name
+    names = sorted(os.listdir(folder))
+
+    def write(members):
+        if name.endswith('.zip'):
+            with zipfile.ZipFile(path, 'w') as zf:
+                for member in members:
+                    zf.write(os.path.join(folder, member), member)
+        else:
+            with tarfile.open(path, 'w:gz') as tf:
+                for member in members:
+                    tf.add(os.path.join(folder, member), member)
+
+    write(names)
+    with reader_scope():
+        full = load_dataset('labelme', str(path))
+        labels = [n for n in names if n.endswith('.json')]
+        write([n for n in names if n != labels[0]])
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert len(load_dataset('labelme', str(path))) == len(full) - 1
+
+
+def test_readers_dropped_after_load(tmp_path):
+    archive = tmp_path / 'Labelme.zip'
+    _zip_folder(os.path.join(SAMPLES, 'Labelme'), archive)
+    with reader_scope():
+        expected = as_rows(load_dataset('labelme', str(archive)))
+        # 嵌套时由最外层丢弃
+        assert archive_mod._readers
+        reader = get_reader(str(archive))
+        assert get_reader(str(archive)) is reader
+    assert not archive_mod._readers
+    assert as_rows(load_dataset('labelme', str(archive))) == expected
+    assert not archive_mod._readers
+    convert('labelme', str(archive), 'yolo', str(tmp_path / 'out'))
+    assert not archive_mod._readers
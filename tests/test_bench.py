@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import bench
+from unilabel import load_dataset, FORMATS
+
+from conftest import as_rows
+
+
+def test_generated_formats_load_back(synth):
+    img_dir = synth['yolo']['img_dir']
+    expected = as_rows(bench.synth_infos(img_dir, 24, 3, 4))
+    for fmt in FORMATS:
+        source = synth[fmt]
+        rows = as_rows(load_dataset(fmt, source['src'], img_dir=source.get('img_dir'), size_cache=False))
+        if fmt == 'yolo':
+            # 归一化坐标只保留 6 位小数
+            assert [r[:3] for r in rows] == [r[:3] for r in expected]
+            for row, ref in zip(rows, expected):
+                for box, ref_box in zip(row[3], ref[3]):
+                    assert box[0] == ref_box[0] and box[1:] == pytest.approx(ref_box[1:], abs=0.01)
+        else:
+            assert rows == expected, fmt
+    for info in bench.synth_infos(img_dir, 4, 0, 1):
+        with Image.open(info.img_path) as img:
+            assert img.size == (info.width, info.height)
+
+
+def test_run_benchmark_and_compare(tmp_path):
+    logs = []
+    result = bench.run_benchmark(3, 2, 2, pairs=[('voc', 'yolo'), ('coco', 'labelme')], log=logs.append)
+    assert [r['pair'] for r in result['results']] == ['voc->yolo', 'coco->labelme']
+    for r in result['results']:
+        assert r['images'] == 3 and r['boxes'] == 6 and r['wall_s'] > 0
+    slower = json.loads(json.dumps(result))
+    slower['results'][1]['wall_s'] = result['results'][1]['wall_s'] * 2
+    assert bench.compare(result, result, log=logs.append) == []
+    assert bench.compare(result, slower, log=logs.append) == ['coco->labelme']
+
+
+def test_gen_command(tmp_path):
+    assert bench.main(['gen', str(tmp_path / 'd'), '--images', '2', '--boxes', '1', '--formats', 'voc,coco']) == 0
+    assert sorted(os.listdir(tmp_path / 'd')) == ['coco', 'images', 'voc']
@@ -0,0 +1,71 @@
+import os
+import threading
+
+import pytest
+
+from unilabel import load_dataset, convert_stream, export_dataset, ConversionCancelled
+
+from conftest import as_rows
+
+
+def _cancel_after(n):
+    calls = []
+
+    def progress(done, total):
+        calls.append(done)
+        if len(calls) > n:
+            raise ConversionCancelled()
+    return progress, calls
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_load_cancelled_from_progress(synth, workers):
+    progress, calls = _cancel_after(3)
+    with pytest.raises(ConversionCancelled):
+        load_dataset('voc', synth['voc']['src'], workers=workers, progress=progress)
+    assert len(calls) == 4 and calls[-1] < 24
+
+
+def test_export_cancelled_from_progress(tmp_path, synth):
+    data = load_dataset('voc', synth['voc']['src'])
+    progress, _ = _cancel_after(1)     # 按 chunk 回调：第二个 chunk 写完时取消
+    with pytest.raises(ConversionCancelled):
+        export_dataset('labelme', data, str(tmp_path / 'out'), progress=progress)
+    assert len(os.listdir(tmp_path / 'out')) < 24
+
+
+def test_stream_cancel_stops_background_threads(tmp_path, synth):
+    before = threading.active_count()
+    progress, _ = _cancel_after(2)
+    with pytest.raises(ConversionCancelled):
+        convert_stream('voc', synth['voc']['src'], 'yolo', str(tmp_path / 'out'), queue_size=2, progress=progress)
+    assert threading.active_count() == before
+
+
+def test_task_worker_signals(synth):
+    pytest.importorskip('PySide6')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide6.QtWidgets import QApplication
+    from main import TaskWorker
+    app = QApplication.instance() or QApplication([])
+    src = synth['voc']['src']
+    events = []
+
+    def run(worker):
+        for name in ('succeeded', 'cancelled', 'failed'):
+            getattr(worker, name).connect(lambda *args, name=name: events.append((name, args)))
+        worker.start()
+        worker.wait()
+        app.processEvents()     # 投递工作线程发出的 (队列) 信号
+
+    run(TaskWorker(lambda w: load_dataset('voc', src, progress=w.report)))
+    assert events[-1][0] == 'succeeded' and as_rows(events[-1][1][0]) == as_rows(load_dataset('voc', src))
+
+    def cancelled_task(w):
+        w.cancel()
+        return load_dataset('voc', src, progress=w.report)
+    run(TaskWorker(cancelled_task))
+    assert events[-1] == ('cancelled', ())
+
+    run(TaskWorker(lambda w: load_dataset('coco', os.path.join(src, 'missing.json'))))
+    assert events[-1][0] == 'failed'
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+from unilabel import main, convert, FORMATS
+
+from conftest import ROOT, SAMPLES, read_tree
+
+
+def test_engine_does_not_import_qt():
+    code = "import sys, unilabel, bench; sys.exit('PySide6' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], cwd=ROOT).returncode == 0
+
+
+@pytest.mark.parametrize('dst_fmt', FORMATS)
+def test_main_matches_convert(tmp_path, synth, dst_fmt):
+    source = synth['voc']
+    assert main(['-q', 'voc', source['src'], dst_fmt, str(tmp_path / 'cli')]) == 0
+    convert('voc', source['src'], dst_fmt, str(tmp_path / 'api'))
+    assert read_tree(tmp_path / 'cli') == read_tree(tmp_path / 'api')
+    assert read_tree(tmp_path / 'cli')
+
+
+def test_main_reports_errors(tmp_path, capsys):
+    assert main(['coco', str(tmp_path / 'missing.json'), 'yolo', str(tmp_path / 'out')]) == 1
+    assert '[Error]' in capsys.readouterr().err
+
+
+def test_convert_samples_every_pair(tmp_path):
+    sources = {'voc': f"{SAMPLES}/VOC", 'labelme': f"{SAMPLES}/Labelme", 'yolo': f"{SAMPLES}/YOLO",
+               'coco': f"{SAMPLES}/MS COCO/instances_converted.json"}
+    for src_fmt, src in sources.items():
+        for dst_fmt in FORMATS:
+            stats = convert(src_fmt, src, dst_fmt, str(tmp_path / f"{src_fmt}2{dst_fmt}"), size_cache=False)
+            assert stats['images'] == 3 and stats['boxes'] > 0
+
+
+def test_convert_empty_folder(tmp_path):
+    (tmp_path / 'empty').mkdir()
+    stats = convert('labelme', str(tmp_path / 'empty'), 'coco', str(tmp_path / 'out.json'))
+    assert stats['images'] == stats['boxes'] == 0
+    assert (tmp_path / 'out.json').read_text() == '{"images": [], "annotations": [], "categories": []}'
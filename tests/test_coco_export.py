@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from ir_label import ImageInfo, BBox
+from converters import COCOExporter
+
+from conftest import make_infos
+
+
+def reference_coco(info_list, categories=None) -> str:
+    # 原来的一次性 json.dump 实现；categories 给出时不在列表中的框跳过
+    cat_list = categories if categories is not None else sorted({box.label for info in info_list for box in info.bboxes})
+    cat_map = {name: i + 1 for i, name in enumerate(cat_list)}
+    data = {"images": [], "annotations": [], "categories": [{"id": v, "name": k} for k, v in cat_map.items()]}
+    ann_id = 1
+    for img_id, info in enumerate(info_list, 1):
+        data["images"].append({"id": img_id, "file_name": info.filename, "width": info.width, "height": info.height})
+        for box in info.bboxes:
+            if box.label not in cat_map:
+                continue
+            data["annotations"].append({"id": ann_id, "image_id": img_id, "category_id": cat_map[box.label],
+                                        "bbox": [box.xmin, box.ymin, box.get_width(), box.get_height()],
+                                        "area": box.get_width() * box.get_height(), "iscrowd": 0})
+            ann_id += 1
+    return json.dumps(data)
+
+
+def _infos():
+    # 类别按出现顺序与名称顺序不同，迭代器输入时需要重映射 category_id
+    infos = make_infos(40, n_labels=5, seed=2)
+    infos[0].bboxes.insert(0, BBox("zebra", 1, 2, 3, 4))
+    infos[1].bboxes.append(BBox("ä-label", 0.5, 0.25, 3, 4))
+    return infos
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1000])
+@pytest.mark.parametrize('as_iter', [False, True])
+def test_matches_json_dump(tmp_path, chunk_size, as_iter):
+    infos = _infos()
+    out = tmp_path / 'out.json'
+    COCOExporter().export(iter(infos) if as_iter else infos, str(out), chunk_size=chunk_size)
+    assert out.read_text() == reference_coco(infos)
+
+
+def test_fixed_categories_skip_unknown(tmp_path):
+    infos = _infos()
+    categories = ['class_3', 'zebra', 'class_0']
+    COCOExporter().export(iter(infos), str(tmp_path / 'out.json'), categories=categories, chunk_size=4)
+    assert (tmp_path / 'out.json').read_text() == reference_coco(infos, categories)
+
+
+def test_progress_and_no_temp_files(tmp_path):
+    calls = []
+    COCOExporter().export(_infos(), str(tmp_path / 'out.json'), chunk_size=10,
+                          progress=lambda done, total: calls.append((done, total)))
+    assert calls == [(10, 40), (20, 40), (30, 40), (40, 40)]
+    assert [p.name for p in tmp_path.iterdir()] == ['out.json']
+
+
+@pytest.mark.parametrize('infos', [[], [ImageInfo("a.jpg", "a.jpg", None, None)]])
+def test_empty(tmp_path, infos):
+    COCOExporter().export(iter(infos), str(tmp_path / 'out.json'))
+    assert (tmp_path / 'out.json').read_text() == reference_coco(infos)
@@ -0,0 +1,148 @@
+import io
+import json
+
+import pytest
+
+import jsonstream
+from jsonstream import iter_sections
+from converters import COCOImporter
+
+from conftest import as_rows, make_infos
+
+
+DOC = {
+    "info": {"description": "nested {\"braces\"} and [brackets]", "year": 2024},
+    "licenses": [{"id": 1, "name": "CC"}],
+    "images": [{"id": 1, "file_name": "中文 é.jpg", "width": 640, "height": 480},
+               {"id": 2, "file_name": "a\\b\"c.jpg", "width": None, "height": None},
+               {"id": 3, "file_name": "empty.jpg", "width": 1, "height": 1}],
+    "annotations": [{"id": 1, "image_id": 1, "category_id": 2, "bbox": [1.5e2, 2, 3.25, 4], "area": 13},
+                    {"id": 2, "image_id": 2, "category_id": 1, "bbox": [0, 0, 10, 10], "extra": [[], {}]},
+                    {"id": 3, "image_id": 9, "category_id": 1, "bbox": [0, 0, 1, 1]}],
+    "categories": [{"id": 1, "name": "cat"}, {"id": 2, "name": "dog"}],
+}
+
+
+def _reference(doc, sections):
+    return [(key, item) for key in doc if key in sections for item in doc[key]]
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+def test_iter_sections_matches_json_load(monkeypatch, indent, chunk_size):
+    # 缓冲区很小时每个值都跨越多次读取
+    monkeypatch.setattr(jsonstream._Reader.__init__, '__defaults__', (chunk_size,))
+    text = json.dumps(DOC, indent=indent, ensure_ascii=False).encode('utf-8')
+    sections = ('images', 'annotations', 'categories')
+    assert list(iter_sections(io.BytesIO(text), sections)) == _reference(DOC, sections)
+
+
+def _tricky_doc():
+    # 容易切错的内容："}, {" 出现在字符串里和嵌套的对象列表里，NaN / 超出 64 位的整数 (orjson 不支持)
+    import random
+    rng = random.Random(0)
+    images = [{"id": i, "file_name": f"{i}}}, {{\"x\": [1, 2]}}.jpg", "width": rng.randint(1, 9999),
+               "height": None if i % 7 == 0 else rng.randint(1, 9999)} for i in range(300)]
+    annotations = [{"id": j, "image_id": j % 300, "category_id": j % 3 + 1,
+                    "bbox": [rng.random() * 500, rng.randint(0, 500), rng.uniform(1e-9, 1e9), -0.0],
+                    "segmentation": [{"counts": [1, 2], "size": [3, 4]}, {"counts": "ab}, {cd"}] if j % 5 == 0 else
+                    [[rng.random() for _ in range(8)]]} for j in range(2000)]
+    return {"info": {"notes": ["}, {"] * 50}, "images": images, "annotations": annotations,
+            "categories": [{"id": i + 1, "name": f"c{i} 中文"} for i in range(3)]}
+
+
+@pytest.mark.parametrize('chunk_size', [7, 1000, 1 << 20])
+def test_orjson_path_matches_stdlib(monkeypatch, chunk_size):
+    orjson = pytest.importorskip('orjson')
+    monkeypatch.setattr(jsonstream._Reader.__init__, '__defaults__', (chunk_size,))
+    doc = _tricky_doc()
+    sections = ('images', 'annotations', 'categories')
+    text = json.dumps(doc, ensure_ascii=False).encode('utf-8')
+    extra = b'{"images": [{"a": NaN}, {"b": 123456789012345678901234567890}, {"c": 1}], "categories": [{"d": 1}]}'
+    results = []
+    for backend in (None, orjson):
+        monkeypatch.setattr(jsonstream, 'orjson', backend)
+        results.append((list(iter_sections(io.BytesIO(text), sections)),
+                        repr(list(iter_sections(io.BytesIO(extra), sections)))))
+    assert results[0] == results[1]
+    assert results[1][0] == _reference(doc, sections)
+    assert 'nan' in results[1][1] and '123456789012345678901234567890' in results[1][1]
+
+
+def test_orjson_path_is_used(monkeypatch, tmp_path):
+    # 普通的 COCO 文件：几乎所有元素都由 orjson 成批解析
+    import types
+    from converters import COCOExporter
+    orjson = pytest.importorskip('orjson')
+    parsed = []
+
+    def loads(text):
+        items = orjson.loads(text)
+        parsed.extend(items)
+        return items
+
+    monkeypatch.setattr(jsonstream, 'orjson', types.SimpleNamespace(loads=loads, JSONDecodeError=orjson.JSONDecodeError))
+    monkeypatch.setattr(jsonstream._Reader.__init__, '__defaults__', (4096,))
+    COCOExporter().export(make_infos(500), str(tmp_path / 'a.json'))
+    with open(tmp_path / 'a.json', 'rb') as f:
+        items = list(iter_sections(f, ('images', 'annotations', 'categories')))
+    assert len(parsed) > 0.9 * len(items)
+
+
+def test_large_value_is_parsed_in_linear_time(monkeypatch):
+    # 一个比缓冲区大得多的值：缓冲区按倍数增长，raw_decode 的调用次数是对数级的
+    calls = []
+
+    class Counting(json.JSONDecoder):
+        def raw_decode(self, s, idx=0):
+            calls.append(idx)
+            return super().raw_decode(s, idx)
+
+    monkeypatch.setattr(jsonstream, '_decoder', Counting())
+    monkeypatch.setattr(jsonstream, 'orjson', None)
+    monkeypatch.setattr(jsonstream._Reader.__init__, '__defaults__', (64,))
+    doc = {"info": {"segmentation": list(range(20000))}, "images": [{"id": 1}]}
+    assert list(iter_sections(io.BytesIO(json.dumps(doc).encode()), ('images',))) == [('images', {"id": 1})]
+    assert len(calls) < 40
+
+
+def test_iter_sections_empty_and_errors():
+    assert list(iter_sections(io.BytesIO(b'{}'), ('images',))) == []
+    assert list(iter_sections(io.BytesIO(b' { "images" : [ ] } '), ('images',))) == []
+    with pytest.raises(ValueError):
+        list(iter_sections(io.BytesIO(b'{"images": [1, 2'), ('images',)))
+
+
+def _coco_reference(path, img_dir):
+    # 原来的 json.load 实现
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    cats = {c['id']: c['name'] for c in data['categories']}
+    infos = {}
+    for img in data['images']:
+        infos[img['id']] = (img['file_name'], img['width'], img['height'], [])
+    for ann in data['annotations']:
+        if ann['image_id'] in infos:
+            x, y, w, h = ann['bbox']
+            infos[ann['image_id']][3].append((cats.get(ann['category_id'], 'unknown'), x, y, x + w, y + h))
+    return list(infos.values())
+
+
+@pytest.mark.parametrize('order', [('images', 'annotations', 'categories'),
+                                   ('annotations', 'categories', 'images'),
+                                   ('categories', 'annotations', 'images')])
+def test_coco_importer_matches_json_load(tmp_path, order):
+    path = tmp_path / 'coco.json'
+    path.write_text(json.dumps({key: DOC[key] for key in ('info',) + order}, ensure_ascii=False), encoding='utf-8')
+    expected = _coco_reference(str(path), 'img')
+    assert as_rows(COCOImporter().parse_all(str(path), 'img')) == expected
+    assert as_rows(COCOImporter().parse_table(str(path), 'img')) == expected
+
+
+def test_coco_importer_round_trip_unknown_sizes(tmp_path):
+    from converters import COCOExporter
+    infos = make_infos(15, unknown_size=True)
+    COCOExporter().export(infos, str(tmp_path / 'a.json'))
+    for parse in (COCOImporter().parse_all, COCOImporter().parse_table):
+        COCOExporter().export(parse(str(tmp_path / 'a.json'), ''), str(tmp_path / 'b.json'))
+        assert (tmp_path / 'b.json').read_bytes() == (tmp_path / 'a.json').read_bytes()
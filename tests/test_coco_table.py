@@ -0,0 +1,46 @@
+from ir_label import AnnotationTable
+from converters import COCOExporter
+from unilabel import convert
+
+from conftest import write_labelme, make_infos
+
+
+def test_table_export_matches_list(tmp_path):
+    infos = make_infos(30)
+    COCOExporter().export(infos, str(tmp_path / 'list.json'))
+    COCOExporter().export(AnnotationTable.from_infos(infos), str(tmp_path / 'table.json'))
+    assert (tmp_path / 'list.json').read_bytes() == (tmp_path / 'table.json').read_bytes()
+
+
+def test_table_export_unknown_size_is_null(tmp_path):
+    infos = make_infos(10, unknown_size=True)
+    COCOExporter().export(infos, str(tmp_path / 'list.json'))
+    COCOExporter().export(AnnotationTable.from_infos(infos), str(tmp_path / 'table.json'))
+    data = (tmp_path / 'table.json').read_bytes()
+    assert data == (tmp_path / 'list.json').read_bytes()
+    assert b'"width": null, "height": null' in data
+
+
+def test_labelme_without_size_columnar_and_snapshot(tmp_path):
+    src = tmp_path / 'lm'
+    write_labelme(src, 'a', [('cat', 1, 2, 30, 40)])
+    write_labelme(src, 'b', [('dog', 5, 5, 9, 9)], width=100, height=80)
+    outputs = {}
+    for mode in ('list', 'columnar', 'snapshot', 'stream'):
+        dst = tmp_path / f'{mode}.json'
+        convert('labelme', str(src), 'coco', str(dst), **({} if mode == 'list' else {mode: True}))
+        outputs[mode] = dst.read_bytes()
+    assert b'"width": -1' not in outputs['columnar']
+    assert outputs['columnar'] == outputs['snapshot'] == outputs['list'] == outputs['stream']
+
+
+def test_coco_parse_table_round_trip(tmp_path):
+    # 整数 / 小数坐标混合：parse_table 再导出与 parse_all (list) 再导出逐字节一致
+    from converters import COCOImporter
+    src = tmp_path / 'src.json'
+    COCOExporter().export(make_infos(40), str(src))
+    importer = COCOImporter()
+    COCOExporter().export(importer.parse_all(str(src), str(tmp_path)), str(tmp_path / 'list.json'))
+    COCOExporter().export(importer.parse_table(str(src), str(tmp_path)), str(tmp_path / 'table.json'))
+    assert (tmp_path / 'list.json').read_bytes() == (tmp_path / 'table.json').read_bytes()
+    assert (tmp_path / 'list.json').read_bytes() == src.read_bytes()
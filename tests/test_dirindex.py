@@ -0,0 +1,58 @@
+import os
+
+from dirindex import DirIndex
+from unilabel import load_dataset, list_tasks
+
+from conftest import write_labelme
+
+
+def _touch(folder, *names):
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        open(os.path.join(folder, name), 'wb').close()
+
+
+def test_pairing_priority_and_orphans(tmp_path):
+    _touch(tmp_path, 'a.txt', 'a.png', 'a.jpg', 'b.txt', 'b.BMP', 'c.txt', 'd.jpeg', 'classes.txt', 'notes.md')
+    index = DirIndex(str(tmp_path), '.txt', skip={'classes.txt'})
+    assert index.label_files() == ['a.txt', 'b.txt', 'c.txt']
+    assert index.image_entry('a').name == 'a.jpg'       # 按 IMG_EXTS 的顺序优先
+    assert index.image_entry('b').name == 'b.BMP'       # 扩展名不区分大小写
+    assert index.image_entry('c') is None
+    assert index.orphan_labels() == ['c.txt']
+    assert index.orphan_images() == ['d.jpeg']
+
+
+def test_exact_case_preferred(tmp_path):
+    _touch(tmp_path, 'a.JPG', 'a.jpg', 'a.json')
+    assert DirIndex(str(tmp_path), '.json').image_entry('a').name == 'a.jpg'
+
+
+def test_separate_image_folder(tmp_path):
+    _touch(tmp_path / 'labels', 'x.txt', 'y.txt', 'stray.jpg')
+    _touch(tmp_path / 'images', 'x.png', 'z.png')
+    index = DirIndex(str(tmp_path / 'labels'), '.txt', str(tmp_path / 'images'))
+    assert index.image_entry('x').path == os.path.join(str(tmp_path / 'images'), 'x.png')
+    assert index.image_entry('stray') is None       # 图片只在图片目录中找
+    assert index.orphan_labels() == ['y.txt'] and index.orphan_images() == ['z.png']
+
+
+def test_labelme_pairing_matches_exists_probe(tmp_path):
+    # 与原来逐个扩展名 os.path.exists 的结果一致；找不到图片时回退到 imagePath
+    for name, ext in (('a', '.png'), ('b', '.jpg'), ('c', None)):
+        write_labelme(tmp_path, name, [('cat', 1, 1, 2, 2)], width=4, height=4)
+        if ext:
+            _touch(tmp_path, name + ext)
+    infos = load_dataset('labelme', str(tmp_path))
+    assert [(info.filename, info.img_path) for info in infos] == [
+        ('a.png', os.path.join(str(tmp_path), 'a.png')), ('b.jpg', os.path.join(str(tmp_path), 'b.jpg')),
+        ('c.jpg', os.path.join(str(tmp_path), 'c.jpg'))]
+
+
+def test_orphans_logged_and_empty_folder(tmp_path):
+    _touch(tmp_path / 'voc', 'lonely.png')
+    messages = []
+    assert list_tasks('voc', str(tmp_path / 'voc'), log=messages.append) == []
+    assert any('lonely.png' in m for m in messages)
+    _touch(tmp_path / 'empty')
+    assert DirIndex(str(tmp_path / 'empty'), '.xml').label_files() == []
@@ -0,0 +1,161 @@
+import os
+
+import pytest
+from PIL import Image
+
+from ir_label import AnnotationTable, ImageInfo, BBox
+from imagecopy import ImageCopier, MODES
+from imgsize import probe_image_size
+from unilabel import convert
+
+from conftest import as_rows, read_tree
+
+
+def make_images(folder, n: int = 5, size=(200, 100)) -> list:
+    os.makedirs(folder, exist_ok=True)
+    infos = []
+    for i in range(n):
+        path = os.path.join(folder, f"{i}.png")
+        Image.new('RGB', size, (i * 40, 80, 160)).save(path)
+        infos.append(ImageInfo(f"{i}.png", path, *size, [BBox('cat', 20, 10, 100, 50), BBox('dog', 0, 0, 200, 100)]))
+    return infos
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_modes_produce_identical_files(tmp_path, mode):
+    infos = make_images(tmp_path / 'src')
+    out = tmp_path / 'out'
+    with ImageCopier(str(out), mode) as copier:
+        result = copier.apply(infos)
+    assert not copier.errors
+    assert sum(copier.counts.values()) == len(infos)
+    for info, new in zip(infos, result):
+        assert new.img_path == str(out / info.filename)
+        assert (new.width, new.height) == (info.width, info.height)
+        with open(info.img_path, 'rb') as a, open(new.img_path, 'rb') as b:
+            assert a.read() == b.read()
+        assert os.path.islink(new.img_path) == (mode == 'symlink')
+    assert as_rows(result) == as_rows(infos)
+
+    # 第二次全部跳过
+    with ImageCopier(str(out), mode) as copier:
+        copier.apply(infos)
+    assert copier.counts['skipped'] == len(infos)
+
+
+def test_changed_source_is_replaced(tmp_path):
+    infos = make_images(tmp_path / 'src', n=1)
+    out = tmp_path / 'out'
+    with ImageCopier(str(out), 'copy') as copier:
+        copier.apply(infos)
+    Image.new('RGB', (200, 100), (1, 2, 3)).save(infos[0].img_path)
+    with ImageCopier(str(out), 'copy') as copier:
+        copier.apply(infos)
+    assert copier.counts['copy'] == 1
+    assert (out / '0.png').read_bytes() == open(infos[0].img_path, 'rb').read()
+
+
+def test_missing_source_does_not_leave_dangling_symlink(tmp_path):
+    info = ImageInfo('gone.png', str(tmp_path / 'gone.png'), 10, 10)
+    with ImageCopier(str(tmp_path / 'out'), 'symlink') as copier:
+        result = copier.apply([info])
+    assert copier.counts['missing'] == 1 and copier.errors
+    assert not os.path.lexists(tmp_path / 'out' / 'gone.png')
+    assert as_rows(result) == as_rows([info])
+
+
+def test_name_conflict(tmp_path):
+    a = make_images(tmp_path / 'a', n=1)
+    b = make_images(tmp_path / 'b', n=1)
+    with ImageCopier(str(tmp_path / 'out'), 'copy') as copier:
+        copier.apply(a + b)
+    assert copier.counts['conflict'] == 1 and copier.counts['copy'] == 1
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_resize_scales_coordinates(tmp_path, workers):
+    infos = make_images(tmp_path / 'src')
+    with ImageCopier(str(tmp_path / 'list'), max_size=50, workers=workers) as copier:
+        on_list = copier.apply(infos)
+    with ImageCopier(str(tmp_path / 'table'), max_size=50, workers=workers) as copier:
+        on_table = copier.apply(AnnotationTable.from_infos(infos))
+    assert isinstance(on_table, AnnotationTable)
+    for result in (on_list, on_table):
+        for info in result:
+            assert (info.width, info.height) == (50, 25) == probe_image_size(info.img_path)
+            assert [(b.label, b.xmin, b.ymin, b.xmax, b.ymax) for b in info.bboxes] == \
+                   [('cat', 5.0, 2.5, 25.0, 12.5), ('dog', 0.0, 0.0, 50.0, 25.0)]
+    # 原数据不变
+    assert infos[0].bboxes[0].xmax == 100
+
+    with ImageCopier(str(tmp_path / 'list'), max_size=50) as copier:
+        again = copier.apply(infos)
+    assert copier.counts['skipped'] == len(infos)
+    assert as_rows(again) == as_rows(on_list)
+
+
+def test_small_images_are_not_scaled(tmp_path):
+    infos = make_images(tmp_path / 'src', n=1)
+    with ImageCopier(str(tmp_path / 'out'), max_size=400) as copier:
+        result = copier.apply(AnnotationTable.from_infos(infos))
+    assert as_rows(result) == as_rows(infos)
+    assert isinstance(result[0].bboxes[0].xmin, int)
+
+
+def test_reencode(tmp_path):
+    infos = make_images(tmp_path / 'src', n=2)
+    with ImageCopier(str(tmp_path / 'out'), image_format='jpg') as copier:
+        result = copier.apply(infos)
+    assert [info.filename for info in result] == ['0.jpg', '1.jpg']
+    with Image.open(result[0].img_path) as img:
+        assert img.format == 'JPEG' and img.size == (200, 100)
+
+
+def test_refuses_to_overwrite_source(tmp_path):
+    infos = make_images(tmp_path / 'src', n=1)
+    with ImageCopier(str(tmp_path / 'src'), max_size=50) as copier:
+        result = copier.apply(infos)
+    assert copier.errors and as_rows(result) == as_rows(infos)
+    assert probe_image_size(infos[0].img_path) == (200, 100)
+
+
+class Cancelled(Exception):
+    pass
+
+
+def _cancel_after(n: int):
+    def progress(done, total):
+        if done >= n:
+            raise Cancelled()
+    return progress
+
+
+@pytest.mark.parametrize('kwargs', [{'mode': 'copy', 'threads': 2}, {'max_size': 8, 'workers': 2}])
+def test_cancel_stops_queued_work(tmp_path, kwargs):
+    # 取消后排队的图片不再处理：只有窗口内 (线程 / 进程数 * 2) 已经提交的图片会输出
+    infos = make_images(tmp_path / 'src', n=200, size=(16, 16))
+    out = tmp_path / 'out'
+    with pytest.raises(Cancelled):
+        with ImageCopier(str(out), **kwargs) as copier:
+            copier.apply(infos, progress=_cancel_after(1))
+    written = len(os.listdir(out))
+    assert 0 < written < len(infos) // 2
+
+
+def test_bad_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        ImageCopier(str(tmp_path), 'move')
+    with pytest.raises(ValueError):
+        ImageCopier(str(tmp_path), image_format='gif')
+
+
+def test_convert_stream_matches_batch(tmp_path, synth):
+    outputs = []
+    for stream in (False, True):
+        dst = tmp_path / f"out_{stream}"
+        convert('coco', dst_fmt='labelme', dst=str(dst), max_image_size=32, stream=stream, **synth['coco'])
+        outputs.append(read_tree(dst))
+    assert outputs[0] == outputs[1]
+    assert sum(name.endswith('.json') for name in outputs[0]) == 24
+    assert len(outputs[0]) == 48
+    assert b'"imageWidth": 32' in outputs[0]['0000000.json']
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+from PIL import Image
+
+import converters
+from imgsize import probe_image_size, SizeCache, SIZE_CACHE_NAME
+from unilabel import load_dataset
+
+from conftest import as_rows
+
+
+@pytest.mark.parametrize('fmt, options', [
+    ('JPEG', {}), ('JPEG', {'progressive': True}), ('PNG', {}), ('BMP', {}), ('GIF', {}), ('TIFF', {}),
+])
+def test_probe_matches_pil(tmp_path, fmt, options):
+    path = str(tmp_path / f"img.{fmt.lower()}")
+    mode = 'L' if fmt == 'GIF' else 'RGB'
+    Image.new(mode, (37, 23)).save(path, fmt, **options)
+    with Image.open(path) as img:
+        assert probe_image_size(path) == img.size == (37, 23)
+
+
+def test_size_cache_round_trip_and_invalidation(tmp_path):
+    path = str(tmp_path / 'a.png')
+    Image.new('RGB', (10, 20)).save(path)
+    cache = SizeCache.for_folder(str(tmp_path))
+    assert cache.get(path) is None
+    cache.put(path, (10, 20))
+    cache.save()
+    assert (tmp_path / SIZE_CACHE_NAME).exists()
+    assert SizeCache.for_folder(str(tmp_path)).get(path) == (10, 20)
+    Image.new('RGB', (30, 40)).save(path)
+    os.utime(path, ns=(0, 0))
+    assert SizeCache.for_folder(str(tmp_path)).get(path) is None
+
+
+def test_corrupt_cache_is_ignored(tmp_path):
+    (tmp_path / SIZE_CACHE_NAME).write_text('{not json')
+    assert SizeCache.for_folder(str(tmp_path)).entries == {}
+
+
+def test_yolo_import_with_cache(synth, monkeypatch):
+    source = synth['yolo']
+    plain = load_dataset('yolo', source['src'], img_dir=source['img_dir'], size_cache=False)
+    first = load_dataset('yolo', source['src'], img_dir=source['img_dir'])
+    cache_path = os.path.join(source['img_dir'], SIZE_CACHE_NAME)
+    assert os.path.exists(cache_path)
+    assert len(SizeCache(cache_path).entries) == 24
+    monkeypatch.setattr(converters, 'probe_image_size', None)      # 第二次导入不再打开图片
+    second = load_dataset('yolo', source['src'], img_dir=source['img_dir'])
+    assert as_rows(first) == as_rows(second) == as_rows(plain)
+    assert all(info.width and info.height for info in plain)
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from unilabel import convert
+
+from conftest import read_tree, write_labelme
+
+
+def _bump(path, content: str = None):
+    if content is not None:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def _check(src_fmt, src, dst_fmt, out, tmp_path, **kwargs):
+    # 增量结果必须与对当前源数据集做一次完整转换的结果一致
+    stats = convert(src_fmt, src, dst_fmt, str(out), incremental=True, **kwargs)
+    ref = tmp_path / f"ref_{len(list(tmp_path.iterdir()))}"
+    convert(src_fmt, src, dst_fmt, str(ref), **kwargs)
+    assert read_tree(out) == read_tree(ref)
+    return stats
+
+
+@pytest.mark.parametrize('dst_fmt', ['yolo', 'labelme', 'coco'])
+def test_incremental_matches_full(tmp_path, synth, dst_fmt):
+    src = synth['voc']['src']
+    out = tmp_path / 'out'
+    assert _check('voc', src, dst_fmt, out, tmp_path)['images'] == 24
+    assert _check('voc', src, dst_fmt, out, tmp_path)['images'] == 0     # 没有变化
+
+    xml = os.path.join(src, '0000003.xml')
+    with open(xml, encoding='utf-8') as f:
+        text = f.read()
+    _bump(xml, text.replace('<name>class_00', '<name>renamed_', 1))
+    os.remove(os.path.join(src, '0000007.xml'))
+    stats = _check('voc', src, dst_fmt, out, tmp_path)
+    assert stats['removed'] == 1
+    if dst_fmt == 'labelme':
+        assert stats['images'] == 1
+        assert not (out / '0000007.json').exists()
+
+
+def test_hash_mode_ignores_touch(tmp_path):
+    src = tmp_path / 'lm'
+    for i in range(5):
+        write_labelme(src, f"{i}", [('cat', i, i, i + 5, i + 5)], width=50, height=50)
+    out = tmp_path / 'out'
+    assert convert('labelme', str(src), 'voc', str(out), incremental=True, use_hash=True)['images'] == 5
+    _bump(src / '2.json')
+    assert convert('labelme', str(src), 'voc', str(out), incremental=True, use_hash=True)['images'] == 0
+    # 新的 mtime 已经记入清单；再改一次 mtime，按 mtime 判断时要重新转换
+    assert convert('labelme', str(src), 'voc', str(out), incremental=True)['images'] == 0
+    _bump(src / '2.json')
+    assert convert('labelme', str(src), 'voc', str(out), incremental=True)['images'] == 1
+
+
+def test_failed_file_retried(tmp_path):
+    src = tmp_path / 'lm'
+    write_labelme(src, 'a', [('cat', 1, 1, 5, 5)], width=50, height=50)
+    (src / 'b.json').write_text('{broken')
+    out = tmp_path / 'out'
+    convert('labelme', str(src), 'yolo', str(out), incremental=True)
+    write_labelme(src, 'b', [('dog', 2, 2, 6, 6)], width=50, height=50)
+    _check('labelme', str(src), 'yolo', out, tmp_path)
+    assert (out / 'b.txt').read_text().startswith('1 ')
+
+
+def test_empty_source(tmp_path):
+    (tmp_path / 'empty').mkdir()
+    stats = convert('labelme', str(tmp_path / 'empty'), 'voc', str(tmp_path / 'out'), incremental=True)
+    assert stats['images'] == 0
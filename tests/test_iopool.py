@@ -0,0 +1,58 @@
+import time
+
+import iopool
+from iopool import ReadAhead
+
+
+class SlowStore:
+    # 模拟高延迟存储：每次读取 sleep，并记录读过的路径
+    def __init__(self):
+        self.reads = []
+
+    def read(self, path):
+        iopool.delay()
+        self.reads.append(path)
+        return path.encode()
+
+
+def test_read_ahead_survives_skipped_paths(monkeypatch):
+    monkeypatch.setitem(iopool._settings, 'latency', 0.002)
+    store = SlowStore()
+    paths = [f"{i}.xml" for i in range(200)]
+    ahead = ReadAhead(paths, store.read, readers=4, window=8)
+    try:
+        # 消费者只取偶数下标的文件，奇数的都被跳过
+        results = [ahead.take(path) for path in paths[::2]]
+    finally:
+        ahead.close()
+    assert results == [path.encode() for path in paths[::2]]
+
+
+def test_read_ahead_jump_past_window_and_unrelated_reads():
+    store = SlowStore()
+    paths = [f"{i}.xml" for i in range(100)]
+    ahead = ReadAhead(paths, store.read, readers=2, window=4)
+    try:
+        assert ahead.take('classes.txt') is None          # 不在序列中
+        assert ahead.take(paths[0]) == b'0.xml'
+        assert ahead.take(paths[50]) is None              # 窗口之后：调用者直接读取
+        assert [ahead.take(path) for path in paths[51:60]] == [p.encode() for p in paths[51:60]]
+    finally:
+        ahead.close()
+    assert not set(store.reads) & {f"{i}.xml" for i in range(10, 50)}
+
+
+def test_read_ahead_overlaps_latency(monkeypatch):
+    latency = 0.01
+    monkeypatch.setitem(iopool._settings, 'latency', latency)
+    paths = [f"{i}.xml" for i in range(40)]
+    store = SlowStore()
+    t0 = time.perf_counter()
+    ahead = ReadAhead(paths, store.read, readers=8)
+    try:
+        for path in paths[::2]:
+            assert ahead.take(path) is not None
+    finally:
+        ahead.close()
+    # 同步读取 20 个文件至少 20 * latency；8 个线程重叠后应远小于此
+    assert time.perf_counter() - t0 < 20 * latency * 0.6
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from ir_label import AnnotationTable
+from labelmap import LabelMap
+from unilabel import convert
+
+from conftest import as_rows, make_infos, read_tree
+
+RULES = """
+# 合并 class_0 / class_1，class_2 保留，其余删除
+class_1 -> merged
+class_0 -> merged     # 行尾注释
+class_2
+"""
+
+
+def test_parse_rules():
+    mapping = LabelMap.parse(RULES + "gone -> -\nalso_gone ->\n")
+    assert mapping.mapping == {'class_1': 'merged', 'class_0': 'merged', 'class_2': 'class_2',
+                               'gone': None, 'also_gone': None}
+    assert mapping.class_list() == ['merged', 'class_2']
+    assert mapping.map_label('other') is None
+
+
+def test_parse_keep_others():
+    for text in ("a -> b\n*\n", "a -> b\n* -> *\n"):
+        mapping = LabelMap.parse(text)
+        assert mapping.class_list() is None
+        assert mapping.map_label('other') == 'other'
+    assert LabelMap.parse("* -> -\n").map_label('other') is None
+
+
+@pytest.mark.parametrize('text', ["a -> b\na -> c\n", "-> b\n"])
+def test_parse_errors(text):
+    with pytest.raises(ValueError):
+        LabelMap.parse(text)
+
+
+def test_load_json(tmp_path):
+    path = tmp_path / 'map.json'
+    path.write_text(json.dumps({"class_1": "merged", "class_0": "merged", "class_2": "class_2"}), encoding='utf-8')
+    assert LabelMap.load(str(path)).mapping == LabelMap.parse(RULES).mapping
+    path.write_text(json.dumps({"a": 1}), encoding='utf-8')
+    with pytest.raises(ValueError):
+        LabelMap.load(str(path))
+
+
+@pytest.mark.parametrize('text', [RULES, RULES + "*\n", "class_0 -> class_2\n*\n", "* -> -\n"])
+def test_table_matches_list(text):
+    infos = make_infos(n_images=40, n_labels=4)
+    on_list, on_table = LabelMap.parse(text), LabelMap.parse(text)
+    expected = on_list.apply(infos)
+    result = on_table.apply(AnnotationTable.from_infos(infos))
+    assert isinstance(result, AnnotationTable)
+    assert as_rows(result) == as_rows(expected)
+    assert (on_table.renamed, on_table.dropped) == (on_list.renamed, on_list.dropped)
+    # 原数据不变
+    assert as_rows(infos) == as_rows(make_infos(n_images=40, n_labels=4))
+
+
+def test_empty_table():
+    assert as_rows(LabelMap.parse(RULES).apply(AnnotationTable.from_infos([]))) == []
+
+
+@pytest.mark.parametrize('dst_fmt', ['yolo', 'coco'])
+def test_convert_stream_matches_batch(tmp_path, synth, dst_fmt):
+    path = tmp_path / 'map.txt'
+    path.write_text("class_1 -> merged\nclass_0 -> merged\nclass_3\n", encoding='utf-8')
+    outputs = []
+    for name, kwargs in (('batch', {}), ('columnar', {'columnar': True}), ('stream', {'stream': True})):
+        dst = tmp_path / name
+        convert('voc', synth['voc']['src'], dst_fmt, str(dst / 'a.json' if dst_fmt == 'coco' else dst),
+                label_map=str(path), **kwargs)
+        outputs.append(read_tree(dst))
+    assert outputs[0] == outputs[1] == outputs[2]
+    if dst_fmt == 'yolo':
+        assert outputs[0]['classes.txt'].split() == [b'merged', b'class_3']
+    else:
+        data = json.loads(outputs[0]['a.json'])
+        assert [c['name'] for c in data['categories']] == ['merged', 'class_3']
@@ -0,0 +1,183 @@
+import os
+import threading
+
+import pytest
+
+import unilabel
+from ir_label import AnnotationTable
+from unilabel import load_dataset, open_lazy, LazyDataset
+
+from conftest import as_rows, write_labelme
+
+
+@pytest.mark.parametrize('fmt', ['voc', 'labelme', 'yolo'])
+def test_lazy_matches_load(synth, fmt):
+    source = synth[fmt]
+    expected = as_rows(load_dataset(fmt, **source))
+    lazy = open_lazy(fmt, **source)
+    assert isinstance(lazy, LazyDataset)
+    assert len(lazy) == len(expected) == 24
+    # 倒序访问：每张图片只在访问时解析
+    assert as_rows(lazy[i] for i in reversed(range(len(lazy)))) == expected[::-1]
+    assert not lazy.errors
+
+
+def test_snapshot_is_mapped(synth):
+    source = synth['labelme']
+    loaded = load_dataset('labelme', snapshot=True, **source)
+    lazy = open_lazy('labelme', **source)
+    assert isinstance(lazy, AnnotationTable)
+    assert as_rows(lazy) == as_rows(loaded)
+    assert isinstance(open_lazy('labelme', snapshot=False, **source), LazyDataset)
+
+
+def test_coco_needs_snapshot(synth):
+    source = synth['coco']
+    assert open_lazy('coco', **source) is None
+    loaded = load_dataset('coco', snapshot=True, **source)
+    assert as_rows(open_lazy('coco', **source)) == as_rows(loaded)
+
+
+def _count_calls(monkeypatch, *names):
+    calls = dict.fromkeys(names, 0)
+    for name in names:
+        func = getattr(unilabel, name)
+
+        def counted(*args, _name=name, _func=func, **kwargs):
+            calls[_name] += 1
+            return _func(*args, **kwargs)
+        monkeypatch.setattr(unilabel, name, counted)
+    return calls
+
+
+def test_load_reuses_lazy(synth, monkeypatch):
+    # 预览 + 完整加载 (main.py 的顺序)：快照和目录都只查找 / 扫描一次
+    source = synth['yolo']
+    expected = as_rows(load_dataset('yolo', **source))
+    calls = _count_calls(monkeypatch, 'snapshot_target', 'load_snapshot', 'list_tasks')
+    lazy = open_lazy('yolo', **source)
+    loaded = load_dataset('yolo', columnar=True, snapshot=True, lazy=lazy, **source)
+    assert as_rows(loaded) == expected
+    assert calls == {'snapshot_target': 1, 'load_snapshot': 1, 'list_tasks': 1}
+
+    # 第二次打开：快照命中，完整加载直接用同一个表
+    calls.update(dict.fromkeys(calls, 0))
+    lazy = open_lazy('yolo', **source)
+    assert isinstance(lazy, AnnotationTable)
+    done = []
+    assert load_dataset('yolo', columnar=True, snapshot=True, lazy=lazy, progress=lambda *a: done.append(a),
+                        **source) is lazy
+    assert done == [(24, 24)]
+    assert calls == {'snapshot_target': 1, 'load_snapshot': 1, 'list_tasks': 0}
+
+
+def test_lazy_warnings_logged_once(tmp_path):
+    write_labelme(tmp_path, 'a', [('cat', 1, 2, 3, 4)], 10, 10)
+    (tmp_path / 'orphan.jpg').write_bytes(b'')
+    early, messages = [], []
+    lazy = open_lazy('labelme', str(tmp_path), snapshot=False, log=early.append)
+    assert early == []
+    load_dataset('labelme', str(tmp_path), lazy=lazy, log=messages.append)
+    assert sum('orphan.jpg' in message for message in messages) == 1
+
+
+def test_cache_is_bounded(synth):
+    lazy = open_lazy('voc', cache_size=4, **synth['voc'])
+    first = lazy[0]
+    assert lazy[0] is first
+    for i in range(len(lazy)):
+        lazy[i]
+    assert len(lazy._cache) == 4
+    assert lazy[0] is not first and as_rows([lazy[0]]) == as_rows([first])
+
+
+def test_broken_file(tmp_path):
+    write_labelme(tmp_path, 'a', [('cat', 1, 2, 3, 4)], 10, 10)
+    (tmp_path / 'b.json').write_text('{broken', encoding='utf-8')
+    lazy = open_lazy('labelme', str(tmp_path))
+    assert len(lazy) == 2
+    assert as_rows(lazy) == [('a.jpg', 10, 10, [('cat', 1, 2, 3, 4)]), ('b.json', None, None, [])]
+    assert list(lazy.errors) == [1]
+
+
+def test_empty_folder(tmp_path):
+    assert len(open_lazy('voc', str(tmp_path))) == 0
+
+
+def _wait(app, predicate, timeout=5.0):
+    import time
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        app.processEvents()
+        time.sleep(0.005)
+
+
+def test_preview_model(synth, monkeypatch):
+    pytest.importorskip('PySide6')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide6.QtCore import Qt
+    from PySide6.QtWidgets import QApplication
+    from preview import PreviewList, INFO_ROLE
+    app = QApplication.instance() or QApplication([])
+    view = PreviewList()
+    try:
+        lazy = open_lazy('voc', **synth['voc'])
+        threads = []
+        parse = lazy._importer.parse
+
+        def recorded(*args):
+            threads.append(threading.current_thread())
+            return parse(*args)
+        monkeypatch.setattr(lazy._importer, 'parse', recorded)
+        view.set_source(lazy)
+        model = view.model()
+        assert model.rowCount() == 24
+        index = model.index(3, 0)
+        # 没解析的行先返回占位，在后台线程解析，完成后发出 dataChanged
+        changed = []
+        model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+        assert model.data(index, INFO_ROLE) is None
+        _wait(app, lambda: 3 in changed)
+        assert threads and threading.main_thread() not in threads
+        info = model.data(index, INFO_ROLE)
+        assert info is lazy.cached(3) and info is not None
+        assert model.data(index) == info.filename
+        assert model.data(index, Qt.ToolTipRole) == info.img_path
+        assert len(threads) == 1
+        # 完整加载后替换数据源：行数相同，内容相同
+        view.set_source(load_dataset('voc', columnar=True, **synth['voc']))
+        assert model.rowCount() == 24 and model.data(model.index(3, 0)) == info.filename
+        view.set_source(None)
+        assert model.rowCount() == 0
+    finally:
+        view.stop()
+        app.processEvents()
+
+
+def test_preview_paints_without_parsing(synth, monkeypatch):
+    # 绘制可见的行时界面线程不解析：先画占位，解析完成后重绘
+    pytest.importorskip('PySide6')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide6.QtWidgets import QApplication
+    from preview import PreviewList
+    app = QApplication.instance() or QApplication([])
+    view = PreviewList()
+    try:
+        lazy = open_lazy('labelme', **synth['labelme'])
+        parse = lazy._importer.parse
+        on_main = []
+
+        def recorded(*args):
+            on_main.append(threading.current_thread() is threading.main_thread())
+            return parse(*args)
+        monkeypatch.setattr(lazy._importer, 'parse', recorded)
+        view.resize(400, 300)
+        view.set_source(lazy)
+        view.grab()
+        _wait(app, lambda: lazy.cached(0) is not None)
+        view.grab()
+        assert on_main and not any(on_main)
+    finally:
+        view.stop()
+        app.processEvents()
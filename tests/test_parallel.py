@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from unilabel import load_dataset, list_tasks, parse_files
+
+from conftest import as_rows
+
+
+@pytest.mark.parametrize('fmt', ['voc', 'labelme', 'yolo'])
+def test_multiprocess_matches_single(synth, fmt):
+    source = synth[fmt]
+    single = load_dataset(fmt, source['src'], img_dir=source.get('img_dir'), size_cache=False)
+    multi = load_dataset(fmt, source['src'], img_dir=source.get('img_dir'), size_cache=False, workers=3)
+    assert len(single) == 24
+    assert as_rows(multi) == as_rows(single)
+
+
+def test_bad_file_reported_without_failing_others(synth):
+    folder = synth['voc']['src']
+    with open(os.path.join(folder, '0000005.xml'), 'w') as f:
+        f.write('<annotation><filename>')
+    tasks = list_tasks('voc', folder)
+    for workers in (1, 2):
+        data, errors = parse_files('voc', tasks, workers=workers, chunksize=4)
+        assert len(data) == 23
+        assert [os.path.basename(task[0]) for task, _ in errors] == ['0000005.xml']
+        assert '0000005.png' not in [info.filename for info in data]
+    messages = []
+    assert len(load_dataset('voc', folder, workers=2, log=messages.append)) == 23
+    assert any('0000005.xml' in m for m in messages)
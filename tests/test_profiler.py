@@ -0,0 +1,61 @@
+import json
+
+import profiler
+from unilabel import main, convert
+
+
+def test_disabled_is_noop():
+    profiler.stop()
+    profiler.start()
+    profiler.stop()
+    with profiler.stage('parse'):
+        profiler.count('parse', files=1, boxes=2)
+    assert profiler.collect()['stages'] == {}
+
+
+def test_nested_stages():
+    with profiler.profile() as session:
+        with profiler.stage('outer'):
+            with profiler.stage('inner'):
+                pass
+            with profiler.stage('inner'):
+                pass
+    outer, inner = session.stats['stages']['outer'], session.stats['stages']['inner']
+    assert (outer[0], inner[0]) == (1, 2)
+    assert abs(outer[2] - (outer[1] - inner[1])) < 1e-9
+    assert not profiler.enabled()
+
+
+def test_convert_counts(tmp_path, synth):
+    with profiler.profile() as session:
+        stats = convert('voc', synth['voc']['src'], 'coco', str(tmp_path / 'out'))
+    stages = session.stats['stages']
+    assert stages['parse'][3] == stats['images'] == 24
+    assert stages['parse'][4] == stats['boxes']
+    # NOTE: 只统计 images / annotations 两段，外层的括号和 categories 不计
+    size = (tmp_path / 'out' / 'instances_converted.json').stat().st_size
+    assert 0.9 * size < stages['write'][6] <= size
+    assert 'parse' in session.summary()
+
+
+def test_multiprocess_counts_are_merged(tmp_path, synth):
+    with profiler.profile() as session:
+        convert('labelme', synth['labelme']['src'], 'yolo', str(tmp_path / 'out'), workers=2)
+    assert session.stats['stages']['parse'][3] == 24
+
+
+def test_cli_trace(tmp_path, synth, capsys):
+    trace = tmp_path / 'trace.json'
+    assert main(['-q', '--trace', str(trace), 'voc', synth['voc']['src'], 'yolo', str(tmp_path / 'out')]) == 0
+    data = json.loads(trace.read_text(encoding='utf-8'))
+    events = data['traceEvents']
+    assert events and all(e['ph'] == 'X' and e['dur'] >= 0 for e in events)
+    assert {e['name'] for e in events} >= {'parse', 'write'}
+    assert data['otherData']['stages']['parse']['files'] == 24
+    assert 'stage' in capsys.readouterr().err
+
+
+def test_cli_profile_without_trace(tmp_path, synth, capsys):
+    assert main(['-q', '--profile', 'voc', synth['voc']['src'], 'yolo', str(tmp_path / 'out')]) == 0
+    assert 'parse' in capsys.readouterr().err
+    assert profiler.collect()['events'] == []
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from converters import COCOExporter
+from unilabel import convert, load_dataset, merge_coco_files
+
+from conftest import as_rows, make_infos
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize('as_iter', [False, True])
+def test_shards_concatenate_to_single_export(tmp_path, as_iter):
+    infos = make_infos(23, n_labels=4, seed=8)
+    COCOExporter().export(infos, str(tmp_path / 'single.json'))
+    single = _load(tmp_path / 'single.json')
+    paths = COCOExporter().export_sharded(iter(infos) if as_iter else infos, str(tmp_path / 'shards'),
+                                          shard_images=5, prefix='train')
+    assert [p.rsplit('/', 1)[-1] for p in paths] == [f"train_{i:05d}.json" for i in range(5)]
+    shards = [_load(p) for p in paths]
+    assert [len(s['images']) for s in shards] == [5, 5, 5, 5, 3]
+    assert all(s['categories'] == single['categories'] for s in shards)
+    assert [img for s in shards for img in s['images']] == single['images']
+    assert [ann for s in shards for ann in s['annotations']] == single['annotations']
+
+
+def test_shard_bytes(tmp_path):
+    infos = make_infos(200, seed=9)
+    paths = COCOExporter().export_sharded(infos, str(tmp_path), shard_bytes=4000)
+    shards = [_load(p) for p in paths]
+    assert len(shards) > 2
+    assert sum(len(s['images']) for s in shards) == 200
+    assert sorted(ann['id'] for s in shards for ann in s['annotations']) == \
+           list(range(1, sum(len(i.bboxes) for i in infos) + 1))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_merge_round_trip(tmp_path, synth, workers):
+    source = synth['coco']
+    expected = as_rows(load_dataset('coco', source['src']))
+    convert('coco', source['src'], 'coco', str(tmp_path / 'out' / 'train.json'), shard_images=7)
+    merged = load_dataset('coco', str(tmp_path / 'out'), img_dir=source['img_dir'], workers=workers)
+    assert as_rows(merged) == expected
+    assert as_rows(load_dataset('coco', str(tmp_path / 'out' / 'train_*.json'), img_dir=source['img_dir'])) == expected
+
+
+def test_merge_duplicate_images(tmp_path):
+    a, b = make_infos(3, seed=1), make_infos(3, seed=2)
+    COCOExporter().export(a, str(tmp_path / 'a.json'))
+    COCOExporter().export(b, str(tmp_path / 'b.json'))
+    messages = []
+    merged = merge_coco_files([str(tmp_path / 'a.json'), str(tmp_path / 'b.json')], str(tmp_path),
+                              log=messages.append)
+    assert [len(info.bboxes) for info in merged] == [len(x.bboxes) + len(y.bboxes) for x, y in zip(a, b)]
+    assert any('3 张图片' in m for m in messages)
+
+
+def test_empty_dataset_single_shard(tmp_path):
+    paths = COCOExporter().export_sharded([], str(tmp_path), shard_images=10)
+    assert len(paths) == 1 and _load(paths[0]) == {"images": [], "annotations": [], "categories": []}
+    assert list(tmp_path.iterdir()) == [tmp_path / 'instances_00000.json']
@@ -0,0 +1,64 @@
+import os
+import time
+
+from ir_label import AnnotationTable
+from unilabel import load_dataset, snapshot_target, open_lazy
+from snapshot import load_snapshot
+
+from conftest import write_labelme
+
+
+def _dataset(tmp_path):
+    src = tmp_path / 'lm'
+    write_labelme(src, 'a', [('cat', 1, 2, 30, 40), ('dog', 3.5, 4, 10, 12.25)], width=100, height=80)
+    write_labelme(src, 'b', [], width=64, height=48)
+    write_labelme(src, 'c', [('cat', 0, 0, 5, 5)])
+    return src
+
+
+def _rows(data):
+    return [(i.filename, i.width, i.height, [(b.label, b.xmin, b.ymin, b.xmax, b.ymax) for b in i.bboxes])
+            for i in data]
+
+
+def test_snapshot_in_cache_dir_matches_list(tmp_path, cache_dir):
+    src = _dataset(tmp_path)
+    before = sorted(os.listdir(src))
+    expected = _rows(load_dataset('labelme', str(src)))
+    table = load_dataset('labelme', str(src), snapshot=True)
+    assert isinstance(table, AnnotationTable)
+    assert sorted(os.listdir(src)) == before        # 源文件夹不写入任何文件
+    snap_path, key, digest = snapshot_target('labelme', str(src))
+    assert os.path.dirname(os.path.dirname(snap_path)) == str(cache_dir)
+    assert os.path.isfile(snap_path)
+    for data in (table, load_snapshot(snap_path, key, digest), open_lazy('labelme', str(src))):
+        assert _rows(data) == expected
+
+
+def test_snapshot_invalidated_by_source_change(tmp_path):
+    src = _dataset(tmp_path)
+    load_dataset('labelme', str(src), snapshot=True)
+    assert load_snapshot(*snapshot_target('labelme', str(src))) is not None
+    time.sleep(0.01)
+    write_labelme(src, 'd', [('bird', 1, 1, 2, 2)], width=10, height=10)
+    assert load_snapshot(*snapshot_target('labelme', str(src))) is None
+    table = load_dataset('labelme', str(src), snapshot=True)
+    assert len(table) == 4 and _rows(table) == _rows(load_dataset('labelme', str(src)))
+
+
+def test_unwritable_cache_dir_falls_back(tmp_path, monkeypatch):
+    src = _dataset(tmp_path)
+    blocker = tmp_path / 'not_a_dir'
+    blocker.write_text('')
+    monkeypatch.setenv('UNILABEL_CACHE_DIR', str(blocker))     # 缓存目录无法创建
+    messages = []
+    table = load_dataset('labelme', str(src), snapshot=True, log=messages.append)
+    assert _rows(table) == _rows(load_dataset('labelme', str(src)))
+    assert any(m.startswith('[Warning] 无法保存快照') for m in messages)
+
+
+def test_empty_dataset_snapshot(tmp_path):
+    src = tmp_path / 'empty'
+    src.mkdir()
+    assert len(load_dataset('labelme', str(src), snapshot=True)) == 0
+    assert len(load_dataset('labelme', str(src), snapshot=True)) == 0
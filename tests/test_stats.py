@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+import pytest
+
+from ir_label import AnnotationTable
+from stats import DatasetIndex, SIZE_BINS, parse_query, take_images
+from unilabel import convert, load_dataset
+
+from conftest import make_infos, SAMPLES
+
+
+def _index(infos, batch: int = 7) -> DatasetIndex:
+    # 分批增量更新，与导入时相同
+    index = DatasetIndex()
+    table = AnnotationTable()
+    for start in range(0, len(infos), batch):
+        for info in infos[start:start + batch]:
+            table.add_info(info)
+        index.update(table)
+    return index
+
+
+def _brute_query(infos, labels=None, min_width=None, max_width=None, min_height=None, max_height=None,
+                 min_area=None, max_area=None):
+    def ok(value, low, high):
+        return (low is None or value >= low) and (high is None or value <= high)
+    found = []
+    for i, info in enumerate(infos):
+        for box in info.bboxes:
+            w, h = np.float32(box.xmax - box.xmin), np.float32(box.ymax - box.ymin)
+            if (labels is None or box.label in labels) and ok(w, min_width, max_width) \
+                    and ok(h, min_height, max_height) and ok(w * h, min_area, max_area):
+                found.append(i)
+                break
+    return found
+
+
+QUERIES = [
+    {},
+    {'labels': ['class_0']},
+    {'labels': ['class_1', 'class_2'], 'min_width': 10},
+    {'min_width': 5, 'max_width': 20, 'min_height': 3.5},
+    {'labels': ['class_2'], 'min_area': 100, 'max_area': 600},
+    {'labels': ['missing']},
+]
+
+
+@pytest.mark.parametrize('kwargs', QUERIES)
+def test_query_matches_brute_force(kwargs):
+    infos = make_infos(200, n_labels=4)
+    assert _index(infos).query(**kwargs).tolist() == _brute_query(infos, **kwargs)
+
+
+def test_counts_and_to_dict_match_brute_force():
+    infos = make_infos(150, n_labels=4, seed=3)
+    index = _index(infos)
+    labels = sorted({box.label for info in infos for box in info.bboxes})
+    for label in labels:
+        images = [i for i, info in enumerate(infos) if any(box.label == label for box in info.bboxes)]
+        assert index.images_with(label).tolist() == images
+        assert index.class_counts()[label] == (sum(box.label == label for info in infos for box in info.bboxes),
+                                               len(images))
+    assert index.images_with('missing').tolist() == []
+    data = json.loads(json.dumps(index.to_dict()))
+    assert data['images'] == len(infos)
+    assert data['boxes'] == sum(len(info.bboxes) for info in infos)
+    assert data['empty_images'] == sum(not info.bboxes for info in infos)
+    for label in labels:
+        sizes = [np.sqrt((box.xmax - box.xmin) * (box.ymax - box.ymin))
+                 for info in infos for box in info.bboxes if box.label == label]
+        hist = np.bincount(np.searchsorted(SIZE_BINS, sizes, side='right'), minlength=len(SIZE_BINS) + 1)
+        assert data['classes'][label]['size_hist'] == hist.tolist()
+
+
+def test_take_images_round_trip():
+    infos = make_infos(60, seed=5)
+    table = AnnotationTable.from_infos(infos)
+    picks = [0, 3, 4, 17, 59, 3]
+    subset = take_images(table, picks)
+    expected = [infos[i] for i in picks]
+    assert len(subset) == len(expected)
+    for view, info in zip(subset, expected):
+        assert (view.filename, view.img_path, view.width, view.height) == \
+               (info.filename, info.img_path, info.width, info.height)
+        assert [(b.label, b.xmin, b.ymin, b.xmax, b.ymax) for b in view.bboxes] == \
+               [(b.label, b.xmin, b.ymin, b.xmax, b.ymax) for b in info.bboxes]
+        assert [type(b.xmin) for b in view.bboxes] == [type(b.xmin) for b in info.bboxes]
+    assert len(take_images(table, [])) == 0
+    assert take_images(table, range(len(table))).coords.tolist() == table.coords.tolist()
+
+
+def test_empty_dataset():
+    index = _index([])
+    assert index.query().tolist() == [] and index.class_counts() == {}
+    assert index.to_dict()['images'] == 0
+
+
+def test_parse_query():
+    assert parse_query("person, car ,min_width=100,max-area=5e3") == \
+           {'labels': ['person', 'car'], 'min_width': 100.0, 'max_area': 5000.0}
+    with pytest.raises(ValueError):
+        parse_query("person,min_size=3")
+
+
+def test_convert_query_exports_subset(tmp_path):
+    src = f"{SAMPLES}/VOC"
+    infos = load_dataset('voc', src)
+    stats = convert('voc', src, 'labelme', str(tmp_path / 'out'), query='person,min_width=50', dataset_stats=True)
+    expected = _brute_query(infos, labels=['person'], min_width=50)
+    assert sorted(p.stem for p in (tmp_path / 'out').glob('*.json')) == \
+           sorted(infos[i].filename.rsplit('.', 1)[0] for i in expected)
+    assert stats['images'] == stats['dataset']['images'] == len(expected)
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from unilabel import convert, prefetch, FORMATS
+
+from conftest import read_tree
+
+
+@pytest.mark.parametrize('src_fmt', FORMATS)
+def test_stream_matches_batch(tmp_path, synth, src_fmt):
+    source = synth[src_fmt]
+    for dst_fmt in FORMATS:
+        outputs = []
+        for stream in (False, True):
+            dst = tmp_path / f"{dst_fmt}_{stream}"
+            convert(src_fmt, source['src'], dst_fmt, str(dst), img_dir=source.get('img_dir'), stream=stream,
+                    size_cache=False)
+            outputs.append(read_tree(dst))
+        assert outputs[0] == outputs[1], (src_fmt, dst_fmt)
+
+
+def test_stream_multiprocess_and_empty(tmp_path, synth):
+    source = synth['labelme']
+    convert('labelme', source['src'], 'coco', str(tmp_path / 'a.json'))
+    convert('labelme', source['src'], 'coco', str(tmp_path / 'b.json'), stream=True, workers=2)
+    assert (tmp_path / 'a.json').read_bytes() == (tmp_path / 'b.json').read_bytes()
+    (tmp_path / 'empty').mkdir()
+    for dst_fmt in FORMATS:
+        stats = convert('labelme', str(tmp_path / 'empty'), dst_fmt, str(tmp_path / f"empty_{dst_fmt}"), stream=True)
+        assert stats['images'] == 0
+
+
+def test_prefetch_is_bounded_and_propagates_errors():
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+        raise RuntimeError("boom")
+
+    stream = prefetch(source(), maxsize=3)
+    assert next(stream) == 0
+    time.sleep(0.05)
+    assert len(produced) <= 5       # 队列 3 个 + 已取走 1 个 + 正在等待放入的 1 个
+    with pytest.raises(RuntimeError, match="boom"):
+        list(stream)
+    assert len(produced) == 100
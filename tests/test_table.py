@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from ir_label import AnnotationTable, ImageInfo, BBox
+from unilabel import convert, FORMATS
+
+from conftest import make_infos, read_tree
+
+
+def test_views_equal_infos():
+    infos = make_infos(50, seed=4)
+    table = AnnotationTable(capacity=1)     # 逐次扩容
+    table.extend(infos)
+    assert len(table) == len(infos) and table.num_boxes == sum(len(i.bboxes) for i in infos)
+    assert list(table) == infos
+    assert table[-1] == infos[-1] and table[3:7] == infos[3:7]
+    assert table[5].bboxes[-1:] == infos[5].bboxes[-1:]
+    with pytest.raises(IndexError):
+        table[len(infos)]
+    assert table.box_image_index().tolist() == [i for i, info in enumerate(infos) for _ in info.bboxes]
+    assert table.labels().tolist() == [box.label for info in infos for box in info.bboxes]
+
+
+def test_view_writes_go_to_arrays():
+    table = AnnotationTable.from_infos(make_infos(5, seed=1) + [ImageInfo("x.jpg", "x.jpg", 10, 10,
+                                                                          [BBox("a", 1, 2, 3, 4)])])
+    view = table[-1]
+    view.width = None
+    assert view.width is None and table.sizes[-1, 0] == -1
+    box = view.bboxes[0]
+    box.label = "new_label"
+    box.xmax = 9.5
+    assert table.categories[table.cat_ids[-1]] == "new_label"
+    assert table.coords[-1].tolist() == [1, 2, 9.5, 4]
+    assert box == BBox("new_label", 1, 2, 9.5, 4)
+
+
+def test_add_image_with_arrays():
+    table = AnnotationTable()
+    cat = table.intern("cat")
+    table.add_image("a.jpg", "a.jpg", 4, 3, np.array([cat, cat], dtype=np.int32),
+                    np.array([[0, 0, 1, 1], [1, 1, 2.5, 2]], dtype=np.float64))
+    table.add_image("b.jpg", "b.jpg", None, None)
+    assert table.offsets.tolist() == [0, 2, 2]
+    assert table[0].bboxes == [BBox("cat", 0.0, 0.0, 1.0, 1.0), BBox("cat", 1.0, 1.0, 2.5, 2.0)]
+    assert table[1] == ImageInfo("b.jpg", "b.jpg", None, None)
+
+
+def test_empty_table():
+    table = AnnotationTable.from_infos([])
+    assert len(table) == 0 and list(table) == [] and table.coords.shape == (0, 4)
+    assert table.box_image_index().tolist() == []
+
+
+@pytest.mark.parametrize('src_fmt', FORMATS)
+def test_columnar_convert_matches_list(tmp_path, synth, src_fmt):
+    source = synth[src_fmt]
+    for dst_fmt in FORMATS:
+        outputs = []
+        for columnar in (False, True):
+            dst = tmp_path / f"{dst_fmt}_{columnar}"
+            convert(src_fmt, source['src'], dst_fmt, str(dst), img_dir=source.get('img_dir'), columnar=columnar,
+                    size_cache=False)
+            outputs.append(read_tree(dst))
+        assert outputs[0] == outputs[1], (src_fmt, dst_fmt)
+
+
+def test_int_mask_contract(tmp_path):
+    # ir_label 中 int_mask 的约定：整数坐标在每个重建表的阶段后仍是 int，导出与 list IR 逐字节一致
+    from converters import COCOExporter
+    from labelmap import LabelMap
+    from snapshot import save_snapshot, load_snapshot
+    from stats import take_images
+    from validate import Validator
+
+    def types(data):
+        return [[tuple(type(getattr(box, k)) for k in ('xmin', 'ymin', 'xmax', 'ymax')) for box in info.bboxes]
+                for info in data]
+
+    infos = make_infos(30, n_labels=2)
+    for info in infos:
+        info.width = info.height = 1000     # 没有越界的框，校验不删除任何框
+    table = AnnotationTable.from_infos(infos)
+    assert types(table) == types(infos) and int in {t for row in types(infos) for box in row for t in box}
+    save_snapshot(table, str(tmp_path / 'snap'), {}, 'x')
+    stages = {'snapshot': load_snapshot(str(tmp_path / 'snap'), {}, 'x'),
+              'labelmap': LabelMap.parse("class_0\nclass_1\n").apply_table(table),
+              'validate': Validator('drop').check(table),
+              'take_images': take_images(table, np.arange(table.num_images))}
+    COCOExporter().export(infos, str(tmp_path / 'list.json'))
+    for name, result in stages.items():
+        assert types(result) == types(infos), name
+        COCOExporter().export(result, str(tmp_path / f'{name}.json'))
+        assert (tmp_path / f'{name}.json').read_bytes() == (tmp_path / 'list.json').read_bytes(), name
+
+    # 不传 int_mask 时全部是 float；写入坐标时按新值的类型更新
+    plain = AnnotationTable.from_arrays(table.filenames, table.img_paths, table.sizes, table.offsets, table.coords,
+                                        table.cat_ids, table.categories)
+    assert all(t is float for row in types(plain) for box in row for t in box)
+    view = next(box for info in table for box in info.bboxes)
+    view.xmin = 1.5
+    assert type(view.xmin) is float
+    view.xmin = 2
+    assert type(view.xmin) is int
@@ -0,0 +1,85 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+
+from ir_label import ImageInfo, BBox, AnnotationTable
+from converters import VOCExporter, LabelMeExporter
+
+from conftest import make_infos
+
+# 基准实现 (json.dump / ElementTree)，模板导出器的输出必须与之逐字节一致
+
+
+def reference_labelme(info) -> str:
+    data = {"version": "5.5.0", "flags": {}, "shapes": [], "imagePath": info.filename, "imageData": None,
+            "imageHeight": info.height, "imageWidth": info.width}
+    for box in info.bboxes:
+        data["shapes"].append({"label": box.label, "points": [[box.xmin, box.ymin], [box.xmax, box.ymax]],
+                               "group_id": None, "description": "", "shape_type": "rectangle",
+                               "flags": {}, "mask": None})
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+
+def reference_voc(info) -> bytes:
+    root = ET.Element("annotation")
+    ET.SubElement(root, "folder").text = os.path.basename(os.path.dirname(info.img_path)) or "Unspecified"
+    ET.SubElement(root, "filename").text = info.filename
+    ET.SubElement(root, "path").text = os.path.abspath(info.img_path)
+    ET.SubElement(ET.SubElement(root, "source"), "database").text = "Unknown"
+    size = ET.SubElement(root, "size")
+    ET.SubElement(size, "width").text = str(info.width)
+    ET.SubElement(size, "height").text = str(info.height)
+    ET.SubElement(size, "depth").text = "3"
+    ET.SubElement(root, "segmented").text = "0"
+    for box in info.bboxes:
+        obj = ET.SubElement(root, "object")
+        ET.SubElement(obj, "name").text = box.label
+        ET.SubElement(obj, "pose").text = "Unspecified"
+        ET.SubElement(obj, "truncated").text = "0"
+        ET.SubElement(obj, "difficult").text = "0"
+        bndbox = ET.SubElement(obj, "bndbox")
+        for name in ('xmin', 'ymin', 'xmax', 'ymax'):
+            ET.SubElement(bndbox, name).text = str(int(getattr(box, name)))
+    tree = ET.ElementTree(root)
+    ET.indent(tree, space="  ", level=0)
+    return ET.tostring(root, encoding='unicode').encode('utf-8')
+
+
+def edge_infos() -> list:
+    infos = make_infos(30)
+    odd = ImageInfo('odd "名字" <&>\\.jpg', '/data/sub dir/odd.jpg', None, None)
+    odd.bboxes = [BBox('类别 "q" <&>', 0, 0.1, 1e20, 2.5e-7), BBox('nan', float('nan'), 1, float('inf'), -float('inf')),
+                  BBox('big', 10 ** 20, -3, 7, True)]
+    infos.append(odd)
+    infos.append(ImageInfo('empty.jpg', 'empty.jpg', 10, 10))
+    return infos
+
+
+def test_labelme_matches_json_dump():
+    exporter = LabelMeExporter()
+    for info in edge_infos():
+        assert exporter.serialize(info) == reference_labelme(info)
+
+
+def test_labelme_table_views_match_list():
+    exporter = LabelMeExporter()
+    infos = make_infos(30)
+    for info, view in zip(infos, AnnotationTable.from_infos(infos)):
+        assert exporter.serialize(view) == reference_labelme(info)
+
+
+def test_voc_matches_elementtree():
+    exporter = VOCExporter()
+    for info in edge_infos()[:-2] + edge_infos()[-1:]:
+        assert exporter.serialize(info).encode('utf-8') == reference_voc(info)
+
+
+def test_export_all_writes_every_file(tmp_path):
+    infos = make_infos(50)
+    for exporter, ext in ((VOCExporter(), '.xml'), (LabelMeExporter(), '.json')):
+        out = tmp_path / ext[1:]
+        exporter.export_all(infos, str(out), workers=3)
+        assert sorted(os.listdir(out)) == sorted(os.path.splitext(i.filename)[0] + ext for i in infos)
+        for info in infos[:5]:
+            data = (out / (os.path.splitext(info.filename)[0] + ext)).read_text(encoding='utf-8')
+            assert data == exporter.serialize(info)
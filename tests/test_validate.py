@@ -0,0 +1,150 @@
+import math
+import random
+
+import pytest
+
+from ir_label import AnnotationTable, ImageInfo, BBox
+from validate import Validator, ISSUES
+from unilabel import convert
+
+from conftest import as_rows, write_labelme
+
+CLASSES = ['cat', 'dog', 'person']
+
+
+def dirty_infos(n_images: int = 60, seed: int = 0, unknown_size: bool = False) -> list:
+    # 每种问题都有：NaN / inf、反向、面积为 0、越界、重复、空类别和不在 CLASSES 中的类别
+    rng = random.Random(seed)
+    infos = []
+    for i in range(n_images):
+        w, h = (None, None) if unknown_size and i % 2 else (rng.randint(50, 200), rng.randint(50, 200))
+        info = ImageInfo(f"{i:04d}.jpg", f"/data/{i:04d}.jpg", w, h)
+        for _ in range(rng.randint(0, 6)):
+            label = rng.choice(CLASSES + ['', 'bird'] if rng.random() < 0.1 else CLASSES)
+            x1, y1 = rng.randint(-10, 180), rng.randint(-10, 180)
+            x2, y2 = x1 + rng.randint(-5, 60), y1 + rng.choice([0, rng.randint(1, 60), rng.random() * 30])
+            kind = rng.random()
+            if kind < 0.05:
+                x1 = math.nan
+            elif kind < 0.08:
+                y2 = math.inf
+            info.bboxes.append(BBox(label, x1, y1, x2, y2))
+            if rng.random() < 0.1:
+                info.bboxes.append(BBox(label, x1, y1, x2, y2))
+        infos.append(info)
+    return infos
+
+
+def brute_force(infos, mode: str):
+    # 逐框的参考实现：返回 (问题计数, 修正后的行, 裁剪数, 删除数)
+    counts = dict.fromkeys(ISSUES, 0)
+    rows, clipped, dropped = [], 0, 0
+    for info in infos:
+        w = math.inf if info.width is None else info.width
+        h = math.inf if info.height is None else info.height
+        seen, seen_fixed, kept = set(), set(), []
+        for box in info.bboxes:
+            c = (box.xmin, box.ymin, box.xmax, box.ymax)
+            finite = all(math.isfinite(v) for v in c)
+            flags = {'nan': not finite,
+                     'inverted': finite and (c[2] < c[0] or c[3] < c[1]),
+                     'zero_area': finite and (c[2] == c[0] or c[3] == c[1]),
+                     'out_of_bounds': finite and (min(c[0], c[2]) < 0 or min(c[1], c[3]) < 0 or
+                                                  max(c[0], c[2]) > w or max(c[1], c[3]) > h),
+                     'duplicate': finite and (box.label, c) in seen,
+                     'unknown_class': box.label not in CLASSES}
+            if finite:
+                seen.add((box.label, c))
+            for key, flag in flags.items():
+                counts[key] += flag
+            if mode == 'report':
+                kept.append((box.label,) + c)
+            elif mode == 'drop':
+                if any(flags.values()):
+                    dropped += 1
+                else:
+                    kept.append((box.label,) + c)
+            else:
+                if not finite or flags['unknown_class']:
+                    dropped += 1
+                    continue
+                fixed = (min(max(min(c[0], c[2]), 0), w), min(max(min(c[1], c[3]), 0), h),
+                         min(max(max(c[0], c[2]), 0), w), min(max(max(c[1], c[3]), 0), h))
+                if fixed[2] <= fixed[0] or fixed[3] <= fixed[1] or (box.label, fixed) in seen_fixed:
+                    dropped += 1
+                    continue
+                seen_fixed.add((box.label, fixed))
+                clipped += flags['inverted'] or flags['out_of_bounds']
+                kept.append((box.label,) + fixed)
+        rows.append((info.filename, info.width, info.height, kept))
+    return counts, rows, clipped, dropped
+
+
+@pytest.mark.parametrize('unknown_size', [False, True])
+@pytest.mark.parametrize('mode', ['report', 'clip', 'drop'])
+def test_matches_brute_force(mode, unknown_size):
+    infos = dirty_infos(unknown_size=unknown_size)
+    counts, rows, clipped, dropped = brute_force(infos, mode)
+    assert all(counts.values())
+    validator = Validator(mode, CLASSES)
+    result = validator.check(AnnotationTable.from_infos(infos))
+    assert validator.counts == counts
+    assert validator.boxes == sum(len(info.bboxes) for info in infos)
+    assert (validator.clipped, validator.dropped) == (clipped, dropped)
+    if mode == 'report':
+        assert repr(as_rows(result)) == repr(rows)      # repr: NaN 也能比较
+    else:
+        assert as_rows(result) == rows
+
+
+def test_unknown_size_skips_bounds():
+    info = ImageInfo('a.jpg', '/data/a.jpg', None, None, [BBox('cat', 10, 10, 5000, 5000)])
+    validator = Validator('clip', CLASSES)
+    result = validator.check(AnnotationTable.from_infos([info]))
+    assert validator.counts['out_of_bounds'] == 0
+    assert as_rows(result) == as_rows([info])
+
+
+def test_without_classes_only_empty_label_is_unknown():
+    infos = [ImageInfo('a.jpg', '', 10, 10, [BBox('', 1, 1, 2, 2), BBox('anything', 1, 1, 2, 2)])]
+    validator = Validator('report')
+    validator.check(AnnotationTable.from_infos(infos))
+    assert validator.unknown == {'': 1}
+
+
+@pytest.mark.parametrize('mode', ['report', 'clip', 'drop'])
+def test_check_infos_matches_check(mode):
+    infos = dirty_infos(seed=1)
+    batch, stream = Validator(mode, CLASSES), Validator(mode, CLASSES)
+    expected = as_rows(batch.check(AnnotationTable.from_infos(infos)))
+    assert repr(as_rows(stream.check_infos(iter(infos), batch_size=7))) == repr(expected)
+    assert (stream.counts, stream.clipped, stream.dropped) == (batch.counts, batch.clipped, batch.dropped)
+
+
+def test_empty_dataset():
+    validator = Validator('drop')
+    table = AnnotationTable.from_infos([ImageInfo('a.jpg', '', 10, 10)])
+    assert as_rows(validator.check(table)) == [('a.jpg', 10, 10, [])]
+    assert as_rows(validator.check(AnnotationTable.from_infos([]))) == []
+    assert list(validator.check_infos([])) == []
+    messages = []
+    validator.log(messages.append)
+    assert validator.boxes == 0 and '没有发现问题' in messages[0]
+
+
+def test_bad_mode():
+    with pytest.raises(ValueError):
+        Validator('fix')
+
+
+def test_convert_stream_matches_batch(tmp_path):
+    src = tmp_path / 'src'
+    write_labelme(src, 'a', [('cat', -5, 2, 20, 30), ('cat', -5, 2, 20, 30), ('dog', 40, 40, 30, 50)], 32, 32)
+    write_labelme(src, 'b', [('cat', 1, 1, 1, 9), ('person', 3, 4, 5, 6)], 32, 32)
+    results = {}
+    for stream in (False, True):
+        out = tmp_path / f"out_{stream}"
+        convert('labelme', str(src), 'coco', str(out / 'a.json'), validate='clip', stream=stream)
+        results[stream] = (out / 'a.json').read_bytes()
+    assert results[False] == results[True]
+    assert b'"bbox": [0, 2, 20, 28]' in results[False]
@@ -0,0 +1,77 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from converters import VOCImporter
+
+
+def reference_parse(xml_path):
+    # 原来的 ElementTree 实现
+    root = ET.parse(xml_path).getroot()
+    size = root.find('size')
+    info = (root.find('filename').text, os.path.join(os.path.dirname(xml_path), root.find('filename').text),
+            int(size.find('width').text), int(size.find('height').text), [])
+    for obj in root.findall('object'):
+        box = obj.find('bndbox')
+        info[4].append((obj.find('name').text,) + tuple(float(box.find(k).text) for k in ('xmin', 'ymin', 'xmax', 'ymax')))
+    return info
+
+
+def _obj(name='dog', xmin='1', ymin='2', xmax='30', ymax='40', extra=''):
+    return (f"<object><name>{name}</name><pose>Unspecified</pose><truncated>0</truncated><difficult>0</difficult>{extra}"
+            f"<bndbox><xmin>{xmin}</xmin><ymin>{ymin}</ymin><xmax>{xmax}</xmax><ymax>{ymax}</ymax></bndbox></object>")
+
+
+def _doc(objects, head='', filename='a.jpg', size='<width>640</width><height>480</height><depth>3</depth>'):
+    return (f"{head}<annotation><folder>VOC</folder><filename>{filename}</filename><size>{size}</size>"
+            f"<segmented>0</segmented>{''.join(objects)}</annotation>")
+
+
+FAST = {
+    'standard': _doc([_obj(), _obj('person', '5.5', '6', '7.25', '8')]),
+    'no_objects': _doc([]),
+    'declaration': _doc([_obj()], head='<?xml version="1.0" encoding="utf-8"?>\n'),
+    'unicode': _doc([_obj('行人')], filename='图片 1.jpg'),
+    'empty_name': _doc([_obj('')]),
+    'spaces': _doc([_obj(xmin=' 12 ')], size='<width> 640 </width>\n  <height>480</height>'),
+}
+FALLBACK = {
+    'entity': _doc([_obj('cat &amp; dog')]),
+    'comment': _doc([_obj(), '<!-- removed <object><name>x</name></object> -->']),
+    'cdata': _doc([_obj('<![CDATA[a<b]]>')]),
+    'part': _doc([_obj(extra='<part><name>hand</name><bndbox><xmin>1</xmin><ymin>1</ymin><xmax>2</xmax>'
+                             '<ymax>2</ymax></bndbox></part>')]),
+    'attribute': _doc([_obj().replace('<object>', '<object id="1">')]),
+    'field_order': _doc([_obj().replace('<xmin>1</xmin><ymin>2</ymin>', '<ymin>2</ymin><xmin>1</xmin>')]),
+    'crlf': _doc([_obj()]).replace('><', '>\r\n<'),
+}
+
+
+@pytest.mark.parametrize('name', sorted(FAST) + sorted(FALLBACK))
+def test_matches_elementtree(tmp_path, name):
+    path = str(tmp_path / f"{name}.xml")
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(FAST.get(name) or FALLBACK[name])
+    with open(path, 'rb') as f:
+        fast = VOCImporter.parse_fast(f.read(), path)
+    assert (fast is not None) == (name in FAST)
+    info = VOCImporter().parse(path)
+    assert (info.filename, info.img_path, info.width, info.height,
+            [(b.label, b.xmin, b.ymin, b.xmax, b.ymax) for b in info.bboxes]) == reference_parse(path)
+
+
+def test_non_utf8_encoding(tmp_path):
+    path = str(tmp_path / 'latin1.xml')
+    with open(path, 'wb') as f:
+        f.write(_doc([_obj('café')], head='<?xml version="1.0" encoding="ISO-8859-1"?>\n').encode('latin-1'))
+    with open(path, 'rb') as f:
+        assert VOCImporter.parse_fast(f.read(), path) is None
+    assert VOCImporter().parse(path).bboxes[0].label == 'café'
+
+
+def test_bench_backends_agree():
+    from bench import bench_voc_parse
+    result = bench_voc_parse(images=20, boxes=3, repeat=1, log=lambda *a: None)
+    assert result['fast_hits'] == result['files'] == 20
+    assert all(r['same_as_elementtree'] for r in result['results'].values())
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+from PIL import Image
+
+from ir_label import AnnotationTable, ImageInfo, BBox
+from converters import YOLOExporter, YOLOImporter
+
+from conftest import make_infos, read_tree
+
+
+def reference_export(info_list, output_dir, class_list=None):
+    # 原来的逐框实现 (BBox.to_yolo + f-string)
+    os.makedirs(output_dir, exist_ok=True)
+    if not class_list:
+        class_list = sorted({box.label for info in info_list for box in info.bboxes})
+    with open(os.path.join(output_dir, 'classes.txt'), 'w') as f:
+        f.write('\n'.join(class_list))
+    cls_map = {name: i for i, name in enumerate(class_list)}
+    for info in info_list:
+        with open(os.path.join(output_dir, os.path.splitext(info.filename)[0] + ".txt"), 'w') as f:
+            for box in info.bboxes:
+                if box.label not in cls_map:
+                    continue
+                cx, cy, w, h = box.to_yolo(info.width, info.height)
+                f.write(f"{cls_map[box.label]} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n")
+
+
+def reference_parse(txt_path, img_path, class_names):
+    with Image.open(img_path) as img:
+        w, h = img.size
+    info = ImageInfo(os.path.basename(img_path), img_path, w, h)
+    with open(txt_path) as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) < 5:
+                continue
+            cls_id = int(parts[0])
+            cx, cy, nw, nh = map(float, parts[1:5])
+            label = class_names[cls_id] if cls_id < len(class_names) else str(cls_id)
+            info.bboxes.append(BBox(label, (cx - nw / 2) * w, (cy - nh / 2) * h, (cx + nw / 2) * w, (cy + nh / 2) * h))
+    return info
+
+
+@pytest.mark.parametrize('class_list', [None, ['class_2', 'class_0']])
+@pytest.mark.parametrize('columnar', [False, True])
+def test_export_matches_reference(tmp_path, class_list, columnar):
+    infos = make_infos(40, seed=6)
+    reference_export(infos, str(tmp_path / 'ref'), class_list)
+    YOLOExporter().export(AnnotationTable.from_infos(infos) if columnar else infos, str(tmp_path / 'out'), class_list)
+    assert read_tree(tmp_path / 'out') == read_tree(tmp_path / 'ref')
+
+
+def test_export_empty_and_unknown_size(tmp_path):
+    YOLOExporter().export([], str(tmp_path / 'empty'))
+    assert read_tree(tmp_path / 'empty') == {'classes.txt': b''}
+    infos = [ImageInfo("a.jpg", "a.jpg", None, None, [BBox("cat", 1, 2, 3, 4)])]
+    with pytest.raises(ValueError):
+        YOLOExporter().export(infos, str(tmp_path / 'unknown'))
+    # 没有框的图片不需要宽高
+    YOLOExporter().export([ImageInfo("b.jpg", "b.jpg", None, None)], str(tmp_path / 'nobox'))
+    assert read_tree(tmp_path / 'nobox') == {'classes.txt': b'', 'b.txt': b''}
+
+
+def test_import_matches_reference(tmp_path):
+    img = str(tmp_path / 'a.png')
+    Image.new('RGB', (641, 479)).save(img)
+    txt = tmp_path / 'a.txt'
+    txt.write_text("0 0.5 0.5 0.25 0.125\n\n1 0.1 0.2 0.3 0.4 0.99\n2 0.3\n7 0.333333 0.666667 0.1 0.05\n")
+    names = ['cat', 'dog', 'bird']
+    assert YOLOImporter().parse(str(txt), img, names) == reference_parse(str(txt), img, names)
+    txt.write_text('')
+    assert YOLOImporter().parse(str(txt), img, names) == reference_parse(str(txt), img, names)
@@ -0,0 +1,1161 @@
+import os
+import json
+import sys
+import time
+import glob
+import fnmatch
+import argparse
+import queue
+import threading
+from collections import deque, OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+from ir_label import ImageInfo, AnnotationTable
+from imgsize import SizeCache, SIZE_CACHE_NAME
+from dirindex import DirIndex
+from manifest import Manifest, MANIFEST_NAME
+import profiler
+import iopool
+from profiler import stage, count
+from snapshot import source_digest, snapshot_path, load_snapshot, save_snapshot, cache_dir
+from validate import Validator, MODES as VALIDATE_MODES
+from labelmap import LabelMap
+from stats import DatasetIndex, parse_query, take_images, QUERY_KEYS, UPDATE_BATCH as STATS_BATCH
+from imagecopy import ImageCopier, MODES as IMAGE_COPY_MODES, IMAGE_FORMATS
+from archive import (split_path, member_path, is_archive_path, is_archive_name, get_reader, reader_scope, read_text,
+                     read_raw, as_folder)
+from converters import (VOCImporter, YOLOImporter, COCOImporter, LabelMeImporter,
+                        VOCExporter, YOLOExporter, COCOExporter, LabelMeExporter)
+
+# NOTE: 本模块是无界面的转换引擎，GUI(main.py) 和命令行共用，禁止在这里 import PySide6
+
+FORMATS = ['voc', 'yolo', 'coco', 'labelme']
+COCO_DEFAULT_NAME = "instances_converted.json"
+ORPHAN_PREVIEW = 5       # 日志中列出的孤立标注 / 图片个数
+
+
+def format_key(text: str) -> str:
+    # 兼容 GUI 下拉框文本 (e.g. "Pascal VOC (.xml)") 和命令行简写 (e.g. "voc")
+    lower = text.lower()
+    for key in FORMATS:
+        if key in lower:
+            return key
+    raise ValueError(f"不支持的格式: {text}")
+
+
+def read_class_names(classes_path: str) -> list:
+    return [line.strip() for line in read_text(classes_path).splitlines() if line.strip()]
+
+
+def known_classes(fmt: str, src: str, classes_path: str = None):
+    # 校验时的已知类别：YOLO 为 classes.txt，其他格式只有给出 classes_path 时才检查，否则返回 None
+    if classes_path:
+        return read_class_names(classes_path)
+    if format_key(fmt) == 'yolo':
+        return read_class_names(os.path.join(as_folder(src), 'classes.txt'))
+    return None
+
+
+def _noop(*args):
+    pass
+
+
+class ConversionCancelled(Exception):
+    # progress 回调中抛出此异常即可在两个文件之间干净地停止导入 / 导出 (GUI 的取消按钮)
+    pass
+
+
+IMPORTERS = {'voc': VOCImporter, 'yolo': YOLOImporter, 'labelme': LabelMeImporter}
+
+
+def _parse_chunk(fmt: str, tasks: list, extra: tuple, io: dict = None) -> list:
+    # NOTE: 进程池的 worker 必须是模块级函数，才能被 pickle
+    # 单个文件出错时返回错误信息，而不是让整个 chunk 失败
+    # io: 子进程中使用的 iopool 设置，给出时在 chunk 内预读标注文件 (单进程时由 iter_parsed_chunks 跨 chunk 预读)
+    importer = IMPORTERS[fmt]()
+    results = []
+    if io is not None:
+        iopool.configure(**io)
+    with iopool.read_ahead([task[0] for task in tasks], read_raw) if io is not None else nullcontext():
+        for task in tasks:
+            try:
+                with stage('parse'):
+                    info = importer.parse(*task, *extra)
+                count('parse', files=1, boxes=len(info.bboxes))
+                results.append((info, None))
+            except Exception as e:
+                results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _profiled(func, trace: bool, *args):
+    # 在子进程中计时运行 func，统计随结果一起返回，由主进程 profiler.merge
+    profiler.start(trace)
+    try:
+        return func(*args), profiler.collect()
+    finally:
+        profiler.stop()
+
+
+def _submit(pool, func, *args):
+    # 开启 profiler 时让子进程也计时；返回的 future 结果与直接 submit(func, ...) 相同
+    if not profiler.enabled():
+        return pool.submit(func, *args)
+    future = pool.submit(_profiled, func, profiler.is_tracing(), *args)
+    return _MergedFuture(future)
+
+
+class _MergedFuture:
+    __slots__ = ('_future',)
+
+    def __init__(self, future):
+        self._future = future
+
+    def result(self):
+        result, stats = self._future.result()
+        profiler.merge(stats)
+        return result
+
+    def cancel(self):
+        return self._future.cancel()
+
+
+def resolve_workers(workers: int) -> int:
+    # workers <= 0 表示使用全部 CPU
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def iter_parsed_chunks(fmt: str, tasks: list, extra: tuple = (), workers: int = 1, chunksize: int = None):
+    # 按 tasks 的顺序逐个 chunk 产出 (chunk, [(ImageInfo, 错误信息)])
+    # NOTE: 多进程时最多 workers * 2 个 chunk 在路上，消费者慢时不会把结果全部堆在内存里
+    workers = resolve_workers(workers)
+    total = len(tasks)
+    if chunksize is None:
+        # NOTE: 单进程时逐文件回调 progress，便于及时取消；多进程时按 chunk 分发减少通信
+        chunksize = 1 if workers == 1 else max(1, min(256, total // (workers * 4) or 1))
+    chunks = [tasks[i:i + chunksize] for i in range(0, total, chunksize)]
+
+    if workers == 1 or len(chunks) <= 1:
+        with iopool.read_ahead((task[0] for task in tasks), read_raw):
+            for chunk in chunks:
+                yield chunk, _parse_chunk(fmt, chunk, extra)
+        return
+    io = iopool.settings()
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append((chunk, _submit(pool, _parse_chunk, fmt, chunk, extra, io)))
+                if len(pending) >= workers * 2:
+                    # NOTE: 按提交顺序取结果，保证输出顺序稳定
+                    chunk0, future = pending.popleft()
+                    yield chunk0, future.result()
+            while pending:
+                chunk0, future = pending.popleft()
+                yield chunk0, future.result()
+        except BaseException:
+            # 取消 / 中断时丢弃还没开始的 chunk，只等正在运行的结束
+            for _, future in pending:
+                future.cancel()
+            raise
+        finally:
+            pending.clear()
+
+
+def parse_files(fmt: str, tasks: list, extra: tuple = (), workers: int = 1,
+                chunksize: int = None, progress=None, sink=None) -> tuple[list, list]:
+    # 逐文件格式 (VOC / LabelMe / YOLO) 的批量解析
+    # tasks: 每个元素是 importer.parse 的位置参数 tuple；extra 为所有文件共用的参数 (如 class_names)
+    # sink: 给出时每个 ImageInfo 按顺序交给 sink (e.g. AnnotationTable.add_info)，不再收集到列表
+    # 返回 (ImageInfo 列表, [(task, 错误信息)])，结果顺序与 tasks 一致
+    progress = progress or _noop
+    total = len(tasks)
+    data, errors = [], []
+    done = 0
+    for chunk, results in iter_parsed_chunks(fmt, tasks, extra, workers, chunksize):
+        for task, (info, err) in zip(chunk, results):
+            if err is None:
+                (sink or data.append)(info)
+            else:
+                errors.append((task, err))
+        done += len(chunk)
+        progress(done, total)
+    return data, errors
+
+
+OUTPUT_EXTS = {'voc': '.xml', 'labelme': '.json', 'yolo': '.txt'}
+
+
+def output_name(fmt: str, filename: str) -> str:
+    # 逐文件格式的输出文件名 (与各 Exporter 的命名规则一致)
+    return os.path.splitext(filename)[0] + OUTPUT_EXTS[fmt]
+
+
+def coco_save_path(dst: str) -> str:
+    # dst 为 .json 文件时直接使用，否则在文件夹中生成默认文件名
+    # 归档: "out.zip" -> "out.zip::/instances_converted.json"，"out.zip::/train.json" 直接使用
+    archive, member = split_path(dst)
+    if archive is not None:
+        if os.path.dirname(archive):
+            os.makedirs(os.path.dirname(archive), exist_ok=True)
+        return dst if member else member_path(archive, COCO_DEFAULT_NAME)
+    if dst.lower().endswith('.json'):
+        if os.path.dirname(dst):
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+        return dst
+    os.makedirs(dst, exist_ok=True)
+    return os.path.join(dst, COCO_DEFAULT_NAME)
+
+
+def _log_orphans(index: DirIndex, log, labels: bool = True):
+    # 只列出前几个，完整列表见 DirIndex.orphan_labels / orphan_images
+    if not index.images:
+        return      # NOTE: 标注和图片分开存放 (e.g. VOC 的 Annotations/) 时不报告
+    for names, what in ((index.orphan_labels() if labels else [], "个标注文件找不到对应的图片"),
+                        (index.orphan_images(), "张图片没有对应的标注")):
+        if names:
+            more = " ..." if len(names) > ORPHAN_PREVIEW else ""
+            log(f"[Warning] {len(names)} {what}: {', '.join(names[:ORPHAN_PREVIEW])}{more}")
+
+
+def list_tasks(fmt: str, src: str, img_dir: str = None, classes_path: str = None,
+               cache: SizeCache = None, log=None) -> list:
+    # 逐文件格式 (VOC / LabelMe / YOLO) 的解析任务，task[0] 为标注文件路径
+    # NOTE: 标注和图片的配对都通过一次目录扫描得到的 DirIndex，不再逐个扩展名 os.path.exists
+    log = log or _noop
+    src = as_folder(src)
+    if fmt == 'yolo':
+        class_names = read_class_names(classes_path or os.path.join(src, 'classes.txt'))
+        index = DirIndex(src, '.txt', img_dir, skip={'classes.txt'})    # NOTE: 防止把classes.txt和数据集放一起
+        cache = cache or SizeCache()
+        tasks = []
+        for f in index.label_files():
+            entry = index.image_entry(os.path.splitext(f)[0])
+            if entry is not None:
+                # NOTE: class_names 是同一个对象，pickle 时每个 chunk 只会序列化一次
+                tasks.append((os.path.join(src, f), entry.path, class_names, cache.get(entry.path, entry)))
+            else:
+                log(f"[Warning] 找不到对应的图片: {f}，跳过。")
+        _log_orphans(index, log, labels=False)
+        return tasks
+    index = DirIndex(src, '.xml' if fmt == 'voc' else '.json')
+    _log_orphans(index, log)
+    if fmt == 'labelme':
+        # 图片文件名在这里配好，解析时不用再探测；'' 表示没有找到，由 importer 回退到 imagePath
+        return [(os.path.join(src, f), getattr(index.image_entry(os.path.splitext(f)[0]), 'name', ''))
+                for f in index.label_files()]
+    return [(os.path.join(src, f),) for f in index.label_files()]
+
+
+def parse_tasks(fmt: str, tasks: list, workers: int = 1, cache: SizeCache = None,
+                log=None, progress=None, sink=None) -> tuple[list, list]:
+    # 解析 list_tasks 的结果，顺便把新探测到的图片尺寸写回缓存，并记录解析失败的文件
+    log = log or _noop
+    data = []
+    missed = {task[1] for task in tasks if task[3] is None} if fmt == 'yolo' and cache else None
+
+    def collect(info):
+        if missed and info.img_path in missed:
+            cache.put(info.img_path, (info.width, info.height))
+        (sink or data.append)(info)
+
+    _, errors = parse_files(fmt, tasks, workers=workers, progress=progress, sink=collect)
+    if missed:
+        cache.save()
+    for task, err in errors:
+        log(f"[Warning] 解析失败: {task[0]}，跳过。({err})")
+    return data, errors
+
+
+def coco_sources(src: str) -> list:
+    # COCO 源可以是单个 json、json 路径列表、包含多个 json 的文件夹，或通配符 (e.g. "shards/*.json")
+    # 也可以是归档 ("data.zip" 为其中的全部 json) 或归档中的 json / 文件夹 / 通配符 ("data.zip::/shards/*.json")
+    if isinstance(src, (list, tuple)):
+        paths = list(src)
+    elif is_archive_path(src):
+        archive, member = split_path(src)
+        names = get_reader(archive).names()
+        if glob.has_magic(member):
+            paths = sorted(member_path(archive, name) for name in fnmatch.filter(names, member))
+        elif member.lower().endswith('.json'):
+            return [src]
+        else:
+            prefix = member + '/' if member else ''
+            paths = sorted(member_path(archive, name) for name in names
+                           if name.startswith(prefix) and name.endswith('.json'))
+    elif os.path.isdir(src):
+        with os.scandir(src) as it:
+            paths = sorted(entry.path for entry in it if entry.name.endswith('.json') and entry.is_file())
+    elif glob.has_magic(src):
+        paths = sorted(glob.glob(src))
+    else:
+        return [src]
+    if not paths:
+        raise FileNotFoundError(f"找不到 COCO json 文件: {src}")
+    return paths
+
+
+def _parse_coco_file(json_path: str, img_dir: str) -> list:
+    # NOTE: 进程池的 worker 必须是模块级函数
+    return COCOImporter().parse_all(json_path, img_dir or os.path.dirname(json_path))
+
+
+def iter_coco_files(paths: list, img_dir: str = None, workers: int = 1):
+    # 按顺序逐个文件产出 (路径, list[ImageInfo])，多进程并行解析
+    # NOTE: 每个文件单独解析 (各自的 id 只在文件内部有效)，类别按名称统一，
+    #       image / annotation / category id 在导出时重新分配；最多 workers + 1 个文件的结果在内存中
+    workers = min(resolve_workers(workers), len(paths))
+    if workers <= 1:
+        for path in paths:
+            yield path, _parse_coco_file(path, img_dir)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for path in paths:
+                pending.append((path, _submit(pool, _parse_coco_file, path, img_dir)))
+                if len(pending) > workers:
+                    path0, future = pending.popleft()
+                    yield path0, future.result()
+            while pending:
+                path0, future = pending.popleft()
+                yield path0, future.result()
+        except BaseException:
+            for _, future in pending:
+                future.cancel()
+            raise
+        finally:
+            pending.clear()
+
+
+def merge_coco_files(paths: list, img_dir: str = None, workers: int = 1, log=None, progress=None) -> list:
+    # 合并多个 COCO 文件：同名图片 (file_name 相同) 出现在多个文件中时合并它们的框
+    log = log or _noop
+    progress = progress or _noop
+    data = []
+    by_name = {}
+    duplicates = 0
+    for done, (path, infos) in enumerate(iter_coco_files(paths, img_dir, workers), 1):
+        for info in infos:
+            first = by_name.get(info.filename)
+            if first is None:
+                by_name[info.filename] = info
+                data.append(info)
+            else:
+                first.bboxes.extend(info.bboxes)
+                duplicates += 1
+        progress(done, len(paths))
+    if duplicates:
+        log(f"[Warning] {duplicates} 张图片出现在多个 COCO 文件中，已合并它们的标注。")
+    return data
+
+
+LABEL_EXTS = {'voc': ('.xml',), 'yolo': ('.txt',), 'labelme': ('.json',), 'coco': ()}
+
+
+def prepare_archives(fmt: str, src, img_dir: str = None, workers: int = 1, log=None) -> int:
+    # 源在 .tar.gz 等压缩 tar 中时：逐文件格式先顺序解压一遍，标注内容和图片尺寸留在内存里，
+    # 之后在当前进程中解析 (子进程里没有这份缓存，而且每个进程都要从头解压)；返回实际使用的进程数
+    log = log or _noop
+    compressed = False
+    for path in (src, img_dir):
+        archive = split_path(path)[0] if isinstance(path, str) else None
+        if archive is None:
+            continue
+        reader = get_reader(archive)
+        if not reader.compressed:
+            continue
+        compressed = True
+        if LABEL_EXTS[fmt] and not reader.preloaded:
+            log(f"读取压缩归档 {archive}...")
+            reader.preload(LABEL_EXTS[fmt], probe_images=fmt == 'yolo')
+    if compressed and resolve_workers(workers) > 1:
+        log("[Info] 压缩的 tar 归档只能顺序读取，使用单进程解析。")
+        return 1
+    return workers
+
+
+def snapshot_target(fmt: str, src, img_dir: str = None, classes_path: str = None) -> tuple:
+    # 返回 (快照路径, 数据集参数, 源文件摘要)；快照在用户缓存目录中，见 snapshot.snapshot_path
+    fmt = format_key(fmt)
+    folders, files = [], []
+    if fmt == 'coco':
+        paths = coco_sources(src)
+        files.extend(sorted({split_path(path)[0] or path for path in paths}))
+        srcs = [os.path.abspath(path) for path in paths]
+    else:
+        for folder in (src, img_dir):
+            if not folder:
+                continue
+            archive = split_path(folder)[0]
+            if archive is not None:
+                files.append(archive)
+            elif folder not in folders:
+                folders.append(folder)
+        srcs = [os.path.abspath(src)]
+    if classes_path:
+        files.append(classes_path)
+    key = {"fmt": fmt, "src": srcs, "img_dir": os.path.abspath(img_dir) if img_dir else None,
+           "classes": os.path.abspath(classes_path) if classes_path else None}
+    return snapshot_path(key), key, source_digest(folders, sorted(set(files)))
+
+
+@reader_scope()
+def load_dataset(fmt: str, src: str, img_dir: str = None, classes_path: str = None,
+                 workers: int = 1, size_cache: bool = True, columnar: bool = False,
+                 snapshot: bool = False, index: DatasetIndex = None, log=None, progress=None,
+                 lazy=None) -> list[ImageInfo]:
+    # src: COCO 为 json 文件 (或多个分片所在的文件夹 / 通配符，见 coco_sources)，其余格式为标注文件夹
+    # workers: 逐文件格式 / COCO 分片的解析进程数，1 为单进程，<= 0 为全部 CPU
+    # size_cache: YOLO 导入时把图片尺寸缓存到图片目录，下次导入不再读取图片
+    # columnar: 返回列式 AnnotationTable 而不是 list[ImageInfo]，千万级框时内存小得多
+    # snapshot: 解析结果保存为二进制快照 (见 snapshot.py)，源文件没变时下次直接映射快照，不再解析；
+    #           此时总是返回 AnnotationTable
+    # index: 给出时在导入过程中增量构建统计 / 索引 (见 stats.py)
+    # progress(done, total): 逐文件回调，GUI 用来刷新进度条
+    # lazy: 同一数据集的 open_lazy 结果；给出时复用其中的快照查找和目录扫描，不再重复一遍
+    fmt = format_key(fmt)
+    log = log or _noop
+
+    def indexed(data):
+        if index is not None:
+            if isinstance(data, AnnotationTable):
+                index.update(data)
+            else:
+                index.add_batch(AnnotationTable.from_infos(data))
+        return data
+
+    if isinstance(lazy, AnnotationTable):
+        # open_lazy 已经映射了快照，直接用同一个表
+        log("源文件没有变化，从快照加载")
+        if progress: progress(len(lazy), len(lazy))
+        return indexed(lazy)
+    if not isinstance(lazy, LazyDataset):
+        lazy = None
+    if snapshot:
+        if lazy is not None and lazy.snapshot is not None:
+            snap_path, key, digest = lazy.snapshot      # NOTE: open_lazy 已经确认快照不可用
+        else:
+            with stage('snapshot'):
+                snap_path, key, digest = snapshot_target(fmt, src, img_dir, classes_path)
+                table = load_snapshot(snap_path, key, digest)
+            if table is not None:
+                log(f"源文件没有变化，从快照加载: {snap_path}")
+                if progress: progress(len(table), len(table))
+                return indexed(table)
+        table = load_dataset(fmt, src, img_dir=img_dir, classes_path=classes_path, workers=workers,
+                             size_cache=size_cache, columnar=True, index=index, log=log, progress=progress,
+                             lazy=lazy)
+        try:
+            with stage('snapshot'):
+                save_snapshot(table, snap_path, key, digest)
+        except OSError as e:
+            log(f"[Warning] 无法保存快照: {snap_path} ({e})")     # NOTE: 缓存目录不可写时不影响导入
+        return table
+    table = AnnotationTable() if columnar else None
+    workers = prepare_archives(fmt, src, img_dir, workers, log)
+
+    if fmt == 'coco':
+        paths = coco_sources(src)
+        if len(paths) > 1:
+            log(f"合并 {len(paths)} 个 COCO 文件...")
+            data = merge_coco_files(paths, img_dir, workers=workers, log=log, progress=progress)
+            return indexed(AnnotationTable.from_infos(data) if columnar else data)
+        importer = COCOImporter()
+        if columnar:
+            return indexed(importer.parse_table(paths[0], img_dir or os.path.dirname(paths[0])))
+        return indexed(importer.parse_all(paths[0], img_dir or os.path.dirname(paths[0])))
+
+    cache = None
+    if lazy is not None:
+        tasks = lazy.tasks
+        cache = lazy.size_cache if size_cache else None
+        for message in lazy.warnings:       # NOTE: 目录扫描时的警告 (孤立文件等) 由这里输出
+            log(message)
+    else:
+        if fmt == 'yolo' and size_cache and not is_archive_path(img_dir or src):    # NOTE: 归档中的图片不缓存尺寸
+            cache = SizeCache.for_folder(img_dir or src)
+        tasks = list_tasks(fmt, src, img_dir=img_dir, classes_path=classes_path, cache=cache, log=log)
+    if index is None:
+        data, _ = parse_tasks(fmt, tasks, workers=workers, cache=cache, log=log, progress=progress,
+                              sink=table.add_info if columnar else None)
+        return table if columnar else data
+
+    # NOTE: 每 STATS_BATCH 张图片更新一次统计，导入结束时统计也已完成，不用再扫描一遍
+    data = table if columnar else []
+    pending = []
+
+    def sink(info):
+        if columnar:
+            table.add_info(info)
+            if table.num_images - index.num_images >= STATS_BATCH:
+                index.update(table)
+        else:
+            data.append(info)
+            pending.append(info)
+            if len(pending) >= STATS_BATCH:
+                index.add_batch(AnnotationTable.from_infos(pending))
+                pending.clear()
+
+    parse_tasks(fmt, tasks, workers=workers, cache=cache, log=log, progress=progress, sink=sink)
+    if columnar:
+        return indexed(table)
+    indexed(pending)
+    return data
+
+
+LAZY_CACHE_SIZE = 4096      # 按需解析时缓存的图片数
+
+
+class LazyDataset:
+    # 按需解析的只读数据集 (GUI 预览用)：tasks 来自 list_tasks (一次目录扫描)，第 i 张图片在第一次访问时才解析
+    # NOTE: 解析结果放在 LRU 缓存里，内存只取决于任务列表和缓存大小；解析失败的图片返回没有框的 ImageInfo，错误记在 errors
+    # NOTE: 可以在后台线程中解析 (见 preview.RowLoader)，界面线程用 cached 取已解析的结果，不阻塞
+    def __init__(self, fmt: str, tasks: list, cache_size: int = LAZY_CACHE_SIZE,
+                 size_cache: SizeCache = None, snapshot: tuple = None, warnings: list = None):
+        self.fmt = format_key(fmt)
+        self.tasks = tasks
+        self.errors = {}
+        # 以下给 load_dataset(lazy=...) 复用：YOLO 尺寸缓存、snapshot_target 的结果、目录扫描时的警告
+        self.size_cache = size_cache
+        self.snapshot = snapshot
+        self.warnings = warnings or []
+        self._importer = IMPORTERS[self.fmt]()
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def cached(self, i: int):
+        # 已解析的第 i 张图片，没有解析过时为 None (不解析)
+        with self._lock:
+            info = self._cache.get(i)
+            if info is not None:
+                self._cache.move_to_end(i)
+            return info
+
+    def __getitem__(self, i: int) -> ImageInfo:
+        info = self.cached(i)
+        if info is not None:
+            return info
+        task = self.tasks[i]
+        try:
+            with stage('parse'):
+                info = self._importer.parse(*task)
+        except Exception as e:
+            with self._lock:
+                self.errors[i] = f"{type(e).__name__}: {e}"
+            img_path = task[1] if self.fmt == 'yolo' else ''
+            info = ImageInfo(filename=os.path.basename(img_path or task[0]), img_path=img_path, width=None, height=None)
+        with self._lock:
+            self._cache[i] = info
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return info
+
+
+def open_lazy(fmt: str, src, img_dir: str = None, classes_path: str = None, cache_size: int = LAZY_CACHE_SIZE,
+              snapshot: bool = True, log=None):
+    # 不解析全部标注就能浏览的数据集：源文件没变时直接映射快照 (AnnotationTable)，否则返回按需解析的 LazyDataset
+    # COCO 要读完整个 json 才知道每张图片有哪些框，没有快照时返回 None
+    # snapshot: False 时不查找快照
+    # NOTE: 之后的完整加载把返回值传给 load_dataset(lazy=...)，快照和目录都只查找 / 扫描一次
+    fmt = format_key(fmt)
+    target = None
+    if snapshot:
+        with stage('snapshot'):
+            target = snapshot_target(fmt, src, img_dir, classes_path)
+            table = load_snapshot(*target)
+        if table is not None:
+            return table
+    if fmt == 'coco':
+        return None
+    prepare_archives(fmt, src, img_dir, 1, log or _noop)
+    cache = None
+    if fmt == 'yolo' and not is_archive_path(img_dir or src):
+        cache = SizeCache.for_folder(img_dir or src)
+    # NOTE: 孤立文件等警告先记下来，由之后的完整加载输出，这里不重复
+    warnings = []
+    tasks = list_tasks(fmt, src, img_dir=img_dir, classes_path=classes_path, cache=cache, log=warnings.append)
+    return LazyDataset(fmt, tasks, cache_size, size_cache=cache, snapshot=target, warnings=warnings)
+
+
+def coco_shard_target(dst: str) -> tuple[str, str]:
+    # 分片导出的 (文件夹, 文件名前缀)：dst 为 "out/train.json" 时输出 out/train_00000.json ...
+    # 归档: "out.zip::/train.json" -> ("out.zip", "train")，分片直接写入归档
+    archive, member = split_path(dst)
+    if archive is not None:
+        if member and not member.lower().endswith('.json'):
+            raise ValueError(f"COCO 分片不能写入归档中的子文件夹: {dst}")
+        return archive, os.path.splitext(member)[0] if member else "instances"
+    if dst.lower().endswith('.json'):
+        return os.path.dirname(dst) or '.', os.path.splitext(os.path.basename(dst))[0]
+    return dst, "instances"
+
+
+def export_coco(info_list, dst: str, shard_images: int = None, shard_bytes: int = None, categories: list = None,
+                progress=None):
+    if shard_images or shard_bytes:
+        out_dir, prefix = coco_shard_target(dst)
+        return COCOExporter().export_sharded(info_list, out_dir, shard_images=shard_images, shard_bytes=shard_bytes,
+                                             categories=categories, prefix=prefix, progress=progress)
+    path = coco_save_path(dst)
+    COCOExporter().export(info_list, path, categories=categories, progress=progress)
+    return [path]
+
+
+def export_dataset(fmt: str, info_list: list[ImageInfo], dst: str, workers: int = 1, progress=None,
+                   shard_images: int = None, shard_bytes: int = None, class_list: list = None):
+    # dst: 输出文件夹；COCO 也可以直接给 .json 文件路径
+    # workers: VOC / LabelMe 批量写入的线程数
+    # shard_images / shard_bytes: COCO 按图片数 / 字节数分片导出，见 COCOExporter.export_sharded
+    # class_list: 固定的类别列表 (YOLO 类别 id / COCO categories 的顺序)，不给出时按所有类别名排序自动生成
+    fmt = format_key(fmt)
+    progress = progress or _noop
+    total = len(info_list)
+
+    if fmt == 'yolo':
+        YOLOExporter().export(info_list, dst, class_list=class_list, progress=progress)
+    elif fmt == 'coco':
+        export_coco(info_list, dst, shard_images, shard_bytes, categories=class_list, progress=progress)
+    else:
+        exporter = VOCExporter() if fmt == 'voc' else LabelMeExporter()
+        exporter.export_all(info_list, dst, workers=resolve_workers(workers), progress=progress)
+    progress(total, total)
+
+
+def image_output_dir(fmt: str, dst: str) -> str:
+    # 图片放在标注旁边：COCO 为 json 所在的文件夹，其余格式为输出文件夹
+    if is_archive_path(dst) or is_archive_name(dst):
+        raise ValueError("导出到归档时不支持输出图片")
+    if format_key(fmt) == 'coco' and dst.lower().endswith('.json'):
+        return os.path.dirname(dst) or '.'
+    return dst
+
+
+def image_copier(fmt: str, dst: str, mode: str = 'auto', workers: int = 1, max_size: int = None,
+                 image_format: str = None, quality: int = 90) -> ImageCopier:
+    return ImageCopier(image_output_dir(fmt, dst), mode or 'auto', max_size=max_size, image_format=image_format,
+                       quality=quality, workers=resolve_workers(workers))
+
+
+@reader_scope()
+def copy_images(data, fmt: str, dst: str, mode: str = 'auto', workers: int = 1, max_size: int = None,
+                image_format: str = None, quality: int = 90, log=None, progress=None):
+    # 把 data 中的图片链接 / 复制到 dst 旁边 (见 imagecopy.py)，返回写回新文件名 / 宽高 / 坐标后的数据
+    with image_copier(fmt, dst, mode, workers, max_size, image_format, quality) as copier:
+        with stage('images'):
+            data = copier.apply(data, progress)
+        copier.log(log or _noop)
+    return data
+
+
+# =================== 流式转换 =================
+# NOTE: 导入器的生成器在后台线程中运行，经有界队列逐张交给导出器，
+#       不再先构建完整的 list[ImageInfo]；导入与导出重叠进行，内存中最多 STREAM_QUEUE_SIZE 张图片
+
+STREAM_QUEUE_SIZE = 256
+
+
+def iter_dataset(fmt: str, src: str, img_dir: str = None, classes_path: str = None,
+                 workers: int = 1, size_cache: bool = True, log=None):
+    # 返回 (源文件数, 按顺序产出 ImageInfo 的迭代器)；COCO 的图片数事先未知，为 0
+    # NOTE: COCO 不保证 annotations 按图片排序，要读完整个 json 才能产出第一张图片，内存取决于 IR 本身
+    fmt = format_key(fmt)
+    log = log or _noop
+    workers = prepare_archives(fmt, src, img_dir, workers, log)
+    if fmt == 'coco':
+        paths = coco_sources(src)
+        if len(paths) == 1:
+            return 0, COCOImporter().iter_parse(paths[0], img_dir or os.path.dirname(paths[0]))
+
+        def generate_coco():
+            # NOTE: 流式时已经产出的图片无法再追加框，同名图片只给出警告，不合并
+            seen = set()
+            duplicates = 0
+            for _, infos in iter_coco_files(paths, img_dir, workers):
+                for info in infos:
+                    if info.filename in seen:
+                        duplicates += 1
+                    seen.add(info.filename)
+                    yield info
+            if duplicates:
+                log(f"[Warning] {duplicates} 张图片出现在多个 COCO 文件中 (流式转换不合并)。")
+
+        return 0, generate_coco()
+
+    cache = None
+    if fmt == 'yolo' and size_cache and not is_archive_path(img_dir or src):    # NOTE: 归档中的图片不缓存尺寸
+        cache = SizeCache.for_folder(img_dir or src)
+    tasks = list_tasks(fmt, src, img_dir=img_dir, classes_path=classes_path, cache=cache, log=log)
+    missed = {task[1] for task in tasks if task[3] is None} if fmt == 'yolo' and cache else None
+
+    def generate():
+        try:
+            for chunk, results in iter_parsed_chunks(fmt, tasks, workers=workers):
+                for task, (info, err) in zip(chunk, results):
+                    if err is not None:
+                        log(f"[Warning] 解析失败: {task[0]}，跳过。({err})")
+                        continue
+                    if missed and info.img_path in missed:
+                        cache.put(info.img_path, (info.width, info.height))
+                    yield info
+        finally:
+            if missed:
+                cache.save()
+
+    return len(tasks), generate()
+
+
+def prefetch(iterable, maxsize: int = STREAM_QUEUE_SIZE):
+    # 在后台线程中迭代 iterable，通过有界队列交给调用方；调用方提前结束 (异常 / 取消) 时通知后台线程停止
+    q = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        it = iter(iterable)
+        try:
+            for item in it:
+                if not put((True, item)):
+                    return
+            put((False, None))
+        except BaseException as e:
+            put((False, e))
+        finally:
+            if hasattr(it, 'close'):
+                it.close()      # NOTE: 关闭生成器，进程池随之关闭
+
+    thread = threading.Thread(target=produce, name="unilabel-import", daemon=True)
+    thread.start()
+    try:
+        while True:
+            ok, item = q.get()
+            if not ok:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def export_stream(fmt: str, infos, dst: str, workers: int = 1, shard_images: int = None, shard_bytes: int = None,
+                  class_list: list = None):
+    # infos: 只遍历一次的 ImageInfo 迭代器
+    # class_list: 固定的类别列表，给出时 YOLO / COCO 不用等看完全部框再确定类别 id (不再经过临时文件重映射)
+    fmt = format_key(fmt)
+    if fmt == 'yolo':
+        YOLOExporter().export_stream(infos, dst, class_list=class_list)
+    elif fmt == 'coco':
+        export_coco(infos, dst, shard_images, shard_bytes, categories=class_list)
+    else:
+        exporter = VOCExporter() if fmt == 'voc' else LabelMeExporter()
+        exporter.export_all(infos, dst, workers=resolve_workers(workers))
+
+
+def _make_stats(images: int, boxes: int, t0: float, t1: float, t2: float, **extra) -> dict:
+    elapsed = max(t2 - t0, 1e-9)
+    stats = {
+        "images": images,
+        "boxes": boxes,
+        "load_time": t1 - t0,
+        "export_time": t2 - t1,
+        "elapsed": t2 - t0,
+        "images_per_sec": images / elapsed,
+        "boxes_per_sec": boxes / elapsed,
+    }
+    stats.update(extra)
+    return stats
+
+
+def _log_stats(stats: dict, dst: str, log):
+    log(f"转换完成！文件已保存至: {dst}")
+    log(f"共 {stats['images']} 张图片 / {stats['boxes']} 个框，耗时 {stats['elapsed']:.2f}s "
+        f"({stats['images_per_sec']:.1f} images/s, {stats['boxes_per_sec']:.1f} boxes/s)")
+
+
+def convert_incremental(src_fmt: str, src: str, dst_fmt: str, dst: str, img_dir: str = None,
+                        classes_path: str = None, workers: int = 1, size_cache: bool = True,
+                        use_hash: bool = False, log=None) -> dict:
+    # 增量转换：输出目录中的清单 (.unilabel_manifest) 记录每个源文件的指纹和它生成的输出，
+    # 再次运行时只重新解析有变化的源文件，只重写受影响的输出，并删除源文件已不存在的输出
+    # NOTE: COCO 源按 json 文件判断 (多个分片时每个文件单独判断)；COCO 目标是单个输出文件，有任何变化都要整体重写
+    src_fmt, dst_fmt = format_key(src_fmt), format_key(dst_fmt)
+    log = log or _noop
+    if any(is_archive_path(path) for path in (src, dst, img_dir) if isinstance(path, str)):
+        raise ValueError("增量转换不支持归档 (.zip / .tar) 作为源或目标")
+    t0 = time.perf_counter()
+    out_dir = (os.path.dirname(dst) or '.') if dst_fmt == 'coco' and dst.lower().endswith('.json') else dst
+    manifest = Manifest.load(out_dir, use_hash)
+    settings = {
+        "src_fmt": src_fmt, "src": os.path.abspath(src),
+        "dst_fmt": dst_fmt, "dst": os.path.abspath(dst),
+        "img_dir": os.path.abspath(img_dir) if img_dir else None,
+    }
+
+    cache = None
+    if src_fmt == 'coco':
+        tasks = [(path,) for path in coco_sources(src)]
+    else:
+        if src_fmt == 'yolo':
+            classes_path = classes_path or os.path.join(src, 'classes.txt')
+            settings["classes"] = manifest.fingerprint(os.path.abspath(classes_path))[:2]
+            if size_cache:
+                cache = SizeCache.for_folder(img_dir or src)
+        tasks = list_tasks(src_fmt, src, img_dir=img_dir, classes_path=classes_path, cache=cache, log=log)
+
+    def deps(task):
+        return [os.path.abspath(path) for path in (task[:2] if src_fmt == 'yolo' else task[:1])]
+
+    full = any(manifest.settings.get(k) != v for k, v in settings.items())
+    current = {deps(task)[0]: task for task in tasks}
+    changed = [task for task in tasks if full or not manifest.is_fresh(deps(task)[0], deps(task))]
+    removed = [key for key in manifest.sources if key not in current]
+    if not changed and not removed:
+        if manifest.dirty:
+            manifest.save()
+        log(f"没有需要更新的文件 (共 {len(tasks)} 个源文件)。")
+        t1 = time.perf_counter()
+        return _make_stats(0, 0, t0, t1, t1, skipped=len(tasks), removed=0)
+    if dst_fmt == 'coco':
+        changed = tasks     # 单个输出文件，需要全部数据
+    log(f"需要更新 {len(changed)} / {len(tasks)} 个源文件，删除 {len(removed)} 个。")
+
+    # 1. 解析有变化的源文件
+    def parse_group(group) -> dict:
+        # 源文件 -> [ImageInfo]；解析失败的文件从清单中删除，下次运行时重试
+        if src_fmt == 'coco':
+            return {deps(task)[0]: infos for task, (_, infos)
+                    in zip(group, iter_coco_files([task[0] for task in group], img_dir, workers))}
+        infos, errors = parse_tasks(src_fmt, group, workers=workers, cache=cache, log=log)
+        failed = {id(task) for task, _ in errors}
+        for task, _ in errors:
+            manifest.forget(deps(task)[0])
+        ok = [task for task in group if id(task) not in failed]
+        return {deps(task)[0]: [info] for task, info in zip(ok, infos)}
+
+    parsed = parse_group(changed)
+    data = [info for infos in parsed.values() for info in infos]
+
+    # 2. 导出
+    if dst_fmt == 'yolo':
+        # NOTE: 类别 id 由全部类别排序决定，类别集合变化时所有 txt 都要重写
+        labels = {label for key, entry in manifest.sources.items()
+                  if key in current and key not in parsed for label in entry['labels']}
+        labels.update(box.label for infos in parsed.values() for info in infos for box in info.bboxes)
+        class_list = sorted(labels)
+        if class_list != manifest.settings.get("class_list"):
+            rest = [task for task in tasks if deps(task)[0] not in parsed]
+            if rest:
+                log("类别列表发生变化，重新导出全部文件。")
+                parsed.update(parse_group(rest))
+            data = [info for task in tasks if deps(task)[0] in parsed for info in parsed[deps(task)[0]]]
+            YOLOExporter().export(data, dst)
+        else:
+            YOLOExporter().export(data, dst, class_list)
+        settings["class_list"] = class_list
+    elif dst_fmt == 'coco':
+        COCOExporter().export(data, coco_save_path(dst))
+    else:
+        export_dataset(dst_fmt, data, dst, workers=workers)
+    t1 = time.perf_counter()
+
+    # 3. 更新清单，删除不再由任何源文件生成的输出
+    stale = set()
+    for key in removed:
+        stale.update(manifest.forget(key))
+    for key, infos in parsed.items():
+        outputs = [output_name(dst_fmt, info.filename) for info in infos] if dst_fmt != 'coco' else []
+        stale.update(set(manifest.sources.get(key, {}).get('outputs', [])) - set(outputs))
+        manifest.record(key, deps(current[key]), outputs,
+                        [box.label for info in infos for box in info.bboxes])
+    produced = {out for entry in manifest.sources.values() for out in entry['outputs']}
+    for name in sorted(stale - produced):
+        path = os.path.join(out_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    manifest.settings = settings
+    manifest.save()
+    t2 = time.perf_counter()
+
+    images = sum(len(infos) for infos in parsed.values())
+    boxes = sum(len(info.bboxes) for infos in parsed.values() for info in infos)
+    stats = _make_stats(images, boxes, t0, t1, t2, skipped=len(tasks) - len(parsed), removed=len(removed))
+    log(f"跳过 {stats['skipped']} 个未变化的源文件，删除 {len(stale - produced)} 个过期输出。")
+    _log_stats(stats, dst, log)
+    return stats
+
+
+def convert_stream(src_fmt: str, src: str, dst_fmt: str, dst: str, img_dir: str = None,
+                   classes_path: str = None, workers: int = 1, size_cache: bool = True,
+                   shard_images: int = None, shard_bytes: int = None,
+                   queue_size: int = STREAM_QUEUE_SIZE, validate: str = None, label_map: LabelMap = None,
+                   index: DatasetIndex = None, copier: ImageCopier = None, log=None, progress=None) -> dict:
+    # 流式转换：导入与导出同时进行，内存占用与数据集大小无关 (COCO 源除外，见 iter_dataset)
+    # progress(done, total): 每导出一张图片回调一次，COCO 源的 total 为 0
+    # validate: 校验模式 (见 validate.py)，在导入线程中按批校验 / 修正
+    # label_map: 类别映射 (见 labelmap.py)，在导入线程中逐张处理，并把固定的类别列表交给导出器
+    # index: 给出时边导出边统计 (见 stats.py)
+    # copier: 给出时按批链接 / 复制图片 (见 imagecopy.py)
+    log = log or _noop
+    progress = progress or _noop
+    t0 = time.perf_counter()
+    validator = None
+    if validate:
+        known = label_map.class_list() if label_map else known_classes(src_fmt, src, classes_path)
+        validator = Validator(validate, known)
+    total, infos = iter_dataset(src_fmt, src, img_dir=img_dir, classes_path=classes_path,
+                                workers=workers, size_cache=size_cache, log=log)
+    if label_map is not None:
+        infos = label_map.iter_apply(infos)
+    if validator is not None:
+        infos = validator.check_infos(infos)
+    if copier is not None:
+        infos = copier.iter_apply(infos)
+    if index is not None:
+        infos = index.iter_add(infos)
+    images = boxes = 0
+
+    def counted(stream):
+        nonlocal images, boxes
+        for info in stream:
+            images += 1
+            boxes += len(info.bboxes)
+            progress(images, total)
+            yield info
+
+    stream = prefetch(infos, queue_size)
+    try:
+        # NOTE: 导入在后台线程中进行，这里的 export 包括等待导入的时间
+        with stage('export'):
+            export_stream(dst_fmt, counted(stream), dst, workers=workers, shard_images=shard_images,
+                          shard_bytes=shard_bytes, class_list=label_map.class_list() if label_map else None)
+    finally:
+        stream.close()
+    t2 = time.perf_counter()
+    if label_map is not None:
+        label_map.log(log)
+    if validator is not None:
+        validator.log(log)
+    if copier is not None:
+        copier.log(log)
+    if index is not None:
+        log(index.summary())
+
+    # NOTE: 导入和导出重叠，不再区分 load_time / export_time
+    stats = _make_stats(images, boxes, t0, t0, t2, streaming=True)
+    if index is not None:
+        stats['dataset'] = index.to_dict()
+    _log_stats(stats, dst, log)
+    return stats
+
+
+@reader_scope()
+def convert(src_fmt: str, src: str, dst_fmt: str, dst: str, img_dir: str = None,
+            classes_path: str = None, workers: int = 1, size_cache: bool = True,
+            columnar: bool = False, incremental: bool = False, use_hash: bool = False,
+            stream: bool = False, shard_images: int = None, shard_bytes: int = None,
+            snapshot: bool = False, validate: str = None, label_map: str = None, dataset_stats: bool = False,
+            images: str = None, max_image_size: int = None, image_format: str = None, image_quality: int = 90,
+            query: str = None, log=None) -> dict:
+    # 一次完整的 导入 -> IR -> 导出，返回耗时与吞吐统计
+    # incremental: 只处理上次转换后有变化的源文件，见 convert_incremental
+    # stream: 不构建完整的 IR，导入与导出同时进行，见 convert_stream
+    # shard_images / shard_bytes: COCO 分片导出
+    # snapshot: 读写源数据集的二进制快照 (只用于完整加载，增量 / 流式转换时忽略)
+    # validate: 导出前校验框 'report' / 'clip' / 'drop'，见 validate.py
+    # label_map: 类别映射文件 (合并 / 重命名 / 删除 / 排序类别)，见 labelmap.py
+    # dataset_stats: 输出导出数据的统计 (每类框数 / 图片数 / 框尺寸)，见 stats.py；统计同时放在返回值的 'dataset' 中
+    # query: 只导出至少有一个框满足条件的图片，e.g. "person,min_width=100"，见 stats.parse_query
+    # images: 同时输出图片 'auto' / 'reflink' / 'hardlink' / 'symlink' / 'copy'，见 imagecopy.py；
+    #         max_image_size / image_format: 缩小 / 重新编码图片 (隐含 images='auto')，新宽高和坐标写回 IR
+    if validate and validate not in VALIDATE_MODES:
+        raise ValueError(f"不支持的校验模式: {validate}")
+    if (max_image_size or image_format) and not images:
+        images = "auto"
+    query = parse_query(query) if query else None
+    if query is not None and (incremental or stream):
+        raise ValueError("增量 / 流式转换不支持按条件导出子集")
+    if incremental:
+        if shard_images or shard_bytes:
+            raise ValueError("增量转换不支持 COCO 分片导出")
+        if validate or label_map or dataset_stats or images:
+            raise ValueError("增量转换不支持校验 / 类别映射 / 统计 / 输出图片")
+        return convert_incremental(src_fmt, src, dst_fmt, dst, img_dir=img_dir, classes_path=classes_path,
+                                   workers=workers, size_cache=size_cache, use_hash=use_hash, log=log)
+    if stream:
+        copier = image_copier(dst_fmt, dst, images, workers, max_image_size, image_format, image_quality) \
+            if images else None
+        with copier or nullcontext():
+            return convert_stream(src_fmt, src, dst_fmt, dst, img_dir=img_dir, classes_path=classes_path,
+                                  workers=workers, size_cache=size_cache,
+                                  shard_images=shard_images, shard_bytes=shard_bytes, validate=validate,
+                                  label_map=LabelMap.load(label_map) if label_map else None,
+                                  index=DatasetIndex() if dataset_stats else None, copier=copier, log=log)
+    log = log or _noop
+    mapping = LabelMap.load(label_map) if label_map else None
+    index = DatasetIndex() if dataset_stats else None
+    # NOTE: 没有映射 / 校验 / 查询时统计在导入过程中增量完成；否则数据会变，统计最终导出的数据
+    transformed = mapping is not None or bool(validate) or bool(max_image_size) or query is not None
+    t0 = time.perf_counter()
+    with stage('load'):
+        data = load_dataset(src_fmt, src, img_dir=img_dir, classes_path=classes_path, workers=workers,
+                            size_cache=size_cache, columnar=columnar, snapshot=snapshot,
+                            index=None if transformed else index, log=log)
+    t1 = time.perf_counter()
+    log(f"成功加载 {len(data)} 个标注文件。({t1 - t0:.2f}s)")
+    if mapping is not None:
+        with stage('remap'):
+            data = mapping.apply(data)
+        mapping.log(log)
+    if validate:
+        validator = Validator(validate, mapping.class_list() if mapping else known_classes(src_fmt, src, classes_path))
+        with stage('validate'):
+            data = validator.check(data if isinstance(data, AnnotationTable) else AnnotationTable.from_infos(data))
+        validator.log(log)
+    if query is not None:
+        with stage('query'):
+            table = data if isinstance(data, AnnotationTable) else AnnotationTable.from_infos(data)
+            found = DatasetIndex()
+            found.update(table)
+            data = take_images(table, found.query(**query))
+        log(f"{len(data)} / {len(table)} 张图片满足查询条件")
+    if images:
+        data = copy_images(data, dst_fmt, dst, images, workers, max_image_size, image_format, image_quality, log=log)
+    if index is not None and transformed:
+        with stage('stats'):
+            index.add_batch(data if isinstance(data, AnnotationTable) else AnnotationTable.from_infos(data))
+
+    with stage('export'):
+        export_dataset(dst_fmt, data, dst, workers=workers, shard_images=shard_images, shard_bytes=shard_bytes,
+                       class_list=mapping.class_list() if mapping else None)
+    t2 = time.perf_counter()
+
+    boxes = data.num_boxes if isinstance(data, AnnotationTable) else sum(len(info.bboxes) for info in data)
+    stats = _make_stats(len(data), boxes, t0, t1, t2)
+    if index is not None:
+        log(index.summary())
+        stats['dataset'] = index.to_dict()
+    _log_stats(stats, dst, log)
+    return stats
+
+
+def parse_size(text: str) -> int:
+    # "500M" / "2G" / "100000" -> 字节数
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper().rstrip('B')
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的大小: {text}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="unilabel",
+        description="UniLabel 命令行转换工具 (headless, 不依赖 PySide6)")
+    parser.add_argument("src_fmt", choices=FORMATS, help="原始格式 (Original)")
+    parser.add_argument("src", help="标注文件夹；COCO 为 json 文件，或多个分片所在的文件夹 / 通配符 (合并导入)")
+    parser.add_argument("dst_fmt", choices=FORMATS, help="目标格式 (Target)")
+    parser.add_argument("dst", help="保存路径；COCO 可以直接给 .json 文件")
+    parser.add_argument("--img-dir", help="图片所在文件夹 (COCO/YOLO，默认与标注相同)")
+    parser.add_argument("--classes", help="YOLO classes.txt 路径 (默认 src/classes.txt)；校验时也作为已知类别列表")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="解析进程数 / 写入线程数，0 为全部 CPU (默认 1)")
+    parser.add_argument("--no-size-cache", action="store_true",
+                        help="不读写图片尺寸缓存 (%s)" % SIZE_CACHE_NAME)
+    parser.add_argument("--columnar", action="store_true",
+                        help="使用列式 IR (AnnotationTable)，降低大数据集的内存占用")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量转换：只处理有变化的源文件 (清单保存在输出目录的 %s)" % MANIFEST_NAME)
+    parser.add_argument("--hash", action="store_true",
+                        help="增量转换时用文件内容 sha1 而不是 mtime 判断变化")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式转换：不在内存中保存整个数据集，导入与导出同时进行")
+    parser.add_argument("--shard-images", type=int, help="COCO 分片导出：每个文件的图片数")
+    parser.add_argument("--shard-bytes", type=parse_size, help="COCO 分片导出：每个文件的大小 (近似)，如 500M")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="解析结果保存为二进制快照 (在缓存目录 %s 中，可用环境变量 UNILABEL_CACHE_DIR 修改)，"
+                             "源文件没变时下次直接加载" % cache_dir())
+    parser.add_argument("--validate", choices=VALIDATE_MODES,
+                        help="导出前校验框 (NaN / 反向 / 面积为 0 / 越界 / 重复 / 未知类别)：report 只报告，"
+                             "clip 修正坐标并删除无法修正的框，drop 删除所有有问题的框")
+    parser.add_argument("--label-map", metavar="FILE",
+                        help="类别映射文件：合并 / 重命名 / 删除 / 排序类别 (每行 'old -> new'，'old -> -' 删除，见 labelmap.py)")
+    parser.add_argument("--stats", action="store_true",
+                        help="输出数据集统计：每类框数 / 图片数 / 框尺寸 (small / medium / large)")
+    parser.add_argument("--stats-json", metavar="JSON", help="把数据集统计写入 json 文件 (隐含 --stats)")
+    parser.add_argument("--query", metavar="COND",
+                        help="只导出至少有一个框满足条件的图片：逗号分隔的类别和尺寸条件 (%s)，"
+                             "如 'person,car,min_width=100'" % ' / '.join(QUERY_KEYS))
+    parser.add_argument("--copy-images", nargs='?', const='auto', choices=IMAGE_COPY_MODES, metavar="MODE",
+                        help="同时把图片输出到标注旁边：auto (默认，reflink > 硬链接 > 复制) / reflink / hardlink / "
+                             "symlink / copy；已存在且相同的图片跳过")
+    parser.add_argument("--max-image-size", type=int, metavar="PX",
+                        help="输出图片的最长边超过 PX 时等比缩小，坐标同步缩放 (隐含 --copy-images)")
+    parser.add_argument("--image-format", choices=sorted(IMAGE_FORMATS),
+                        help="输出图片重新编码为该格式 (隐含 --copy-images)")
+    parser.add_argument("--image-quality", type=int, default=90, help="重新编码的质量 (默认 90)")
+    parser.add_argument("--io-readers", type=int, default=1,
+                        help="并发读取 (预读) 标注文件的线程数，高延迟存储 (NFS / 对象存储) 上可设为 16~64 (默认 1)")
+    parser.add_argument("--io-writers", type=int, default=1, help="并发写文件的线程数 (默认 1)")
+    parser.add_argument("--simulate-latency", type=float, metavar="MS",
+                        help="每次打开文件前等待 MS 毫秒，用本地目录模拟高延迟存储")
+    parser.add_argument("--profile", action="store_true",
+                        help="输出各阶段 (扫描 / 读取 / 解析 / 序列化 / 写入 ...) 的耗时和计数")
+    parser.add_argument("--trace", metavar="JSON", help="把各阶段的时间线写入 Chrome trace 文件 (隐含 --profile)")
+    parser.add_argument("--cprofile", metavar="PROF", help="同时用 cProfile 记录主进程，写入 pstats 文件")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不输出日志")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    log = _noop if args.quiet else print
+    profiling = args.profile or args.trace or args.cprofile
+    iopool.configure(readers=args.io_readers, writers=args.io_writers,
+                     latency=args.simulate_latency / 1000 if args.simulate_latency else None)
+    session = None
+    try:
+        with (profiler.profile(args.trace, args.cprofile) if profiling else nullcontext()) as session:
+            stats = convert(args.src_fmt, args.src, args.dst_fmt, args.dst,
+                    img_dir=args.img_dir, classes_path=args.classes,
+                    workers=args.workers, size_cache=not args.no_size_cache,
+                    columnar=args.columnar, incremental=args.incremental, use_hash=args.hash,
+                    stream=args.stream, shard_images=args.shard_images, shard_bytes=args.shard_bytes,
+                    snapshot=args.snapshot, validate=args.validate, label_map=args.label_map,
+                    dataset_stats=args.stats or bool(args.stats_json), images=args.copy_images,
+                    max_image_size=args.max_image_size, image_format=args.image_format,
+                    image_quality=args.image_quality, query=args.query, log=log)
+        if args.stats_json:
+            with open(args.stats_json, 'w', encoding='utf-8') as f:
+                json.dump(stats['dataset'], f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print(f"[Error] 转换失败: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        if session is not None:
+            # NOTE: 出错时也输出已有的统计，方便定位卡在哪个阶段
+            print(session.summary(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())